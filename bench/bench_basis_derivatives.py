@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""This script benchmarks evaluate_reference_basis_derivatives of
+generated finite elements, with derivatives computed by applying the
+derivative matrices at runtime and with precomputed derivative
+coefficients.
+
+Each element is compiled twice through the cffi JIT, once with the
+reference parameters and once with precompute_basis_derivatives set to
+the highest order. The functions are timed in a C loop for each order,
+and the values are compared.
+
+Example:
+
+    python bench_basis_derivatives.py --degree 1 2 3 --order 1 2 3
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+import cffi
+import numpy
+
+import ffc.backends.ufc.jit
+import ufl
+from ffc.parameters import default_parameters
+from utils import print_table
+
+harness_code = """
+#include <time.h>
+
+typedef int (*derivatives_function)(double*, int, int, const double*);
+
+static double seconds(void)
+{
+  struct timespec t;
+  clock_gettime(CLOCK_MONOTONIC, &t);
+  return t.tv_sec + 1e-9 * t.tv_nsec;
+}
+
+double time_derivatives(derivatives_function f, double* values, int order,
+                        int num_points, const double* X, int n)
+{
+  double t0 = seconds();
+  for (int i = 0; i < n; ++i)
+    f(values, order, num_points, X);
+  return (seconds() - t0) / n;
+}
+"""
+
+harness_decl = """
+typedef int (*derivatives_function)(double*, int, int, const double*);
+double time_derivatives(derivatives_function f, double* values, int order,
+                        int num_points, const double* X, int n);
+"""
+
+
+def compile_harness():
+    """Compile C timing loop for calling element functions without Python overhead."""
+    ffibuilder = cffi.FFI()
+    ffibuilder.set_source("_bench_derivatives_harness", harness_code)
+    ffibuilder.cdef(harness_decl)
+    ffibuilder.compile(tmpdir="compile_cache", verbose=False)
+    return importlib.import_module("compile_cache._bench_derivatives_harness")
+
+
+def prepare_element(element, parameters, num_points, harness, seed=17):
+    """Compile element and return timer(order, n) returning the average
+    time of n calls, and the array the values are written to."""
+    compiled_elements, module = ffc.backends.ufc.jit.compile_elements(
+        [element], parameters=parameters)
+    compiled_element, = compiled_elements
+    ffi = module.ffi
+
+    tdim = compiled_element.topological_dimension
+    rng = numpy.random.RandomState(seed)
+    X = rng.random_sample((num_points, tdim)) / tdim
+    max_size = num_points * compiled_element.space_dimension \
+        * compiled_element.reference_value_size * tdim**compiled_element.degree
+    values = numpy.zeros(max_size)
+
+    # Pass pointers across the two cffi modules as plain addresses
+    def address(ptr, ctype):
+        return harness.ffi.cast(ctype, int(ffi.cast("uintptr_t", ptr)))
+
+    args = (address(compiled_element.evaluate_reference_basis_derivatives,
+                    "derivatives_function"),
+            address(ffi.from_buffer(values), "double*"))
+    X_ptr = address(ffi.from_buffer(X), "double*")
+
+    def timer(order, n, data=(module, X)):
+        return harness.lib.time_derivatives(*(args + (order, num_points, X_ptr, n)))
+
+    return timer, values
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark of evaluate_reference_basis_derivatives")
+    parser.add_argument("--cell", default="tetrahedron",
+                        help="reference cell (default: %(default)s)")
+    parser.add_argument("--degree", type=int, nargs="+", default=[2, 3, 4],
+                        help="Lagrange element degrees (default: %(default)s)")
+    parser.add_argument("--order", type=int, nargs="+", default=[1, 2, 3],
+                        help="derivative orders (default: %(default)s)")
+    parser.add_argument("--num-points", type=int, default=64,
+                        help="number of points per call (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of alternating timing rounds (default: %(default)s)")
+    parser.add_argument("-f", action="append", default=[], nargs=2, dest="f",
+                        metavar=("name", "value"), help="set candidate parameter value")
+    xargs = parser.parse_args(args)
+
+    # Make the compile_cache directory importable
+    sys.path.insert(0, os.getcwd())
+    harness = compile_harness()
+
+    reference = default_parameters()
+    candidate = default_parameters()
+    candidate["precompute_basis_derivatives"] = max(xargs.order)
+    candidate.update(dict(xargs.f))
+
+    table = {}
+    row = 0
+    for degree in xargs.degree:
+        element = ufl.FiniteElement("Lagrange", ufl.Cell(xargs.cell), degree)
+        timer_r, values_r = prepare_element(element, reference, xargs.num_points, harness)
+        timer_c, values_c = prepare_element(element, candidate, xargs.num_points, harness)
+        for order in xargs.order:
+            if order > degree:
+                continue
+
+            # Warm up and calibrate number of calls to about 0.05 s
+            t = timer_r(order, 10)
+            n = max(10, int(0.05 / max(t, 1e-9)))
+            tr = min(timer_r(order, n) for k in range(xargs.repeat))
+            tc = min(timer_c(order, n) for k in range(xargs.repeat))
+
+            scale = max(numpy.max(numpy.abs(values_r)), 1e-300)
+            error = numpy.max(numpy.abs(values_r - values_c)) / scale
+            case = "P%d %s, order %d" % (degree, xargs.cell, order)
+            for col, (title, value) in enumerate([("runtime dmats", tr / xargs.num_points),
+                                                  ("precomputed", tc / xargs.num_points),
+                                                  ("speedup", tr / tc),
+                                                  ("rel. error", error)]):
+                table[(row, col)] = (case, title, value)
+            row += 1
+
+    print_table(table, "FFC basis derivatives bench (time per point)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
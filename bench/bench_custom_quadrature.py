@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""This script benchmarks the throughput of custom integrals, with
+element tables tabulated at quadrature points given at runtime.
+
+A weighted Laplace and mass form is compiled for each element degree
+and chunk size, and the custom integral kernel is timed in a C loop
+over a range of numbers of points per cell. The time per call and per
+quadrature point is reported.
+
+Example:
+
+    python bench_custom_quadrature.py --degree 1 2 3 --chunk-size 8 32
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+import cffi
+import numpy
+
+import ffc.backends.ufc.jit
+import ufl
+from ffc.parameters import default_parameters
+from utils import print_table
+
+harness_code = """
+#include <time.h>
+
+typedef void (*custom_kernel)(double*, const double* const*, const double*, int,
+                              const double*, const double*, const double*, int);
+
+static double seconds(void)
+{
+  struct timespec t;
+  clock_gettime(CLOCK_MONOTONIC, &t);
+  return t.tv_sec + 1e-9 * t.tv_nsec;
+}
+
+double time_custom_kernel(custom_kernel kernel, double* A, const double* const* w,
+                          const double* coordinate_dofs, int num_points,
+                          const double* points, const double* weights, int n)
+{
+  double t0 = seconds();
+  for (int i = 0; i < n; ++i)
+    kernel(A, w, coordinate_dofs, num_points, points, weights, NULL, 1);
+  return (seconds() - t0) / n;
+}
+"""
+
+harness_decl = """
+typedef void (*custom_kernel)(double*, const double* const*, const double*, int,
+                              const double*, const double*, const double*, int);
+double time_custom_kernel(custom_kernel kernel, double* A, const double* const* w,
+                          const double* coordinate_dofs, int num_points,
+                          const double* points, const double* weights, int n);
+"""
+
+
+def compile_harness():
+    """Compile C timing loop for calling kernels without Python overhead."""
+    ffibuilder = cffi.FFI()
+    ffibuilder.set_source("_bench_custom_harness", harness_code)
+    ffibuilder.cdef(harness_decl)
+    ffibuilder.compile(tmpdir="compile_cache", verbose=False)
+    return importlib.import_module("compile_cache._bench_custom_harness")
+
+
+def prepare_kernel(degree, chunk_size, harness, seed=17):
+    """Compile custom integral and return timer(num_points, n) returning
+    the average time of n kernel calls with num_points random points."""
+    cell = ufl.triangle
+    element = ufl.FiniteElement("Lagrange", cell, degree)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(element)
+    a = c * ufl.dot(ufl.grad(u), ufl.grad(v)) * ufl.dc + u * v * ufl.dc
+
+    parameters = default_parameters()
+    parameters["chunk_size"] = chunk_size
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([a], parameters=parameters)
+    ffi = module.ffi
+    integral = compiled_forms[0].create_default_custom_integral()
+    space_dim = compiled_forms[0].create_finite_element(0).space_dimension
+
+    rng = numpy.random.RandomState(seed)
+    coordinate_dofs = numpy.array([0.0, 0.0, 1.0, 0.0, 0.0, 1.0]) + 0.05 * rng.random_sample(6)
+    coefficient = rng.random_sample(space_dim)
+    A = numpy.zeros(space_dim * space_dim)
+    w = ffi.new("double*[]", [ffi.cast("double *", ffi.from_buffer(coefficient))])
+
+    # Pass pointers across the two cffi modules as plain addresses
+    def address(ptr, ctype):
+        return harness.ffi.cast(ctype, int(ffi.cast("uintptr_t", ptr)))
+
+    def timer(num_points, n):
+        # Random points inside the cell
+        X = rng.random_sample((num_points, 2))
+        X[X.sum(axis=1) > 1.0] *= 0.5
+        x0 = coordinate_dofs[0:2]
+        J = numpy.array([coordinate_dofs[2:4] - x0, coordinate_dofs[4:6] - x0]).T
+        points = numpy.ascontiguousarray((x0 + X.dot(J.T)).flatten())
+        weights = numpy.full(num_points, 0.5 * abs(numpy.linalg.det(J)) / num_points)
+        return harness.lib.time_custom_kernel(
+            address(integral.tabulate_tensor, "custom_kernel"),
+            address(ffi.from_buffer(A), "double*"), address(w, "double**"),
+            address(ffi.from_buffer(coordinate_dofs), "double*"), num_points,
+            address(ffi.from_buffer(points), "double*"),
+            address(ffi.from_buffer(weights), "double*"), n)
+
+    # Keep the compiled module alive along with the timer
+    timer.module = module
+    return timer
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark of custom integral throughput")
+    parser.add_argument("--degree", type=int, nargs="+", default=[1, 2, 3],
+                        help="element degrees (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[8, 32],
+                        help="point chunk sizes (default: %(default)s)")
+    parser.add_argument("--num-points", type=int, nargs="+", default=[1, 4, 16, 64, 256],
+                        help="numbers of points per cell (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of timing rounds (default: %(default)s)")
+    xargs = parser.parse_args(args)
+
+    # Make the compile_cache directory importable
+    sys.path.insert(0, os.getcwd())
+    harness = compile_harness()
+
+    table = {}
+    row = 0
+    for degree in xargs.degree:
+        for chunk_size in xargs.chunk_size:
+            timer = prepare_kernel(degree, chunk_size, harness)
+            for num_points in xargs.num_points:
+                # Calibrate number of calls to about 0.05 s
+                t = timer(num_points, 10)
+                n = max(10, int(0.05 / max(t, 1e-9)))
+                t = min(timer(num_points, n) for k in range(xargs.repeat))
+                case = "P%d, chunk_size=%d, %d points" % (degree, chunk_size, num_points)
+                for col, (title, value) in enumerate([("time per cell", t),
+                                                      ("time per point", t / num_points),
+                                                      ("points per second", num_points / t)]):
+                    table[(row, col)] = (case, title, value)
+                row += 1
+
+    print_table(table, "FFC custom integral bench")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
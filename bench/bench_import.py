@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""This script benchmarks the startup cost of FFC, as measured by
+python -X importtime, for import ffc and for a JIT compilation of a
+form found in the dijitso cache.
+
+Each case runs in a new interpreter. The import times of the packages
+imported at top level are summed, and the slowest of them are listed.
+The cache is warmed up by a first JIT compilation in a temporary cache
+directory.
+
+Example:
+
+    python bench_import.py --repeat 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from utils import print_table
+
+cases = [
+    ("import ffc", "import ffc"),
+    ("cached jit", """
+import ufl
+import ffc
+element = ufl.FiniteElement("Lagrange", ufl.triangle, 1)
+u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+ffc.jit(u * v * ufl.dx)
+"""),
+]
+
+
+def import_times(script, env):
+    """Return {package: cumulative import time in seconds} of the
+    packages imported at top level by script."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            times[name.strip()] = int(cumulative) * 1e-6
+    return times
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark of FFC import time")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of runs of each case (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=5,
+                        help="number of slowest packages to list (default: %(default)s)")
+    xargs = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, DIJITSO_CACHE_DIR=cache_dir)
+        import_times(cases[-1][1], env)
+
+        table = {}
+        for row, (case, script) in enumerate(cases):
+            runs = [import_times(script, env) for k in range(xargs.repeat)]
+            best = min(runs, key=lambda times: sum(times.values()))
+            columns = [("total", sum(best.values()))]
+            slowest = sorted(best.items(), key=lambda item: -item[1])[:xargs.top]
+            columns += [("#%d" % (i + 1), "%s %.3f" % item) for i, item in enumerate(slowest)]
+            columns += [("", "")] * (xargs.top + 1 - len(columns))
+            for col, (title, value) in enumerate(columns):
+                table[(row, col)] = (case, title, value)
+
+    print_table(table, "FFC import time bench (seconds)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
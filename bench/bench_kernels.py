@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""This script benchmarks the generated tabulate_tensor kernels for
+the form files found in the current directory.
+
+Each form is compiled twice through the cffi JIT, once with the
+reference parameters and once with the candidate parameters. The
+kernels are timed in a C loop on the same cell and coefficient data,
+and the element tensors are compared.
+
+Example, measuring the effect of the code ast optimization passes:
+
+    python bench_kernels.py -r enable_cse 0 -r enable_strength_reduction 0 \\
+        -r enable_loop_invariant_hoisting 0
+
+Example, measuring the overhead of the call counters and timers:
+
+    python bench_kernels.py -f add_tabulate_tensor_timing 1
+"""
+
+import argparse
+import glob
+import importlib
+import os
+import sys
+
+import cffi
+import numpy
+
+import ffc.backends.ufc.jit
+import ufl
+from ffc.parameters import default_parameters
+from utils import print_table
+
+harness_code = """
+#include <time.h>
+
+typedef void (*cell_kernel)(double*, const double* const*, const double*, int);
+typedef void (*exterior_facet_kernel)(double*, const double* const*, const double*, int, int);
+
+static double seconds(void)
+{
+  struct timespec t;
+  clock_gettime(CLOCK_MONOTONIC, &t);
+  return t.tv_sec + 1e-9 * t.tv_nsec;
+}
+
+double time_cell_kernel(cell_kernel kernel, double* A, const double* const* w,
+                        const double* coordinate_dofs, int n)
+{
+  double t0 = seconds();
+  for (int i = 0; i < n; ++i)
+    kernel(A, w, coordinate_dofs, 1);
+  return (seconds() - t0) / n;
+}
+
+double time_exterior_facet_kernel(exterior_facet_kernel kernel, double* A, const double* const* w,
+                                  const double* coordinate_dofs, int n)
+{
+  double t0 = seconds();
+  for (int i = 0; i < n; ++i)
+    kernel(A, w, coordinate_dofs, i % 3, 1);
+  return (seconds() - t0) / n;
+}
+"""
+
+harness_decl = """
+typedef void (*cell_kernel)(double*, const double* const*, const double*, int);
+typedef void (*exterior_facet_kernel)(double*, const double* const*, const double*, int, int);
+double time_cell_kernel(cell_kernel kernel, double* A, const double* const* w,
+                        const double* coordinate_dofs, int n);
+double time_exterior_facet_kernel(exterior_facet_kernel kernel, double* A, const double* const* w,
+                                  const double* coordinate_dofs, int n);
+"""
+
+
+def compile_harness():
+    """Compile C timing loops for calling kernels without Python overhead."""
+    ffibuilder = cffi.FFI()
+    ffibuilder.set_source("_bench_harness", harness_code)
+    ffibuilder.cdef(harness_decl)
+    ffibuilder.compile(tmpdir="compile_cache", verbose=False)
+    return importlib.import_module("compile_cache._bench_harness")
+
+
+def cell_data(compiled_form, module, rng):
+    """Create coordinate dofs of a perturbed reference cell and random coefficients."""
+    ffi = module.ffi
+    element = compiled_form.create_coordinate_finite_element()
+    tdim = element.topological_dimension
+    gdim = element.geometric_dimension
+    X = numpy.zeros((element.space_dimension, tdim))
+    element.tabulate_reference_dof_coordinates(ffi.cast("double *", ffi.from_buffer(X)))
+    x = numpy.zeros((X.shape[0], gdim))
+    x[:, :tdim] = X
+    x += 0.05 * rng.random_sample(x.shape)
+
+    # Coordinate dofs are interleaved by component
+    coordinate_dofs = numpy.ascontiguousarray(x.flatten())
+
+    rank = compiled_form.rank
+    coefficients = []
+    for i in range(compiled_form.num_coefficients):
+        dim = compiled_form.create_finite_element(rank + i).space_dimension
+        coefficients.append(rng.random_sample(dim))
+
+    tensor_size = 1
+    for i in range(rank):
+        tensor_size *= compiled_form.create_finite_element(i).space_dimension
+
+    return coordinate_dofs, coefficients, tensor_size
+
+
+def prepare_kernels(form, parameters, harness, seed=17):
+    """Compile form and return {integral_type: (timer, element tensor)},
+    where timer(n) returns the average time of n kernel calls."""
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([form], parameters=parameters)
+    compiled_form, = compiled_forms
+    ffi = module.ffi
+
+    rng = numpy.random.RandomState(seed)
+    coordinate_dofs, coefficients, tensor_size = cell_data(compiled_form, module, rng)
+    w = ffi.new("double*[]", max(1, len(coefficients)))
+    for i, c in enumerate(coefficients):
+        w[i] = ffi.cast("double *", ffi.from_buffer(c))
+
+    # Pass pointers across the two cffi modules as plain addresses
+    def address(ptr, ctype):
+        return harness.ffi.cast(ctype, int(ffi.cast("uintptr_t", ptr)))
+
+    integrals = []
+    if compiled_form.has_cell_integrals:
+        integrals.append(("cell", compiled_form.create_default_cell_integral(),
+                          harness.lib.time_cell_kernel, "cell_kernel"))
+    if compiled_form.has_exterior_facet_integrals:
+        integrals.append(
+            ("exterior_facet", compiled_form.create_default_exterior_facet_integral(),
+             harness.lib.time_exterior_facet_kernel, "exterior_facet_kernel"))
+
+    kernels = {}
+    for integral_type, integral, time_kernel, kernel_type in integrals:
+        if integral == ffi.NULL:
+            continue
+        A = numpy.zeros(tensor_size)
+        args = (address(integral.tabulate_tensor, kernel_type),
+                address(ffi.from_buffer(A), "double*"),
+                address(w, "double**"),
+                address(ffi.from_buffer(coordinate_dofs), "double*"))
+
+        # Keep the data behind the addresses alive along with the timer
+        data = (module, w, coefficients, coordinate_dofs, A)
+
+        def timer(n, time_kernel=time_kernel, args=args, data=data):
+            return time_kernel(*(args + (n, )))
+
+        kernels[integral_type] = (timer, A)
+    return kernels
+
+
+def benchmark_kernels(reference, candidate, num_calls, repeat):
+    """Time reference and candidate kernels in alternating rounds,
+    returning the best time per call of each."""
+    # Warm up and calibrate number of calls to about 0.05 s
+    if num_calls is None:
+        t = reference(10)
+        num_calls = max(10, int(0.05 / max(t, 1e-9)))
+    tr = []
+    tc = []
+    for k in range(repeat):
+        tr.append(reference(num_calls))
+        tc.append(candidate(num_calls))
+    return min(tr), min(tc)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark of generated tabulate_tensor kernels")
+    parser.add_argument("ufl_file", nargs="*", help="UFL form files (default: *.ufl)")
+    parser.add_argument("-n", "--num-calls", type=int, default=None,
+                        help="number of kernel calls per timing (default: calibrated)")
+    parser.add_argument("--repeat", type=int, default=7,
+                        help="number of alternating timing rounds (default: %(default)s)")
+    parser.add_argument("-r", action="append", default=[], nargs=2, dest="r",
+                        metavar=("name", "value"), help="set reference parameter value")
+    parser.add_argument("-f", action="append", default=[], nargs=2, dest="f",
+                        metavar=("name", "value"), help="set candidate parameter value")
+    xargs = parser.parse_args(args)
+
+    reference = default_parameters()
+    reference.update(dict(xargs.r))
+    candidate = default_parameters()
+    candidate.update(dict(xargs.f))
+
+    # Make the compile_cache directory importable
+    sys.path.insert(0, os.getcwd())
+    harness = compile_harness()
+
+    files = xargs.ufl_file or sorted(glob.glob("*.ufl"))
+    table = {}
+    row = 0
+    for filename in files:
+        ufd = ufl.algorithms.load_ufl_file(filename)
+        for form in ufd.forms:
+            name = ufd.object_names.get(id(form), "form")
+            try:
+                r = prepare_kernels(form, reference, harness)
+                c = prepare_kernels(form, candidate, harness)
+            except cffi.VerificationError:
+                print("Skipping %s:%s, generated code does not compile" % (filename, name))
+                continue
+            for integral_type in sorted(r):
+                timer_r, Ar = r[integral_type]
+                timer_c, Ac = c[integral_type]
+                tr, tc = benchmark_kernels(timer_r, timer_c, xargs.num_calls, xargs.repeat)
+                Ar[:] = 0.0
+                Ac[:] = 0.0
+                timer_r(1)
+                timer_c(1)
+                scale = max(numpy.max(numpy.abs(Ar)), 1e-300)
+                error = numpy.max(numpy.abs(Ar - Ac)) / scale
+                case = "%s:%s (%s)" % (os.path.splitext(filename)[0], name, integral_type)
+                for col, (title, value) in enumerate([("reference", tr), ("candidate", tc),
+                                                      ("speedup", tr / tc),
+                                                      ("rel. error", error)]):
+                    table[(row, col)] = (case, title, value)
+                row += 1
+
+    print_table(table, "FFC kernel bench")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""This script benchmarks the accuracy and throughput of cell integral
+kernels generated with scalar_type float, with and without
+mixed_precision, against the default double kernels.
+
+A weighted Laplace and mass form is compiled for each element degree
+in each precision mode. The kernels are timed in a C loop on the same
+cell and coefficient data, and the element tensors are compared to the
+double element tensor.
+
+Example:
+
+    python bench_precision.py --cell triangle --degree 1 2 3 4
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+import cffi
+import numpy
+
+import ffc.backends.ufc.jit
+import ufl
+from ffc.parameters import default_parameters
+from utils import print_table
+
+harness_code = """
+#include <time.h>
+
+typedef void (*double_kernel)(double*, const double* const*, const double*, int);
+typedef void (*float_kernel)(float*, const float* const*, const double*, int);
+
+static double seconds(void)
+{
+  struct timespec t;
+  clock_gettime(CLOCK_MONOTONIC, &t);
+  return t.tv_sec + 1e-9 * t.tv_nsec;
+}
+
+double time_double_kernel(double_kernel kernel, double* A, const double* const* w,
+                          const double* coordinate_dofs, int n)
+{
+  double t0 = seconds();
+  for (int i = 0; i < n; ++i)
+    kernel(A, w, coordinate_dofs, 1);
+  return (seconds() - t0) / n;
+}
+
+double time_float_kernel(float_kernel kernel, float* A, const float* const* w,
+                         const double* coordinate_dofs, int n)
+{
+  double t0 = seconds();
+  for (int i = 0; i < n; ++i)
+    kernel(A, w, coordinate_dofs, 1);
+  return (seconds() - t0) / n;
+}
+"""
+
+harness_decl = """
+typedef void (*double_kernel)(double*, const double* const*, const double*, int);
+typedef void (*float_kernel)(float*, const float* const*, const double*, int);
+double time_double_kernel(double_kernel kernel, double* A, const double* const* w,
+                          const double* coordinate_dofs, int n);
+double time_float_kernel(float_kernel kernel, float* A, const float* const* w,
+                         const double* coordinate_dofs, int n);
+"""
+
+# Precision modes, with the numpy type of element tensor and coefficients
+modes = [("double", {}, numpy.float64),
+         ("float", {"scalar_type": "float"}, numpy.float32),
+         ("mixed", {"scalar_type": "float", "mixed_precision": True}, numpy.float32)]
+
+
+def compile_harness():
+    """Compile C timing loops for calling kernels without Python overhead."""
+    ffibuilder = cffi.FFI()
+    ffibuilder.set_source("_bench_precision_harness", harness_code)
+    ffibuilder.cdef(harness_decl)
+    ffibuilder.compile(tmpdir="compile_cache", verbose=False)
+    return importlib.import_module("compile_cache._bench_precision_harness")
+
+
+def prepare_kernel(form, parameters, dtype, harness, seed=17):
+    """Compile form and return timer(n) returning the average time of
+    n cell integral kernel calls, and the element tensor."""
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([form], parameters=parameters)
+    compiled_form, = compiled_forms
+    ffi = module.ffi
+    integral = compiled_form.create_default_cell_integral()
+    ctype = "double" if dtype == numpy.float64 else "float"
+
+    # Coordinate dofs of a perturbed reference cell and random coefficients
+    rng = numpy.random.RandomState(seed)
+    element = compiled_form.create_coordinate_finite_element()
+    X = numpy.zeros((element.space_dimension, element.topological_dimension))
+    element.tabulate_reference_dof_coordinates(ffi.cast("double *", ffi.from_buffer(X)))
+    coordinate_dofs = numpy.ascontiguousarray((X + 0.05 * rng.random_sample(X.shape)).flatten())
+    dim = compiled_form.create_finite_element(0).space_dimension
+    coefficient = rng.random_sample(compiled_form.create_finite_element(2).space_dimension)
+    coefficient = coefficient.astype(dtype)
+    A = numpy.zeros(dim * dim, dtype=dtype)
+    w = ffi.new(ctype + "*[]", [ffi.cast(ctype + " *", ffi.from_buffer(coefficient))])
+
+    # Pass pointers across the two cffi modules as plain addresses
+    def address(ptr, ctype):
+        return harness.ffi.cast(ctype, int(ffi.cast("uintptr_t", ptr)))
+
+    time_kernel = getattr(harness.lib, "time_%s_kernel" % ctype)
+    args = (address(integral.tabulate_tensor, ctype + "_kernel"),
+            address(ffi.from_buffer(A), ctype + "*"),
+            address(w, ctype + "**"),
+            address(ffi.from_buffer(coordinate_dofs), "double*"))
+
+    def timer(n, data=(module, w, coefficient, coordinate_dofs)):
+        return time_kernel(*(args + (n, )))
+
+    return timer, A
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark of single and mixed precision tabulate_tensor kernels")
+    parser.add_argument("--cell", default="tetrahedron",
+                        help="reference cell (default: %(default)s)")
+    parser.add_argument("--degree", type=int, nargs="+", default=[1, 2, 3],
+                        help="Lagrange element degrees (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of alternating timing rounds (default: %(default)s)")
+    parser.add_argument("-f", action="append", default=[], nargs=2, dest="f",
+                        metavar=("name", "value"), help="set parameter value in all modes")
+    xargs = parser.parse_args(args)
+
+    # Make the compile_cache directory importable
+    sys.path.insert(0, os.getcwd())
+    harness = compile_harness()
+
+    table = {}
+    for row, degree in enumerate(xargs.degree):
+        element = ufl.FiniteElement("Lagrange", ufl.Cell(xargs.cell), degree)
+        u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+        c = ufl.Coefficient(element)
+        a = c * ufl.inner(ufl.grad(u), ufl.grad(v)) * ufl.dx + u * v * ufl.dx
+
+        kernels = []
+        for name, mode_parameters, dtype in modes:
+            parameters = default_parameters()
+            parameters.update(dict(xargs.f))
+            parameters.update(mode_parameters)
+            kernels.append(prepare_kernel(a, parameters, dtype, harness))
+
+        # Warm up and calibrate number of calls to about 0.05 s
+        t = kernels[0][0](10)
+        n = max(10, int(0.05 / max(t, 1e-9)))
+        times = [[] for k in kernels]
+        for k in range(xargs.repeat):
+            for i, (timer, A) in enumerate(kernels):
+                times[i].append(timer(n))
+        times = [min(t) for t in times]
+
+        # Compare element tensors of a single call
+        for timer, A in kernels:
+            A[:] = 0.0
+            timer(1)
+        A_double = kernels[0][1]
+        scale = max(numpy.max(numpy.abs(A_double)), 1e-300)
+
+        case = "P%d %s" % (degree, xargs.cell)
+        col = 0
+        for (name, mode_parameters, dtype), t, (timer, A) in zip(modes, times, kernels):
+            columns = [(name, t)]
+            if name != "double":
+                error = numpy.max(numpy.abs(A_double - A.astype(numpy.float64))) / scale
+                columns += [(name + " speedup", times[0] / t), (name + " rel. error", error)]
+            for title, value in columns:
+                table[(row, col)] = (case, title, value)
+                col += 1
+
+    print_table(table, "FFC precision bench (time per cell)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
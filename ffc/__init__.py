@@ -18,11 +18,18 @@ The interface consists of the following functions:
 """
 
 import logging
-import pkg_resources
+import sys
 
-from FIAT import supported_elements
+try:
+    from importlib.metadata import version as _distribution_version
+except ImportError:
+    # Python < 3.8, pkg_resources is slow to import
+    import pkg_resources
 
-__version__ = pkg_resources.get_distribution("fenics-ffc").version
+    def _distribution_version(name):
+        return pkg_resources.get_distribution(name).version
+
+__version__ = _distribution_version("fenics-ffc")
 
 
 class FFCError(Exception):
@@ -35,18 +42,42 @@ logging.basicConfig()
 logger = logging.getLogger("ffc")
 logging.captureWarnings(capture=True)
 
-# Import JIT compiler
-from ffc.jitcompiler import jit  # noqa: F401
-
-# Import main function, entry point to script
+# Import main function, entry point to script. It is imported eagerly,
+# as the submodule ffc.main would otherwise shadow it once imported.
 from ffc.main import main  # noqa: F401
 
 # Import default parameters
 from ffc.parameters import (default_jit_parameters, default_parameters)  # noqa: F401
 
-# Duplicate list of supported elements from FIAT and emove elements from
-# list that we don't support or don't trust
-supported_elements = sorted(supported_elements.keys())
-supported_elements.remove("Argyris")
-supported_elements.remove("Hermite")
-supported_elements.remove("Morley")
+
+def _supported_elements():
+    # Duplicate list of supported elements from FIAT and remove elements
+    # from list that we don't support or don't trust
+    from FIAT import supported_elements
+    supported_elements = sorted(supported_elements.keys())
+    supported_elements.remove("Argyris")
+    supported_elements.remove("Hermite")
+    supported_elements.remove("Morley")
+    return supported_elements
+
+
+# The JIT compiler (importing dijitso) and the list of supported
+# elements (importing FIAT) are loaded on first use
+_lazy_attributes = {
+    "jit": lambda: __import__("ffc.jitcompiler", fromlist=["jit"]).jit,
+    "supported_elements": _supported_elements,
+}
+
+
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = _lazy_attributes[name]()
+    globals()[name] = value
+    return value
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ is not supported
+    for _name in _lazy_attributes:
+        globals()[_name] = __getattr__(_name)
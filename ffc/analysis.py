@@ -12,18 +12,30 @@ forms, including automatic selection of elements, degrees and
 form representation type.
 """
 
+import collections
 import copy
+import json
 import logging
 import os
+import sys
 import warnings
 
 import numpy
 
 from ffc import FFCError, utils
+from ffc.fiatinterface import create_element
+from ffc.representationutils import create_quadrature_points_and_weights
 from ufl import custom_integral_types
 from ufl.algorithms import compute_form_data, sort_elements
-from ufl.algorithms.analysis import extract_sub_elements
-from ufl.classes import Form, Jacobian
+from ufl.algorithms.analysis import extract_arguments, extract_sub_elements
+from ufl.checks import is_cellwise_constant
+from ufl.classes import (Abs, Argument, Atan2, Coefficient, Conditional, Division, Form,
+                         FunctionSpace, GeometricQuantity, Index, Jacobian, JacobianDeterminant,
+                         JacobianInverse, Label, MathFunction, MaxValue, Mesh, MinValue,
+                         MultiIndex, Power, ScalarValue)
+from ufl.corealg.map_dag import map_expr_dag
+from ufl.corealg.multifunction import MultiFunction
+from ufl.corealg.traversal import unique_pre_traversal
 from ufl.finiteelement import EnrichedElement, MixedElement
 from ufl.integral import Integral
 
@@ -32,6 +44,11 @@ logger = logging.getLogger(__name__)
 # Default precision for formatting floats
 default_precision = numpy.finfo("double").precision + 1  # == 16
 
+# Cache of preprocessed canonical forms, in least recently used order,
+# { (signature, representation family, options): (form, form data, size in bytes) }
+_form_data_cache = collections.OrderedDict()
+_form_data_cache_stats = {"hits": 0, "misses": 0}
+
 
 def analyze_forms(forms, parameters):
     """Analyze form(s), returning
@@ -140,16 +157,127 @@ def _analyze_form(form, parameters):
         r = _extract_representation_family(form, parameters)
     logger.debug("Preprocessing form using '{}' representation family.".format(r))
 
-    # Compute form metadata
+    # Compute form metadata of the canonical form, shared by all
+    # structurally identical forms, and refer back to the original
+    # form and its coefficients for naming them in generated code
+    canonical_form, coefficients = canonicalize_form(form)
+    form_data = _compute_form_data(canonical_form, r, parameters)
+    form_data.canonical_form = canonical_form
+    form_data.original_form = form
+    form_data.reduced_original_coefficients = [
+        coefficients[f] for f in form_data.reduced_coefficients
+    ]
+
+    # Attach integral meta data
+    _attach_integral_metadata(form_data, r, parameters)
+    _validate_representation_choice(form_data, r)
+
+    return form_data
+
+
+class _TerminalReplacer(MultiFunction):
+    """Replace terminals, including those of unapplied derivatives."""
+
+    def __init__(self, mapping):
+        MultiFunction.__init__(self)
+        self.mapping = mapping
+
+    def terminal(self, o):
+        return self.mapping.get(o, o)
+
+    expr = MultiFunction.reuse_if_untouched
+
+
+def canonicalize_form(form):
+    """Return form with domains, coefficients, arguments, indices and
+    labels numbered by their position in the form, and a mapping from
+    the canonical to the original coefficients.
+
+    Structurally identical forms, e.g. created with new coefficient and
+    mesh objects for each step of a parameter study, have equal
+    canonical forms. Literal values are kept, as they are compiled
+    into the generated code.
+    """
+    domains = {
+        domain: Mesh(domain.ufl_coordinate_element(), ufl_id=i)
+        for i, domain in enumerate(form.ufl_domains())
+    }
+
+    def function_space(f):
+        V = f.ufl_function_space()
+        return FunctionSpace(domains.get(V.ufl_domain()), V.ufl_element())
+
+    mapping = {}
+    for i, f in enumerate(form.coefficients()):
+        mapping[f] = Coefficient(function_space(f), count=i)
+    for v in form.arguments():
+        mapping[v] = Argument(function_space(v), v.number(), v.part())
+    indices = {}
+    labels = {}
+    for integral in form.integrals():
+        for o in unique_pre_traversal(integral.integrand()):
+            if isinstance(o, GeometricQuantity):
+                mapping[o] = type(o)(domains[o.ufl_domain()])
+            elif isinstance(o, MultiIndex):
+                for i in o.indices():
+                    if isinstance(i, Index) and i not in indices:
+                        indices[i] = Index(count=len(indices))
+                mapping[o] = MultiIndex(tuple(indices.get(i, i) for i in o.indices()))
+            elif isinstance(o, Label):
+                mapping[o] = labels.setdefault(o, Label(count=len(labels)))
+
+    replacer = _TerminalReplacer(mapping)
+    canonical_form = Form([
+        integral.reconstruct(map_expr_dag(replacer, integral.integrand()),
+                             domain=domains[integral.ufl_domain()])
+        for integral in form.integrals()
+    ])
+    coefficients = {mapping[f]: f for f in form.coefficients()}
+    return canonical_form, coefficients
+
+
+def _compute_form_data(form, r, parameters):
+    """Preprocess form for representation family r, reusing the form
+    data of an equal form preprocessed with the same options.
+
+    The returned form data is a copy, with the integral data ready
+    for attaching integral metadata without modifying cached data.
+    """
+    if r == "uflacs":
+        # Keep the Jacobian determinant and inverse of affine simplex
+        # cells as terminals, to be read from a ufc_affine_geometry
+        preserve_geometry_types = (Jacobian, )
+        if parameters["generate_tabulate_tensor_geometry"] and all(
+                domain.is_piecewise_linear_simplex_domain() for domain in form.ufl_domains()):
+            preserve_geometry_types += (JacobianDeterminant, JacobianInverse)
+        options = tuple(t.__name__ for t in preserve_geometry_types)
+    elif r == "tsfc":
+        complex_mode = "complex" in parameters.get("scalar_type", "double")
+        options = (complex_mode, )
+    else:
+        raise FFCError("Unexpected representation family \"{}\" for form preprocessing.".format(r))
+
+    # Equal signatures of canonical forms are compared as forms too,
+    # ruling out false sharing of form data
+    cache_size = int(parameters.get("analysis_cache_size", 0))
+    key = (form.signature(), r, options)
+    cached = _form_data_cache.get(key) if cache_size > 0 else None
+    if cached is not None and cached[0].equals(form):
+        _form_data_cache.move_to_end(key)
+        _form_data_cache_stats["hits"] += 1
+        logger.info("Reusing form data from analysis cache.")
+        return _copy_form_data(cached[1])
+    _form_data_cache_stats["misses"] += 1
+
     if r == "uflacs":
         form_data = compute_form_data(
             form,
             do_apply_function_pullbacks=True,
             do_apply_integral_scaling=True,
             do_apply_geometry_lowering=True,
-            preserve_geometry_types=(Jacobian, ),
+            preserve_geometry_types=preserve_geometry_types,
             do_apply_restrictions=True)
-    elif r == "tsfc":
+    else:
         try:
             # TSFC provides compute_form_data wrapper using correct
             # kwargs
@@ -158,20 +286,60 @@ def _analyze_form(form, parameters):
             logger.exception(
                 "Could not import tsfc when requesting tsfc representation: {}".format(e))
             raise
-        if "complex" in parameters.get("scalar_type", "double"):
+        if complex_mode:
             form_data = tsfc_compute_form_data(form, complex_mode=True)
         else:
             form_data = tsfc_compute_form_data(form)
-    else:
-        raise FFCError("Unexpected representation family \"{}\" for form preprocessing.".format(r))
 
-    # Attach integral meta data
-    _attach_integral_metadata(form_data, r, parameters)
-    _validate_representation_choice(form_data, r)
+    if cache_size > 0:
+        _form_data_cache[key] = (form, form_data, _form_data_size(form_data))
+        while len(_form_data_cache) > cache_size:
+            _form_data_cache.popitem(last=False)
+        return _copy_form_data(form_data)
+    return form_data
+
 
+def _copy_form_data(form_data):
+    """Copy form data, sharing all but the integral lists and metadata
+    of the integral data."""
+    form_data = copy.copy(form_data)
+    form_data.integral_data = [copy.copy(ida) for ida in form_data.integral_data]
+    for ida in form_data.integral_data:
+        ida.integrals = list(ida.integrals)
+        ida.metadata = dict(ida.metadata)
     return form_data
 
 
+def _form_data_size(form_data):
+    """Estimate the memory used by the preprocessed integrands of form
+    data, counting each unique expression node once."""
+    nodes = {}
+    for ida in form_data.integral_data:
+        for integral in ida.integrals:
+            for o in unique_pre_traversal(integral.integrand()):
+                nodes[id(o)] = o
+    return sum(sys.getsizeof(o) + sys.getsizeof(o.ufl_operands) for o in nodes.values())
+
+
+def analysis_cache_info():
+    """Return dict with the number of hits and misses of the cache of
+    preprocessed forms, the number of cached forms, and an estimate of
+    the memory used by their integrands in bytes."""
+    return {
+        "hits": _form_data_cache_stats["hits"],
+        "misses": _form_data_cache_stats["misses"],
+        "size": len(_form_data_cache),
+        "bytes": sum(nbytes for form, form_data, nbytes in _form_data_cache.values()),
+    }
+
+
+def clear_analysis_cache():
+    """Clear the cache of preprocessed forms and its statistics."""
+    _form_data_cache.clear()
+    _form_data_cache_stats["hits"] = 0
+    _form_data_cache_stats["misses"] = 0
+
+
 def _extract_representation_family(form, parameters):
     """Return 'uflacs' or 'tsfc', or raise error. This takes
     care of (a) compatibility between representations due to
@@ -288,20 +456,67 @@ def _extract_common_quadrature_degree(integral_metadatas):
     return qd
 
 
-def _autoselect_quadrature_degree(integral_metadata, integral, form_data):
-    # Automatic selection of quadrature degree
+def _autoselect_quadrature_degree(integral_metadata, integral, form_data, parameters):
+    """Select quadrature degree of integral, returning the degree and a
+    record of the decision for the quadrature report.
+
+    An automatic degree is the estimated polynomial degree of the
+    integrand, capped for integrands with non-polynomial operators, by
+    the maximum degree for the cell type and by the cost budget, in
+    that order. A degree given explicitly is used as is.
+    """
     qd = integral_metadata["quadrature_degree"]
     pd = integral_metadata["estimated_polynomial_degree"]
+    qr = integral_metadata["quadrature_rule"]
+    cell = integral.ufl_domain().ufl_cell()
+    integral_type = integral.integral_type()
 
     # Special case: handling -1 as "auto" for quadrature_degree
     if qd in [-1, None]:
         qd = "auto"
 
-    # TODO: Add other options here
+    decision = {
+        "integral_type": integral_type,
+        "subdomain_id": str(integral.subdomain_id()),
+        "cell": cell.cellname(),
+        "estimated_degree": pd,
+        "requested_degree": qd,
+        "caps": [],
+    }
+
     if qd == "auto":
         qd = pd
         logger.info("quadrature_degree: auto --> {}".format(qd))
-    if isinstance(qd, int):
+
+        def cap(policy, degree):
+            decision["caps"].append({"policy": policy, "degree": degree})
+            logger.info("quadrature_degree: {} capped by {} --> {}".format(qd, policy, degree))
+            return degree
+
+        # Integrands with e.g. division by or functions of non-constant
+        # values are not polynomials, the estimated degree is only a guess
+        nonpolynomial_degree = int(parameters.get("nonpolynomial_quadrature_degree", -1))
+        if 0 <= nonpolynomial_degree < qd and _is_nonpolynomial(integral.integrand()):
+            qd = cap("nonpolynomial_quadrature_degree", nonpolynomial_degree)
+
+        max_degree = _max_quadrature_degree(parameters, cell.cellname())
+        if max_degree is not None and qd > max_degree:
+            qd = cap("max_quadrature_degree", max_degree)
+
+        # Lower the degree until the cost is within budget, but not
+        # below the degree of the product of the arguments. Custom
+        # integrals get their points at runtime and have no cost here
+        budget = int(parameters.get("quadrature_cost_budget", 0))
+        if budget > 0 and integral_type not in custom_integral_types:
+            arguments = extract_arguments(integral.integrand())
+            min_degree = min(qd, sum(_element_degree(a.ufl_element()) for a in arguments))
+            degree = qd
+            while (degree > min_degree
+                   and _quadrature_cost(integral_type, cell, degree, qr, arguments) > budget):
+                degree -= 1
+            if degree < qd:
+                qd = cap("quadrature_cost_budget", degree)
+    elif isinstance(qd, int):
         if qd >= 0:
             logger.info("quadrature_degree: {}".format(qd))
         else:
@@ -312,7 +527,76 @@ def _autoselect_quadrature_degree(integral_metadata, integral, form_data):
     tdim = integral.ufl_domain().topological_dimension()
     _check_quadrature_degree(qd, tdim)
 
-    return qd
+    decision["degree"] = qd
+    if parameters.get("quadrature_report") and integral_type not in custom_integral_types:
+        arguments = extract_arguments(integral.integrand())
+        decision["num_points"] = _num_quadrature_points(integral_type, cell, qd, qr)
+        decision["cost"] = _quadrature_cost(integral_type, cell, qd, qr, arguments)
+
+    return qd, decision
+
+
+def _element_degree(element):
+    """Get the polynomial degree of element, the maximum over the
+    factors of a tensor product element, or 0 if not given."""
+    degree = element.degree()
+    if isinstance(degree, tuple):
+        degree = max([d for d in degree if d is not None], default=None)
+    return degree or 0
+
+
+def _is_nonpolynomial(expr):
+    """Check if expression has operators making it a non-polynomial
+    function of the reference coordinates."""
+    for o in unique_pre_traversal(expr):
+        if isinstance(o, (MathFunction, Atan2, Abs, Conditional, MinValue, MaxValue)):
+            return True
+        elif isinstance(o, Division):
+            if not is_cellwise_constant(o.ufl_operands[1]):
+                return True
+        elif isinstance(o, Power):
+            f, g = o.ufl_operands
+            if not (isinstance(g, ScalarValue) and float(g) >= 0 and float(g) == int(float(g))):
+                return True
+    return False
+
+
+def _max_quadrature_degree(parameters, cellname):
+    """Get the maximum automatic quadrature degree for cell type from
+    parameter max_quadrature_degree, given as one degree for all cells
+    or as e.g. "triangle:8,tetrahedron:6", or None for no maximum."""
+    value = parameters.get("max_quadrature_degree")
+    if value in ("", None, -1):
+        return None
+    if isinstance(value, dict):
+        degree = value.get(cellname)
+        return None if degree is None else int(degree)
+    degrees = {}
+    for item in str(value).split(","):
+        if ":" in item:
+            name, degree = item.split(":")
+            degrees[name.strip()] = int(degree)
+        else:
+            degrees[None] = int(item)
+    return degrees.get(cellname, degrees.get(None))
+
+
+def _num_quadrature_points(integral_type, cell, degree, rule):
+    """Number of points of the quadrature rule for an integral."""
+    points, weights = create_quadrature_points_and_weights(integral_type, cell, degree, rule)
+    return len(weights)
+
+
+def _quadrature_cost(integral_type, cell, degree, rule, arguments):
+    """Estimate the cost of an integral as the number of quadrature
+    points times the size of the element tensor."""
+    cost = _num_quadrature_points(integral_type, cell, degree, rule)
+    for a in arguments:
+        dim = create_element(a.ufl_element()).space_dimension()
+        if integral_type.startswith("interior_facet"):
+            dim *= 2
+        cost *= dim
+    return cost
 
 
 def _check_quadrature_degree(degree, top_dim):
@@ -442,6 +726,7 @@ def _attach_integral_metadata(form_data, form_r_family, parameters):
 
     # Iterate over integral collections
     quad_schemes = []
+    quadrature_decisions = []
     for ida in form_data.integral_data:
         # Iterate over integrals
 
@@ -469,9 +754,11 @@ def _attach_integral_metadata(form_data, form_r_family, parameters):
         # Determine automated updates to metadata values
         for i, integral in enumerate(ida.integrals):
             qr = _autoselect_quadrature_rule(integral_metadatas[i], integral, form_data)
-            qd = _autoselect_quadrature_degree(integral_metadatas[i], integral, form_data)
             integral_metadatas[i]["quadrature_rule"] = qr
+            qd, decision = _autoselect_quadrature_degree(integral_metadatas[i], integral, form_data,
+                                                         parameters)
             integral_metadatas[i]["quadrature_degree"] = qd
+            quadrature_decisions.append(decision)
 
         # Extract common metadata for integral collection
         qr = _extract_common_quadrature_rule(integral_metadatas)
@@ -490,12 +777,27 @@ def _attach_integral_metadata(form_data, form_r_family, parameters):
         # Collect all quad schemes
         quad_schemes.extend([md["quadrature_rule"] for md in integral_metadatas])
 
+    # Record the quadrature degree decisions for the quadrature report
+    form_data.quadrature_decisions = quadrature_decisions
+
     # Validate consistency of schemes for QuadratureElements
     # TODO: Can loosen up this a bit, only needs to be consistent
     # with the integrals that the elements are used in
     _validate_quadrature_schemes_of_elements(quad_schemes, form_data.unique_sub_elements)
 
 
+def write_quadrature_report(form_datas, filename):
+    """Write the quadrature degree decisions for the integrals of the
+    analyzed forms to a JSON file, as a list with one record per
+    integral."""
+    report = []
+    for i, form_data in enumerate(form_datas):
+        for decision in form_data.quadrature_decisions:
+            report.append(dict(decision, form=i))
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+
+
 def _validate_quadrature_schemes_of_elements(quad_schemes, elements):
     # Update scheme for QuadratureElements
     if quad_schemes and utils.all_equal(quad_schemes):
@@ -536,9 +838,9 @@ def _find_compatible_representations(integrals, parameters):
     # All representations
     compatible = set(("uflacs", "tsfc"))
 
-    # UFLACS and TSFC do not have custom integrals
+    # TSFC does not have custom integrals
     if _has_custom_integrals(integrals):
-        compatible &= set()
+        compatible &= set(("uflacs",))
 
     # UFLACS does not have complex numbers yet
     if "complex" in parameters.get("scalar_type", "double"):
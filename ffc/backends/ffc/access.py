@@ -31,6 +31,9 @@ class FFCBackendAccess(MultiFunction):
         self.symbols = symbols
         self.parameters = parameters
 
+        # Restrictions of the ufc_affine_geometry blocks accessed
+        self.affine_geometry_restrictions = set()
+
     # === Rules for all modified terminal types ===
 
     def expr(self, e, mt, tabledata, num_points):
@@ -177,6 +180,22 @@ class FFCBackendAccess(MultiFunction):
             raise FFCError("Not expecting average of Jacobian.")
         return self.symbols.J_component(mt)
 
+    def jacobian_determinant(self, e, mt, tabledata, num_points):
+        # Only preserved for affine simplex cells, read from the cell geometry
+        if mt.global_derivatives or mt.local_derivatives or mt.averaged:
+            raise FFCError("Not expecting derivatives or average of Jacobian determinant.")
+        self.affine_geometry_restrictions.add(mt.restriction)
+        return self.symbols.affine_geometry_member("detJ", mt.restriction)
+
+    def jacobian_inverse(self, e, mt, tabledata, num_points):
+        # Only preserved for affine simplex cells, read from the cell geometry
+        if mt.global_derivatives or mt.local_derivatives or mt.averaged:
+            raise FFCError("Not expecting derivatives or average of Jacobian inverse.")
+        self.affine_geometry_restrictions.add(mt.restriction)
+        gdim = mt.terminal.ufl_domain().geometric_dimension()
+        i, j = mt.component
+        return self.symbols.affine_geometry_member("K", mt.restriction)[i * gdim + j]
+
     def reference_cell_volume(self, e, mt, tabledata, access):
         L = self.language
         cellname = mt.terminal.ufl_domain().ufl_cell().cellname()
@@ -366,8 +385,6 @@ class FFCBackendAccess(MultiFunction):
 
     facet_normal = _expect_symbolic_lowering
     cell_normal = _expect_symbolic_lowering
-    jacobian_inverse = _expect_symbolic_lowering
-    jacobian_determinant = _expect_symbolic_lowering
     facet_jacobian = _expect_symbolic_lowering
     facet_jacobian_inverse = _expect_symbolic_lowering
     facet_jacobian_determinant = _expect_symbolic_lowering
@@ -8,6 +8,7 @@
 
 import ffc.uflacs.language.cnodes
 from ffc.uflacs.language.ufl_to_cnodes import UFL2CNodesTranslatorCpp
+from ffc.backends.ffc.common import scalar_typenames
 from ffc.backends.ffc.symbols import FFCBackendSymbols
 from ffc.backends.ffc.access import FFCBackendAccess
 from ffc.backends.ffc.definitions import FFCBackendDefinitions
@@ -22,6 +23,9 @@ class FFCBackend(object):
         self.language = ffc.uflacs.language.cnodes
         self.ufl_to_language = UFL2CNodesTranslatorCpp(self.language)
 
+        # C types of scalar values and of geometry computations
+        self.scalar_type, self.geometry_type = scalar_typenames(parameters)
+
         coefficient_numbering = ir["coefficient_numbering"]
         self.symbols = FFCBackendSymbols(self.language, coefficient_numbering)
         self.definitions = FFCBackendDefinitions(ir, self.language,
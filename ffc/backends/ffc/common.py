@@ -51,3 +51,14 @@ def ufc_restriction_offset(restriction, length):
         return length
     else:
         return 0
+
+
+def scalar_typenames(parameters):
+    """Get the C types of element tensor, coefficient and table values,
+    and of geometry computations, for the scalar_type and
+    mixed_precision parameters."""
+    if parameters.get("scalar_type", "double") == "float":
+        if parameters.get("mixed_precision"):
+            return "float", "double"
+        return "float", "float"
+    return "double", "double"
@@ -8,7 +8,7 @@
 
 import logging
 
-from ffc.backends.ffc.common import num_coordinate_component_dofs
+from ffc.backends.ffc.common import num_coordinate_component_dofs, scalar_typenames
 from ufl.corealg.multifunction import MultiFunction
 from ufl.measure import custom_integral_types
 
@@ -27,6 +27,7 @@ class FFCBackendDefinitions(MultiFunction):
         self.language = language
         self.symbols = symbols
         self.parameters = parameters
+        self.scalar_type, self.geometry_type = scalar_typenames(parameters)
 
     # === Generate code to define variables for ufl types ===
 
@@ -81,13 +82,13 @@ class FFCBackendDefinitions(MultiFunction):
                 for i, idof in enumerate(tabledata.dofmap)
             ]
             value = L.Sum(values)
-            code = [L.VariableDecl("const double", access, value)]
+            code = [L.VariableDecl("const " + self.scalar_type, access, value)]
         else:
             # Loop to accumulate linear combination of dofs and tables
             ic = self.symbols.coefficient_dof_sum_index()
             dof_access = self.symbols.coefficient_dof_access(mt.terminal, ic + begin)
             code = [
-                L.VariableDecl("double", access, 0.0),
+                L.VariableDecl(self.scalar_type, access, 0.0),
                 L.ForRange(ic, 0, end - begin, body=[L.AssignAdd(access, dof_access * FE[ic])])
             ]
         return code
@@ -120,7 +121,7 @@ class FFCBackendDefinitions(MultiFunction):
         # Inlined version (we know this is bounded by a small number)
         dof_access = self.symbols.domain_dofs_access(gdim, num_scalar_dofs, mt.restriction)
         value = L.Sum([dof_access[idof] * FE[i] for i, idof in enumerate(tabledata.dofmap)])
-        code = [L.VariableDecl("const double", access, value)]
+        code = [L.VariableDecl("const " + self.geometry_type, access, value)]
 
         return code
 
@@ -180,7 +181,7 @@ class FFCBackendDefinitions(MultiFunction):
         L = self.language
         co = self.symbols.cell_orientation_argument(mt.restriction)
         expr = L.Conditional(L.EQ(co, L.LiteralInt(1)), L.LiteralFloat(-1.0), L.LiteralFloat(+1.0))
-        code = [L.VariableDecl("const double", access, expr)]
+        code = [L.VariableDecl("const " + self.geometry_type, access, expr)]
         return code
 
     def _expect_table(self, e, mt, tabledata, num_points, access):
@@ -210,10 +211,16 @@ class FFCBackendDefinitions(MultiFunction):
         """These quantities are expected to be replaced in symbolic preprocessing."""
         logging.exception("Expecting {0} to be replaced in symbolic preprocessing.".format(type(e)))
 
+    def _expect_affine_geometry(self, e, mt, tabledata, num_points, access):
+        """These quantities are only preserved for affine simplex cells,
+        and read from the cell geometry."""
+        return []
+
+    jacobian_inverse = _expect_affine_geometry
+    jacobian_determinant = _expect_affine_geometry
+
     facet_normal = _expect_symbolic_lowering
     cell_normal = _expect_symbolic_lowering
-    jacobian_inverse = _expect_symbolic_lowering
-    jacobian_determinant = _expect_symbolic_lowering
     facet_jacobian = _expect_symbolic_lowering
     facet_jacobian_inverse = _expect_symbolic_lowering
     facet_jacobian_determinant = _expect_symbolic_lowering
@@ -69,6 +69,19 @@ class FFCBackendSymbols(object):
         """Symbol for the element tensor itself."""
         return self.S("A")
 
+    def workspace(self):
+        """Symbol for the caller provided workspace of temporary arrays."""
+        return self.S("workspace")
+
+    def affine_geometry(self, restriction):
+        """Pointer to the cell constant geometry of an affine simplex cell."""
+        return self.S("geometry" + ufc_restriction_postfix(restriction))
+
+    def affine_geometry_member(self, name, restriction):
+        """Member of the cell constant geometry, as a plain symbol since
+        the language has no struct member access."""
+        return self.S("geometry{0}->{1}".format(ufc_restriction_postfix(restriction), name))
+
     def entity(self, entitytype, restriction):
         """Entity index for lookup in element tables."""
         if entitytype == "cell":
@@ -140,6 +153,10 @@ class FFCBackendSymbols(object):
         # FIXME: Add domain number!
         return self.S(format_mt_name("J", mt))
 
+    def coordinate_dofs_argument(self, restriction):
+        """Coordinate dofs argument in ufc."""
+        return self.S("coordinate_dofs" + ufc_restriction_postfix(restriction))
+
     def domain_dof_access(self, dof, component, gdim, num_scalar_dofs, restriction):
         # FIXME: Add domain number or offset!
         vc = self.S("coordinate_dofs" + ufc_restriction_postfix(restriction))
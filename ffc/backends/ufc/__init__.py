@@ -5,8 +5,11 @@ __author__ = "FEniCS Project"
 __version__ = "2018.2.0.dev0"
 __license__ = "This code is released into the public domain"
 
-import os
+import functools
 import hashlib
+import os
+import shlex
+import subprocess
 
 # Get abspath on import, it can in some cases be a relative path w.r.t.
 # curdir on startup
@@ -21,7 +24,7 @@ def get_include_path():
 def _compute_signature():
     # Compute signature of ufc header files
     h = hashlib.sha1()
-    for fn in ("ufc.h", "ufc_geometry.h"):
+    for fn in ("ufc.h", "ufc_geometry.h", "ufc_gemm.h"):
         with open(os.path.join(get_include_path(), fn)) as f:
             h.update(f.read().encode("utf-8"))
     return h.hexdigest()
@@ -31,8 +34,52 @@ _signature = _compute_signature()
 
 
 def get_signature():
-    """Return SHA-1 hash of the contents of ufc.h and ufc_geometry.h.
+    """Return SHA-1 hash of the contents of ufc.h, ufc_geometry.h and ufc_gemm.h.
 
     In this implementation, the value is computed on import.
     """
     return _signature
+
+
+# Extra C compiler flags of the JIT build profiles. The "pgo" profile
+# builds twice, first with profiling instrumentation for a training run
+# and then using the recorded profiles, which only the cffi JIT does.
+_build_profile_flags = {
+    "portable": (),
+    "native": ("-march=native", "-ffast-math"),
+    "pgo": (),
+}
+
+
+def get_build_profile_flags(profile):
+    """Return list of extra C compiler flags of JIT build profile
+    "portable", "native" or "pgo"."""
+    if profile not in _build_profile_flags:
+        raise ValueError("Unknown build profile \"{}\", expecting one of {}.".format(
+            profile, sorted(_build_profile_flags)))
+    return list(_build_profile_flags[profile])
+
+
+@functools.lru_cache()
+def get_compiler_identity(cc, flags=()):
+    """Return string identifying C compiler command cc by its version,
+    and the target selected by -march=native if in flags, for keeping
+    binaries of different compilers and machines apart. Returns cc if
+    the compiler can not be run."""
+    def run(args):
+        try:
+            result = subprocess.run(shlex.split(cc) + list(args), stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, universal_newlines=True)
+        except OSError:
+            return ""
+        return result.stdout if result.returncode == 0 else ""
+
+    version = run(["--version"]).split("\n")[0]
+    identity = [cc, version]
+    if "-march=native" in flags:
+        # GCC reports the resolved target, other compilers fail
+        for line in run(["-march=native", "-Q", "--help=target"]).split("\n"):
+            option = line.split()
+            if len(option) == 2 and option[0] == "-march=":
+                identity.append("-march=" + option[1])
+    return ";".join(identity)
@@ -13,6 +13,13 @@ from ffc.backends.ufc.utils import generate_return_new
 
 index_type = "int64_t"
 
+# Number of points iterated in lockstep by compute_reference_coordinates_batched
+newton_block_size = 32
+
+# Number of cells per block in the multi-cell geometry functions, with
+# the cells of a block as the innermost (vectorized) array dimension
+cell_block_size = 16
+
 # Code generation utilities:
 
 
@@ -139,6 +146,73 @@ def generate_assign_inverse(L, K, J, detJ, gdim, tdim):
             return L.StatementList(code)
 
 
+def is_affine_simplex(ir):
+    """Check if the coordinate mapping is affine on a simplex, with
+    constant J on each cell."""
+    return (ir["coordinate_element_degree"] == 1
+            and ir["cell_shape"] in ("interval", "triangle", "tetrahedron"))
+
+
+def _table_sum(L, coefficients, values):
+    """Return the expression sum_k coefficients[k]*values[k], skipping
+    zero coefficients."""
+    terms = [
+        L.float_product([L.LiteralFloat(float(c)), v]) for c, v in zip(coefficients, values)
+        if c != 0.0
+    ]
+    if not terms:
+        return L.LiteralFloat(0.0)
+    return L.Sum(terms) if len(terms) > 1 else terms[0]
+
+
+def generate_affine_geometry(L, ir, x0, J, detJ, K, coordinate_dofs, cell_orientation):
+    """Generate closed form computation of the cell constant geometry
+    of an affine simplex cell. Any of x0[gdim], J[gdim][tdim], detJ and
+    K[tdim][gdim] may be None if not needed, detJ being required for K."""
+    gdim = ir["geometric_dimension"]
+    tdim = ir["topological_dimension"]
+    num_dofs = ir["num_scalar_coordinate_element_dofs"]
+
+    # Constant basis values and derivatives at X=0, for P1 these are
+    # the vertex coordinates and differences of vertex coordinates
+    from ffc.uflacs.elementtables import clamp_table_small_numbers
+    x_table = clamp_table_small_numbers(ir["tables"]["x0"])
+    J_table = clamp_table_small_numbers(ir["tables"]["J0"])
+
+    code = []
+    if x0 is not None:
+        code += [
+            L.Assign(x0[i], _table_sum(L, x_table, [coordinate_dofs[d, i] for d in range(num_dofs)]))
+            for i in range(gdim)
+        ]
+    if J is None:
+        return code
+    code += [
+        L.Assign(J[i, j],
+                 _table_sum(L, J_table[j], [coordinate_dofs[d, i] for d in range(num_dofs)]))
+        for i in range(gdim) for j in range(tdim)
+    ]
+
+    if detJ is None:
+        return code
+    orientation_scaling = L.Conditional(L.EQ(cell_orientation, 1), -1.0, +1.0)
+    if gdim == tdim:
+        code += [L.Assign(detJ, det_nn(J, gdim))]
+    elif tdim == 1:
+        code += [L.Assign(detJ, orientation_scaling * pdet_m1(L, J, gdim))]
+    else:
+        # Scoped, the pseudo-inverse declares its own JTJ
+        JTJ = L.Symbol("JTJ")
+        code += [L.Scope([
+            generate_compute_ATA(L, JTJ, J, gdim, tdim),
+            L.Assign(detJ, orientation_scaling * L.Sqrt(det_nn(JTJ, tdim))),
+        ])]
+
+    if K is not None:
+        code += [generate_assign_inverse(L, K, J, detJ, gdim, tdim)]
+    return code
+
+
 def cell_shape(L, ir):
     name = ir["cell_shape"]
     return L.Return(L.Symbol("ufc::shape::" + name))
@@ -206,6 +280,27 @@ def compute_physical_coordinates(L, ir):
     # Input geometry
     X = L.FlattenedArray(L.Symbol("X"), dims=(num_points, tdim))
 
+    if is_affine_simplex(ir):
+        # Affine simplex cell, x = x0 + J X
+        x0 = L.Symbol("x0")
+        Jsym = L.Symbol("J")
+        J = L.FlattenedArray(Jsym, dims=(gdim, tdim))
+        j = L.Symbol("j")
+        code = [
+            L.ArrayDecl("double", x0, (gdim, )),
+            L.ArrayDecl("double", Jsym, (gdim * tdim, )),
+        ] + generate_affine_geometry(L, ir, x0, J, None, None, coordinate_dofs, None) + [
+            L.ForRanges(
+                (ip, 0, num_points), (i, 0, gdim),
+                index_type=index_type,
+                body=[
+                    L.Assign(x[ip, i], x0[i]),
+                    L.ForRange(j, 0, tdim, index_type=index_type,
+                               body=L.AssignAdd(x[ip, i], J[i, j] * X[ip, j])),
+                ]),
+        ]
+        return code
+
     # Computing table one point at a time instead of
     # using num_points to avoid dynamic allocation
     one_point = 1
@@ -310,6 +405,25 @@ def _compute_reference_coordinates_affine(L, ir, output_all=False):
             L.ArrayDecl("double", Ksym, sizes=(tdim * gdim, )),
         ]
 
+    # For more convenient indexing
+    J = L.FlattenedArray(Jsym, dims=(gdim, tdim))
+    K = L.FlattenedArray(Ksym, dims=(tdim, gdim))
+
+    if is_affine_simplex(ir):
+        # Closed form x0, J, detJ and K, and X = K*(x-x0) for each
+        # physical point x
+        x0 = L.Symbol("x0")
+        code = init_input + decls + [L.ArrayDecl("double", x0, sizes=(gdim, ))]
+        code += generate_affine_geometry(L, ir, x0, J, detJsym[0], K, coordinate_dofs,
+                                         cell_orientation)
+        code += [
+            L.ForRanges(
+                (ip, 0, num_points), (j, 0, tdim), (i, 0, gdim),
+                index_type=index_type,
+                body=L.AssignAdd(X[ip, j], K[j, i] * (x[ip, i] - x0[i])))
+        ]
+        return code
+
     # Tables of coordinate basis function values and derivatives at X=0
     # and X=midpoint available through ir. This is useful in several
     # geometry functions.
@@ -347,10 +461,6 @@ def _compute_reference_coordinates_affine(L, ir, output_all=False):
             body=L.AssignAdd(x0[i], coordinate_dofs[k, i] * phi_X0[k])),
     ]
 
-    # For more convenient indexing
-    J = L.FlattenedArray(Jsym, dims=(gdim, tdim))
-    K = L.FlattenedArray(Ksym, dims=(tdim, gdim))
-
     # Compute J = J(X=0) (optimized by precomputing basis at X=0)
     compute_J0 = [
         L.ForRanges(
@@ -595,6 +705,545 @@ def _compute_reference_coordinates_newton(L, ir, output_all=False):
     return code
 
 
+def _generate_cell_block_loop(L, body):
+    """Generate loop over blocks of cell_block_size cells, with
+    cell_begin and num_block_cells defined for the body."""
+    num_cells = L.Symbol("num_cells")
+    iblock = L.Symbol("iblock")
+    cell_begin = L.Symbol("cell_begin")
+    block_cells = L.Symbol("num_block_cells")
+    B = cell_block_size
+    return L.ForRange(
+        iblock,
+        0,
+        (num_cells + (B - 1)) / B,
+        index_type="int",
+        body=[
+            L.VariableDecl("const int", cell_begin, iblock * B),
+            L.VariableDecl("const int", block_cells,
+                           L.Conditional(L.LT(num_cells - cell_begin, B),
+                                         num_cells - cell_begin, B)),
+        ] + body)
+
+
+def _generate_transpose_coordinate_dofs(L, ir, cdb):
+    """Generate code copying the coordinate dofs of the cells of a block
+    into cdb[num_dofs * gdim][cell_block_size]."""
+    num_dofs = ir["num_scalar_coordinate_element_dofs"]
+    gdim = ir["geometric_dimension"]
+    coordinate_dofs = L.FlattenedArray(
+        L.Symbol("coordinate_dofs"), dims=(L.Symbol("num_cells"), num_dofs * gdim))
+    cdbf = L.FlattenedArray(cdb, dims=(num_dofs * gdim, cell_block_size))
+    b = L.Symbol("b")
+    k = L.Symbol("k")
+    return [
+        L.Comment("Copy coordinate dofs of the block, with cells as the last dimension"),
+        L.ForRanges(
+            (b, 0, L.Symbol("num_block_cells")), (k, 0, num_dofs * gdim),
+            index_type="int",
+            body=L.Assign(cdbf[k, b], coordinate_dofs[L.Symbol("cell_begin") + b, k])),
+    ]
+
+
+def _generate_cell_block_sums(L, ir, values, cdb, coefficients):
+    """Generate code computing, for all cells b of a block,
+
+        values[i][j][b] = sum_d cdb[d][i][b] * coefficients[j][d]
+
+    with the sums over the coordinate dofs d unrolled and zero
+    coefficients skipped."""
+    num_dofs = ir["num_scalar_coordinate_element_dofs"]
+    gdim = ir["geometric_dimension"]
+    ncols = len(coefficients)
+    B = cell_block_size
+    valuesf = L.FlattenedArray(values, dims=(gdim, ncols, B))
+    cdbf = L.FlattenedArray(cdb, dims=(num_dofs, gdim, B))
+    b = L.Symbol("b")
+    code = []
+    for i in range(gdim):
+        for j in range(ncols):
+            terms = []
+            for d in range(num_dofs):
+                c = coefficients[j][d]
+                if isinstance(c, float):
+                    if c == 0.0:
+                        continue
+                    c = L.LiteralFloat(c)
+                terms.append(L.float_product([cdbf[d, i, b], c]))
+            if not terms:
+                value = L.LiteralFloat(0.0)
+            elif len(terms) == 1:
+                value = terms[0]
+            else:
+                value = L.Sum(terms)
+            code.append(
+                L.ForRange(b, 0, B, index_type="int", body=L.Assign(valuesf[i, j, b], value)))
+    return code
+
+
+def compute_physical_coordinates_cells(L, ir):
+    num_dofs = ir["num_scalar_coordinate_element_dofs"]
+    scalar_coordinate_element_classname = ir["scalar_coordinate_finite_element_classname"]
+
+    # Dimensions
+    gdim = ir["geometric_dimension"]
+    tdim = ir["topological_dimension"]
+    num_points = L.Symbol("num_points")
+    B = cell_block_size
+
+    # Loop indices
+    ip = L.Symbol("ip")
+    i = L.Symbol("i")
+    b = L.Symbol("b")
+
+    # Output geometry
+    x = L.FlattenedArray(L.Symbol("x"), dims=(L.Symbol("num_cells"), num_points, gdim))
+
+    # Input geometry
+    X = L.FlattenedArray(L.Symbol("X"), dims=(num_points, tdim))
+
+    # Local arrays for the cells of a block
+    phi = L.Symbol("phi")
+    cdb = L.Symbol("coordinate_dofs_block")
+    xb = L.Symbol("x_block")
+    xbf = L.FlattenedArray(xb, dims=(gdim, B))
+
+    block_code = _generate_transpose_coordinate_dofs(L, ir, cdb) + [
+        L.ForRange(
+            ip,
+            0,
+            num_points,
+            index_type="int",
+            body=[
+                L.Comment("Compute basis values of coordinate element"),
+                L.Call("evaluate_reference_basis_{}".format(scalar_coordinate_element_classname),
+                       (phi, 1, L.AddressOf(X[ip, 0]))),
+                L.Comment("Compute x for all cells of the block"),
+                _generate_cell_block_sums(L, ir, xb, cdb, [[phi[d] for d in range(num_dofs)]]),
+                L.ForRanges(
+                    (b, 0, L.Symbol("num_block_cells")), (i, 0, gdim),
+                    index_type="int",
+                    body=L.Assign(x[L.Symbol("cell_begin") + b, ip, i], xbf[i, b])),
+            ]),
+    ]
+
+    code = [
+        L.ArrayDecl("double", phi, (num_dofs, )),
+        L.ArrayDecl("double", cdb, (num_dofs * gdim * B, ), values=0.0),
+        L.ArrayDecl("double", xb, (gdim * B, )),
+        _generate_cell_block_loop(L, block_code),
+    ]
+    return code
+
+
+def compute_jacobians_cells(L, ir):
+    num_dofs = ir["num_scalar_coordinate_element_dofs"]
+    scalar_coordinate_element_classname = ir["scalar_coordinate_finite_element_classname"]
+    degree = ir["coordinate_element_degree"]
+
+    # Dimensions
+    gdim = ir["geometric_dimension"]
+    tdim = ir["topological_dimension"]
+    num_points = L.Symbol("num_points")
+    B = cell_block_size
+
+    # Loop indices
+    ip = L.Symbol("ip")
+    i = L.Symbol("i")
+    j = L.Symbol("j")
+    b = L.Symbol("b")
+
+    # Output geometry
+    J = L.FlattenedArray(L.Symbol("J"), dims=(L.Symbol("num_cells"), num_points, gdim, tdim))
+
+    # Input geometry
+    X = L.FlattenedArray(L.Symbol("X"), dims=(num_points, tdim))
+
+    # Local arrays for the cells of a block
+    dphi = L.Symbol("dphi")
+    cdb = L.Symbol("coordinate_dofs_block")
+    Jb = L.Symbol("J_block")
+    Jbf = L.FlattenedArray(Jb, dims=(gdim, tdim, B))
+
+    copy_J = L.ForRanges(
+        (b, 0, L.Symbol("num_block_cells")), (i, 0, gdim), (j, 0, tdim),
+        index_type="int",
+        body=L.Assign(J[L.Symbol("cell_begin") + b, ip, i, j], Jbf[i, j, b]))
+
+    decls = [
+        L.ArrayDecl("double", cdb, (num_dofs * gdim * B, ), values=0.0),
+        L.ArrayDecl("double", Jb, (gdim * tdim * B, )),
+    ]
+
+    if degree == 1:
+        # Affine mapping, J is the same at all points and computed
+        # from the constant basis derivatives
+        from ffc.uflacs.elementtables import clamp_table_small_numbers
+        J_table = clamp_table_small_numbers(ir["tables"]["J0"])
+        coefficients = [[float(J_table[jj, d]) for d in range(num_dofs)] for jj in range(tdim)]
+        block_code = _generate_transpose_coordinate_dofs(L, ir, cdb) + [
+            L.Comment("Compute J for all cells of the block"),
+            _generate_cell_block_sums(L, ir, Jb, cdb, coefficients),
+            L.ForRange(ip, 0, num_points, index_type="int", body=copy_J),
+        ]
+    else:
+        dphif = L.FlattenedArray(dphi, dims=(num_dofs, tdim))
+        coefficients = [[dphif[d, jj] for d in range(num_dofs)] for jj in range(tdim)]
+        decls += [L.ArrayDecl("double", dphi, (num_dofs * tdim, ))]
+        block_code = _generate_transpose_coordinate_dofs(L, ir, cdb) + [
+            L.ForRange(
+                ip,
+                0,
+                num_points,
+                index_type="int",
+                body=[
+                    L.Comment("Compute basis derivatives of coordinate element"),
+                    L.Call("evaluate_reference_basis_derivatives_{}".format(
+                        scalar_coordinate_element_classname), (dphi, 1, 1, L.AddressOf(X[ip, 0]))),
+                    L.Comment("Compute J for all cells of the block"),
+                    _generate_cell_block_sums(L, ir, Jb, cdb, coefficients),
+                    copy_J,
+                ]),
+        ]
+
+    return decls + [_generate_cell_block_loop(L, block_code)]
+
+
+def compute_jacobian_determinants_cells(L, ir):
+    # Dimensions
+    gdim = ir["geometric_dimension"]
+    tdim = ir["topological_dimension"]
+    num_points = L.Symbol("num_points")
+    num_cells = L.Symbol("num_cells")
+
+    # Loop indices
+    ip = L.Symbol("ip")
+
+    # Output geometry
+    detJ = L.Symbol("detJ")[ip]
+
+    # Input geometry
+    J = L.FlattenedArray(L.Symbol("J"), dims=(num_cells * num_points, gdim, tdim))
+    cell_orientations = L.Symbol("cell_orientations")
+    orientation_scaling = L.Conditional(
+        L.EQ(cell_orientations[ip / num_points], 1), -1.0, +1.0)
+
+    # Assign det expression to detJ, the points of all cells are contiguous
+    if gdim == tdim:
+        body = L.Assign(detJ, det_nn(J[ip], gdim))
+    elif tdim == 1:
+        body = L.Assign(detJ, orientation_scaling * pdet_m1(L, J[ip], gdim))
+    else:
+        JTJ = L.Symbol("JTJ")
+        body = [
+            generate_compute_ATA(L, JTJ, J[ip], gdim, tdim),
+            L.Assign(detJ, orientation_scaling * L.Sqrt(det_nn(JTJ, tdim))),
+        ]
+
+    # Carry out for all points of all cells
+    code = L.ForRange(ip, 0, num_cells * num_points, index_type=index_type, body=body)
+    return code
+
+
+def compute_jacobian_inverses_cells(L, ir):
+    classname = ir["classname"]
+
+    # The inverses are independent of the cells, so the points of all
+    # cells are treated as one contiguous array of points
+    num_points = L.Symbol("num_points")
+    num_cells = L.Symbol("num_cells")
+    code = [
+        L.Call("compute_jacobian_inverses_{}".format(classname),
+               (L.Symbol("K"), num_cells * num_points, L.Symbol("J"), L.Symbol("detJ"))),
+    ]
+    return code
+
+
+def compute_geometry_cells(L, ir):
+    # Class name
+    classname = ir["classname"]
+
+    # Output geometry
+    x = L.Symbol("x")
+    J = L.Symbol("J")
+    detJ = L.Symbol("detJ")
+    K = L.Symbol("K")
+
+    # Dimensions
+    num_cells = L.Symbol("num_cells")
+    num_points = L.Symbol("num_points")
+
+    # Input geometry
+    X = L.Symbol("X")
+
+    # Input cell data
+    coordinate_dofs = L.Symbol("coordinate_dofs")
+    cell_orientations = L.Symbol("cell_orientations")
+
+    # Just chain calls to other functions here
+    code = [
+        L.Call("compute_physical_coordinates_cells_{}".format(classname),
+               (x, num_cells, num_points, X, coordinate_dofs)),
+        L.Call("compute_jacobians_cells_{}".format(classname),
+               (J, num_cells, num_points, X, coordinate_dofs)),
+        L.Call("compute_jacobian_determinants_cells_{}".format(classname),
+               (detJ, num_cells, num_points, J, cell_orientations)),
+        L.Call("compute_jacobian_inverses_cells_{}".format(classname),
+               (K, num_cells, num_points, J, detJ)),
+    ]
+
+    return code
+
+
+def compute_midpoint_geometry_cells(L, ir):
+    # Dimensions
+    gdim = ir["geometric_dimension"]
+    tdim = ir["topological_dimension"]
+    num_dofs = ir["num_scalar_coordinate_element_dofs"]
+    B = cell_block_size
+
+    # Constant basis values and derivatives at the midpoint
+    from ffc.uflacs.elementtables import clamp_table_small_numbers
+    xm_table = clamp_table_small_numbers(ir["tables"]["xm"])
+    Jm_table = clamp_table_small_numbers(ir["tables"]["Jm"])
+
+    # Loop indices
+    i = L.Symbol("i")
+    j = L.Symbol("j")
+    b = L.Symbol("b")
+
+    # Output geometry
+    num_cells = L.Symbol("num_cells")
+    x = L.FlattenedArray(L.Symbol("x"), dims=(num_cells, gdim))
+    J = L.FlattenedArray(L.Symbol("J"), dims=(num_cells, gdim, tdim))
+
+    # Local arrays for the cells of a block
+    cdb = L.Symbol("coordinate_dofs_block")
+    xb = L.Symbol("x_block")
+    Jb = L.Symbol("J_block")
+    xbf = L.FlattenedArray(xb, dims=(gdim, B))
+    Jbf = L.FlattenedArray(Jb, dims=(gdim, tdim, B))
+
+    cell = L.Symbol("cell_begin") + b
+    block_code = _generate_transpose_coordinate_dofs(L, ir, cdb) + [
+        L.Comment("Compute x and J for all cells of the block"),
+        _generate_cell_block_sums(L, ir, xb, cdb, [[float(xm_table[d]) for d in range(num_dofs)]]),
+        _generate_cell_block_sums(L, ir, Jb, cdb,
+                                  [[float(Jm_table[jj, d]) for d in range(num_dofs)]
+                                   for jj in range(tdim)]),
+        L.ForRange(b, 0, L.Symbol("num_block_cells"), index_type="int", body=[
+            L.ForRange(i, 0, gdim, index_type="int", body=[
+                L.Assign(x[cell, i], xbf[i, b]),
+                L.ForRange(j, 0, tdim, index_type="int", body=L.Assign(J[cell, i, j], Jbf[i, j, b])),
+            ]),
+        ]),
+    ]
+
+    code = [
+        L.ArrayDecl("double", cdb, (num_dofs * gdim * B, ), values=0.0),
+        L.ArrayDecl("double", xb, (gdim * B, )),
+        L.ArrayDecl("double", Jb, (gdim * tdim * B, )),
+        _generate_cell_block_loop(L, block_code),
+    ]
+    return code
+
+
+def compute_reference_coordinates_batched(L, ir):
+    """Solves x(X) = x0 for X like compute_reference_coordinates, for
+    blocks of points at a time.
+
+    The Newton iterations of the points in a block are carried out in
+    lockstep, each iteration evaluating the geometry of all points of
+    the block that are not yet converged with one compute_geometry call.
+    The initial value is the affine approximation at the cell midpoint,
+    and a point is converged when |dX| < tolerance. The number of
+    iterations of each point, or -1 if not converged, is written to
+    num_iterations if not NULL. Returns the number of points not
+    converged within max_iterations.
+    """
+    classname = ir["classname"]
+    degree = ir["coordinate_element_degree"]
+
+    # Input and output arguments
+    X = L.Symbol("X")
+    num_points = L.Symbol("num_points")
+    x = L.Symbol("x")
+    coordinate_dofs = L.Symbol("coordinate_dofs")
+    cell_orientation = L.Symbol("cell_orientation")
+    tolerance = L.Symbol("tolerance")
+    max_iterations = L.Symbol("max_iterations")
+    num_iterations = L.Symbol("num_iterations")
+
+    if degree == 1:
+        # The affine mapping is inverted exactly
+        ip = L.Symbol("ip")
+        code = [
+            L.Call("compute_reference_coordinates_{}".format(classname),
+                   (X, num_points, x, coordinate_dofs, cell_orientation)),
+            L.If(num_iterations,
+                 L.ForRange(ip, 0, num_points, index_type="int",
+                            body=L.Assign(num_iterations[ip], 0))),
+            L.Return(0),
+        ]
+        return code
+
+    # Dimensions
+    gdim = ir["geometric_dimension"]
+    tdim = ir["topological_dimension"]
+    cellname = ir["cell_shape"]
+    block_size = newton_block_size
+
+    # Loop indices
+    iblock = L.Symbol("iblock")  # block
+    ib = L.Symbol("ib")  # point in block
+    ia = L.Symbol("ia")  # active point in block
+    ip = L.Symbol("ip")  # point
+    i = L.Symbol("i")  # gdim
+    j = L.Symbol("j")  # tdim
+    k = L.Symbol("k")  # iteration
+
+    # Wrap arguments as flattened arrays for convenient indexing
+    Xf = L.FlattenedArray(X, dims=(num_points, tdim))
+    xf = L.FlattenedArray(x, dims=(num_points, gdim))
+
+    # Symbols for arrays used below
+    xm = L.Symbol("xm")
+    Km = L.Symbol("Km")
+    J = L.Symbol("J")
+    detJ = L.Symbol("detJ")
+    Kmf = L.FlattenedArray(Km, dims=(tdim, gdim))
+
+    # Symbol for ufc_geometry cell midpoint definition
+    Xm = L.Symbol("%s_midpoint" % cellname)
+
+    # Iterates and geometry of the active points of a block
+    active = L.Symbol("active")
+    num_active = L.Symbol("num_active")
+    num_not_converged = L.Symbol("num_not_converged")
+    Xa = L.Symbol("Xa")
+    xa = L.Symbol("xa")
+    Ja = L.Symbol("Ja")
+    detJa = L.Symbol("detJa")
+    Ka = L.Symbol("Ka")
+    Xaf = L.FlattenedArray(Xa, dims=(block_size, tdim))
+    xaf = L.FlattenedArray(xa, dims=(block_size, gdim))
+    Kaf = L.FlattenedArray(Ka, dims=(block_size, tdim, gdim))
+    dX = L.Symbol("dX")
+    dX2 = L.Symbol("dX2")
+
+    block_begin = L.Symbol("block_begin")
+    block_points = L.Symbol("num_block_points")
+    num_failed = L.Symbol("num_failed")
+
+    # By computing x and K at the cell midpoint once, the initial value
+    # Xk = Xm + Km * (x - xm) is the affine approximation starting at
+    # the midpoint.
+    midpoint_geometry = [
+        L.Comment("Compute K = J^-1 and x at midpoint of cell"),
+        L.ArrayDecl("double", xm, (gdim, ), 0.0),
+        L.ArrayDecl("double", J, (gdim * tdim, ), 0.0),
+        L.ArrayDecl("double", detJ, (1, )),
+        L.ArrayDecl("double", Km, (tdim * gdim, )),
+        L.Call("compute_midpoint_geometry_{}".format(classname), (xm, J, coordinate_dofs)),
+        L.Call("compute_jacobian_determinants_{}".format(classname),
+               (detJ, 1, J, cell_orientation)),
+        L.Call("compute_jacobian_inverses_{}".format(classname), (Km, 1, J, detJ)),
+    ]
+
+    decls = [
+        L.Comment("Declare arrays for the iterates and geometry of the active points of a block"),
+        L.ArrayDecl("int", active, (block_size, )),
+        L.ArrayDecl("double", Xa, (block_size * tdim, )),
+        L.ArrayDecl("double", xa, (block_size * gdim, )),
+        L.ArrayDecl("double", Ja, (block_size * gdim * tdim, )),
+        L.ArrayDecl("double", detJa, (block_size, )),
+        L.ArrayDecl("double", Ka, (block_size * tdim * gdim, )),
+        L.VariableDecl("int", num_failed, 0),
+    ]
+
+    init_block = [
+        L.VariableDecl("const int", block_begin, iblock * block_size),
+        L.VariableDecl("const int", block_points,
+                       L.Conditional(L.LT(num_points - block_begin, block_size),
+                                     num_points - block_begin, block_size)),
+        L.Comment("Initialize X with the affine approximation at the cell midpoint"),
+        L.ForRange(
+            ib,
+            0,
+            block_points,
+            index_type="int",
+            body=[
+                L.VariableDecl("const int", ip, block_begin + ib),
+                L.ForRange(j, 0, tdim, index_type="int", body=[
+                    L.Assign(Xf[ip, j], Xm[j]),
+                    L.ForRange(i, 0, gdim, index_type="int",
+                               body=L.AssignAdd(Xf[ip, j], Kmf[j, i] * (xf[ip, i] - xm[i]))),
+                ]),
+                L.Assign(active[ib], ib),
+            ]),
+        L.VariableDecl("int", num_active, block_points),
+    ]
+
+    # Newton iteration for all active points of the block
+    update_point = [
+        L.VariableDecl("const int", ip, block_begin + active[ia]),
+        L.ArrayDecl("double", dX, (tdim, ), values=0.0),
+        L.Comment("Compute dX[j] = sum_i K_ji * (x_i - x(Xk)_i)"),
+        L.ForRanges(
+            (j, 0, tdim), (i, 0, gdim),
+            index_type="int",
+            body=L.AssignAdd(dX[j], Kaf[ia, j, i] * (xf[ip, i] - xaf[ia, i]))),
+        L.VariableDecl("double", dX2, value=0.0),
+        L.ForRange(j, 0, tdim, index_type="int", body=[
+            L.AssignAdd(Xf[ip, j], dX[j]),
+            L.AssignAdd(dX2, dX[j] * dX[j]),
+        ]),
+        L.Comment("Keep the point active until converged"),
+        L.If(L.LT(dX2, tolerance * tolerance), [
+            L.If(num_iterations, L.Assign(num_iterations[ip], k + 1)),
+        ]),
+        L.Else([
+            L.Assign(active[num_not_converged], active[ia]),
+            L.AssignAdd(num_not_converged, 1),
+        ]),
+    ]
+    newton_body = [
+        L.If(L.EQ(num_active, 0), L.Break()),
+        L.Comment("Compute x, J, detJ and K at the iterates of the active points"),
+        L.ForRanges(
+            (ia, 0, num_active), (j, 0, tdim),
+            index_type="int",
+            body=L.Assign(Xaf[ia, j], Xf[block_begin + active[ia], j])),
+        L.Call("compute_geometry_{}".format(classname),
+               (xa, Ja, detJa, Ka, num_active, Xa, coordinate_dofs, cell_orientation)),
+        L.VariableDecl("int", num_not_converged, 0),
+        L.ForRange(ia, 0, num_active, index_type="int", body=update_point),
+        L.Assign(num_active, num_not_converged),
+    ]
+
+    # Record points not converged within max_iterations
+    finalize_block = [
+        L.If(num_iterations,
+             L.ForRange(ia, 0, num_active, index_type="int",
+                        body=L.Assign(num_iterations[block_begin + active[ia]], -1))),
+        L.AssignAdd(num_failed, num_active),
+    ]
+
+    block_loop = [
+        L.ForRange(
+            iblock,
+            0,
+            (num_points + (block_size - 1)) / block_size,
+            index_type="int",
+            body=init_block + [
+                L.ForRange(k, 0, max_iterations, index_type="int", body=newton_body)
+            ] + finalize_block)
+    ]
+
+    code = midpoint_geometry + decls + block_loop + [L.Return(num_failed)]
+    return code
+
+
 def evaluate_reference_basis_derivatives_declaration(L, ir):
     scalar_coordinate_element_classname = ir["scalar_coordinate_finite_element_classname"]
     code = """
@@ -630,6 +1279,21 @@ def compute_jacobians(L, ir):
     # Input geometry
     X = L.FlattenedArray(L.Symbol("X"), dims=(num_points, tdim))
 
+    if is_affine_simplex(ir):
+        # Affine simplex cell, J is constant and given by differences
+        # of the vertex coordinates
+        J0 = L.Symbol("J0")
+        J0f = L.FlattenedArray(J0, dims=(gdim, tdim))
+        code = [L.ArrayDecl("double", J0, (gdim * tdim, ))]
+        code += generate_affine_geometry(L, ir, None, J0f, None, None, coordinate_dofs, None)
+        code += [
+            L.ForRanges(
+                (ip, 0, num_points), (i, 0, gdim), (j, 0, tdim),
+                index_type=index_type,
+                body=L.Assign(J[ip, i, j], J0f[i, j]))
+        ]
+        return code
+
     # Computing table one point at a time instead of using num_points
     # will allow skipping dynamic allocation
     one_point = 1
@@ -743,6 +1407,9 @@ def compute_geometry(L, ir):
     coordinate_dofs = L.Symbol("coordinate_dofs")
     cell_orientation = L.Symbol("cell_orientation")
 
+    if is_affine_simplex(ir):
+        return _compute_geometry_affine(L, ir)
+
     # Just chain calls to other functions here
     code = [
         L.Call("compute_physical_coordinates_{}".format(classname),
@@ -756,6 +1423,92 @@ def compute_geometry(L, ir):
     return code
 
 
+def _compute_geometry_affine(L, ir):
+    """Compute the constant geometry of an affine simplex cell once
+    and copy it to all points."""
+    gdim = ir["geometric_dimension"]
+    tdim = ir["topological_dimension"]
+    num_dofs = ir["num_scalar_coordinate_element_dofs"]
+    num_points = L.Symbol("num_points")
+
+    # Loop indices
+    ip = L.Symbol("ip")
+    i = L.Symbol("i")
+    j = L.Symbol("j")
+
+    # Output geometry
+    x = L.FlattenedArray(L.Symbol("x"), dims=(num_points, gdim))
+    J = L.FlattenedArray(L.Symbol("J"), dims=(num_points, gdim, tdim))
+    detJ = L.Symbol("detJ")
+    K = L.FlattenedArray(L.Symbol("K"), dims=(num_points, tdim, gdim))
+
+    # Input geometry
+    X = L.FlattenedArray(L.Symbol("X"), dims=(num_points, tdim))
+
+    # Input cell data
+    coordinate_dofs = L.FlattenedArray(L.Symbol("coordinate_dofs"), dims=(num_dofs, gdim))
+    cell_orientation = L.Symbol("cell_orientation")
+
+    # Cell constant geometry
+    x0 = L.Symbol("x0")
+    J0 = L.Symbol("J0")
+    detJ0 = L.Symbol("detJ0")
+    K0 = L.Symbol("K0")
+    J0f = L.FlattenedArray(J0, dims=(gdim, tdim))
+    K0f = L.FlattenedArray(K0, dims=(tdim, gdim))
+
+    code = [
+        L.ArrayDecl("double", x0, (gdim, )),
+        L.ArrayDecl("double", J0, (gdim * tdim, )),
+        L.VariableDecl("double", detJ0),
+        L.ArrayDecl("double", K0, (tdim * gdim, )),
+    ]
+    code += generate_affine_geometry(L, ir, x0, J0f, detJ0, K0f, coordinate_dofs, cell_orientation)
+    code += [
+        L.ForRange(
+            ip,
+            0,
+            num_points,
+            index_type=index_type,
+            body=[
+                L.ForRange(i, 0, gdim, index_type=index_type, body=[
+                    L.Assign(x[ip, i], x0[i]),
+                    L.ForRange(j, 0, tdim, index_type=index_type, body=[
+                        L.AssignAdd(x[ip, i], J0f[i, j] * X[ip, j]),
+                        L.Assign(J[ip, i, j], J0f[i, j]),
+                        L.Assign(K[ip, j, i], K0f[j, i]),
+                    ]),
+                ]),
+                L.Assign(detJ[ip], detJ0),
+            ]),
+    ]
+    return code
+
+
+def compute_affine_geometry(L, ir):
+    if not is_affine_simplex(ir):
+        return [L.Comment("Not an affine simplex coordinate mapping"), L.Return(-1)]
+
+    gdim = ir["geometric_dimension"]
+    tdim = ir["topological_dimension"]
+    num_dofs = ir["num_scalar_coordinate_element_dofs"]
+
+    # Output geometry cache members, with the arrays of size 3 and 9
+    # used as flattened arrays of the actual dimensions
+    x0 = L.Symbol("geometry->x0")
+    J = L.FlattenedArray(L.Symbol("geometry->J"), dims=(gdim, tdim))
+    detJ = L.Symbol("geometry->detJ")
+    K = L.FlattenedArray(L.Symbol("geometry->K"), dims=(tdim, gdim))
+
+    # Input cell data
+    coordinate_dofs = L.FlattenedArray(L.Symbol("coordinate_dofs"), dims=(num_dofs, gdim))
+    cell_orientation = L.Symbol("cell_orientation")
+
+    code = generate_affine_geometry(L, ir, x0, J, detJ, K, coordinate_dofs, cell_orientation)
+    code += [L.Return(0)]
+    return code
+
+
 def compute_midpoint_geometry(L, ir):
     # Dimensions
     gdim = ir["geometric_dimension"]
@@ -868,6 +1621,10 @@ def ufc_coordinate_mapping_generator(ir, parameters):
     assert isinstance(statements, list)
     d["compute_reference_coordinates"] = L.StatementList(statements)
 
+    statements = compute_reference_coordinates_batched(L, ir)
+    assert isinstance(statements, list)
+    d["compute_reference_coordinates_batched"] = L.StatementList(statements)
+
     statements = compute_reference_geometry(L, ir)
     assert isinstance(statements, list)
     d["compute_reference_geometry"] = L.StatementList(statements)
@@ -888,6 +1645,24 @@ def ufc_coordinate_mapping_generator(ir, parameters):
     assert isinstance(statements, list)
     d["compute_midpoint_geometry"] = L.StatementList(statements)
 
+    statements = compute_affine_geometry(L, ir)
+    assert isinstance(statements, list)
+    d["compute_affine_geometry"] = L.StatementList(statements)
+
+    # Multi-cell variants
+    for name, generator in (("compute_physical_coordinates_cells",
+                             compute_physical_coordinates_cells),
+                            ("compute_jacobians_cells", compute_jacobians_cells),
+                            ("compute_jacobian_determinants_cells",
+                             compute_jacobian_determinants_cells),
+                            ("compute_jacobian_inverses_cells", compute_jacobian_inverses_cells),
+                            ("compute_geometry_cells", compute_geometry_cells),
+                            ("compute_midpoint_geometry_cells", compute_midpoint_geometry_cells)):
+        statements = generator(L, ir)
+        if not isinstance(statements, list):
+            statements = [statements]
+        d[name] = L.StatementList(statements)
+
     # Check that no keys are redundant or have been missed
     from string import Formatter
     fields = [
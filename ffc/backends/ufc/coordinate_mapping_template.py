@@ -74,6 +74,70 @@ void compute_reference_coordinates_{factory_name}(double* restrict X, int num_po
 {compute_reference_coordinates}
 }}
 
+int compute_affine_geometry_{factory_name}(ufc_affine_geometry* restrict geometry,
+                                           const double* restrict coordinate_dofs,
+                                           int cell_orientation)
+{{
+{compute_affine_geometry}
+}}
+
+void compute_physical_coordinates_cells_{factory_name}(double* restrict x, int num_cells,
+                                                       int num_points,
+                                                       const double* restrict X,
+                                                       const double* restrict coordinate_dofs)
+{{
+{compute_physical_coordinates_cells}
+}}
+
+void compute_jacobians_cells_{factory_name}(double* restrict J, int num_cells, int num_points,
+                                            const double* restrict X,
+                                            const double* restrict coordinate_dofs)
+{{
+{compute_jacobians_cells}
+}}
+
+void compute_jacobian_determinants_cells_{factory_name}(double* restrict detJ, int num_cells,
+                                                        int num_points,
+                                                        const double* restrict J,
+                                                        const int* restrict cell_orientations)
+{{
+{compute_jacobian_determinants_cells}
+}}
+
+void compute_jacobian_inverses_cells_{factory_name}(double* restrict K, int num_cells,
+                                                    int num_points, const double* restrict J,
+                                                    const double* restrict detJ)
+{{
+{compute_jacobian_inverses_cells}
+}}
+
+void compute_geometry_cells_{factory_name}(double* restrict x, double* restrict J,
+                                           double* restrict detJ, double* restrict K,
+                                           int num_cells, int num_points,
+                                           const double* restrict X,
+                                           const double* restrict coordinate_dofs,
+                                           const int* restrict cell_orientations)
+{{
+{compute_geometry_cells}
+}}
+
+void compute_midpoint_geometry_cells_{factory_name}(double* restrict x, double* restrict J,
+                                                    int num_cells,
+                                                    const double* restrict coordinate_dofs)
+{{
+{compute_midpoint_geometry_cells}
+}}
+
+int compute_reference_coordinates_batched_{factory_name}(double* restrict X, int num_points,
+                                                         const double* restrict x,
+                                                         const double* restrict coordinate_dofs,
+                                                         int cell_orientation,
+                                                         double tolerance, int max_iterations,
+                                                         int* restrict num_iterations)
+{{
+{compute_reference_coordinates_batched}
+}}
+
 void compute_reference_geometry_{factory_name}(double* restrict X, double* restrict J,
                                                double* restrict detJ, double* restrict K,
                                                int num_points, const double* restrict x,
@@ -104,6 +168,14 @@ ufc_coordinate_mapping* create_{factory_name}(void)
   cmap->compute_jacobian_inverses = compute_jacobian_inverses_{factory_name};
   cmap->compute_geometry = compute_geometry_{factory_name};
   cmap->compute_midpoint_geometry = compute_midpoint_geometry_{factory_name};
+  cmap->compute_affine_geometry = compute_affine_geometry_{factory_name};
+  cmap->compute_physical_coordinates_cells = compute_physical_coordinates_cells_{factory_name};
+  cmap->compute_jacobians_cells = compute_jacobians_cells_{factory_name};
+  cmap->compute_jacobian_determinants_cells = compute_jacobian_determinants_cells_{factory_name};
+  cmap->compute_jacobian_inverses_cells = compute_jacobian_inverses_cells_{factory_name};
+  cmap->compute_geometry_cells = compute_geometry_cells_{factory_name};
+  cmap->compute_midpoint_geometry_cells = compute_midpoint_geometry_cells_{factory_name};
+  cmap->compute_reference_coordinates_batched = compute_reference_coordinates_batched_{factory_name};
   return cmap;
 }}
 
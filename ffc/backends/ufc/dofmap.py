@@ -103,6 +103,135 @@ def tabulate_dofs(L, ir):
     return L.StatementList(code)
 
 
+def _tabulate_dofs_tables(ir):
+    """Compute compact tables for table driven tabulate_dofs.
+
+    Returns (blocks, rows), where blocks[b] = (dim, stride) for each
+    group of dofs sharing an offset, with dim = -1 for a real
+    subelement, and rows[k] = (block, dim, entity, stride, base) for
+    each local dof k, with global dof
+
+        dofs[k] = block_offset[block] + stride * entity_indices[dim][entity] + base
+
+    and the entity term omitted when stride is 0.
+    """
+    subelement_dofs, num_dofs_per_subelement, need_offset, is_subelement_real = ir["tabulate_dofs"]
+
+    blocks = []
+    rows = [None] * ir["num_element_dofs"]
+    subelement_offset = 0
+    for (subelement_index, entity_dofs) in enumerate(subelement_dofs):
+        if is_subelement_real[subelement_index]:
+            rows[subelement_offset] = (len(blocks), 0, 0, 0, 0)
+            blocks.append((-1, 0))
+            subelement_offset += 1
+            continue
+
+        for (cell_entity_dim, dofs_on_cell_entity) in enumerate(entity_dofs):
+            num_dofs_per_mesh_entity = len(dofs_on_cell_entity[0])
+            if num_dofs_per_mesh_entity == 0:
+                continue
+            for (cell_entity_index, dofs) in enumerate(dofs_on_cell_entity):
+                for (j, dof) in enumerate(dofs):
+                    rows[subelement_offset + dof] = (len(blocks), cell_entity_dim,
+                                                     cell_entity_index,
+                                                     num_dofs_per_mesh_entity, j)
+            blocks.append((cell_entity_dim, num_dofs_per_mesh_entity))
+
+        subelement_offset += num_dofs_per_subelement[subelement_index]
+
+    assert all(row is not None for row in rows)
+    return blocks, rows
+
+
+def _generate_block_offsets(L, blocks):
+    """Generate code computing the global offset of each block of
+    dofs from the number of global entities."""
+    num_mesh_entities = L.Symbol("num_global_entities")
+    dof_blocks = L.Symbol("dof_blocks")
+    block_offsets = L.Symbol("block_offsets")
+    offset = L.Symbol("offset")
+    b = L.Symbol("b")
+    return [
+        L.ArrayDecl("static const int", dof_blocks, (len(blocks), 2), values=blocks),
+        L.ArrayDecl("int64_t", block_offsets, (len(blocks), )),
+        L.VariableDecl("int64_t", offset, value=0),
+        L.ForRange(b, 0, len(blocks), index_type="int", body=[
+            L.Assign(block_offsets[b], offset),
+            L.AssignAdd(offset,
+                        L.Conditional(L.LT(dof_blocks[b, 0], 0), 1,
+                                      dof_blocks[b, 1] * num_mesh_entities[dof_blocks[b, 0]])),
+        ]),
+    ]
+
+
+def tabulate_dofs_table(L, ir):
+    """Generate table driven tabulate_dofs, with one loop over the
+    local dofs instead of one assignment per dof."""
+    entity_indices = L.Symbol("entity_indices")
+    dofs_variable = L.Symbol("dofs")
+
+    if ir["tabulate_dofs"] is None:
+        return L.StatementList([L.Assign(dofs_variable[0], 0)])
+
+    blocks, rows = _tabulate_dofs_tables(ir)
+
+    dof_table = L.Symbol("dof_table")
+    block_offsets = L.Symbol("block_offsets")
+    k = L.Symbol("k")
+    entity_term = L.Conditional(
+        L.EQ(dof_table[k, 3], 0), 0,
+        dof_table[k, 3] * entity_indices[dof_table[k, 1], dof_table[k, 2]])
+    code = _generate_block_offsets(L, blocks) + [
+        L.ArrayDecl("static const int", dof_table, (len(rows), 5), values=rows),
+        L.ForRange(k, 0, len(rows), index_type="int",
+                   body=L.Assign(dofs_variable[k],
+                                 block_offsets[dof_table[k, 0]] + entity_term + dof_table[k, 4])),
+    ]
+    return L.StatementList(code)
+
+
+def tabulate_dofs_cells(L, ir):
+    """Generate table driven tabulation of dofs for multiple cells, with
+    entity indices of each cell stored contiguously for all entity
+    dimensions."""
+    entity_indices = L.Symbol("entity_indices")
+    dofs_variable = L.Symbol("dofs")
+    num_cells = L.Symbol("num_cells")
+    c = L.Symbol("c")
+    k = L.Symbol("k")
+
+    num_dofs = ir["num_element_dofs"]
+    if ir["tabulate_dofs"] is None:
+        code = [L.ForRange(c, 0, num_cells, index_type="int",
+                           body=L.Assign(dofs_variable[c * num_dofs], 0))]
+        return L.StatementList(code)
+
+    blocks, rows = _tabulate_dofs_tables(ir)
+
+    # Position of entity (dim, entity) among the entities of a cell
+    num_cell_entities = ir["num_cell_entities"]
+    entity_offsets = [sum(num_cell_entities[:dim]) for dim in range(len(num_cell_entities))]
+    rows = [(block, entity_offsets[dim] + entity, stride, base)
+            for (block, dim, entity, stride, base) in rows]
+
+    dof_table = L.Symbol("dof_table")
+    block_offsets = L.Symbol("block_offsets")
+    dofs = L.FlattenedArray(dofs_variable, dims=(num_cells, num_dofs))
+    cell_entity_indices = L.FlattenedArray(entity_indices, dims=(num_cells, sum(num_cell_entities)))
+    entity_term = L.Conditional(
+        L.EQ(dof_table[k, 2], 0), 0, dof_table[k, 2] * cell_entity_indices[c, dof_table[k, 1]])
+    code = _generate_block_offsets(L, blocks) + [
+        L.ArrayDecl("static const int", dof_table, (len(rows), 4), values=rows),
+        L.ForRanges(
+            (c, 0, num_cells), (k, 0, num_dofs),
+            index_type="int",
+            body=L.Assign(dofs[c, k],
+                          block_offsets[dof_table[k, 0]] + entity_term + dof_table[k, 3])),
+    ]
+    return L.StatementList(code)
+
+
 def tabulate_facet_dofs(L, ir):
     all_facet_dofs = ir["tabulate_facet_dofs"]
 
@@ -337,7 +466,12 @@ def ufc_dofmap_generator(ir, parameters):
     import ffc.uflacs.language.cnodes as L
 
     # Functions
-    d["tabulate_dofs"] = tabulate_dofs(L, ir)
+    table_min_size = parameters["tabulate_dofs_table_min_size"]
+    if table_min_size > 0 and ir["num_element_dofs"] >= table_min_size:
+        d["tabulate_dofs"] = tabulate_dofs_table(L, ir)
+    else:
+        d["tabulate_dofs"] = tabulate_dofs(L, ir)
+    d["tabulate_dofs_cells"] = tabulate_dofs_cells(L, ir)
     d["tabulate_dof_permutations"] = tabulate_dof_permutations(L, ir)
     d["tabulate_facet_dofs"] = tabulate_facet_dofs(L, ir)
     d["tabulate_entity_dofs"] = tabulate_entity_dofs(L, ir)
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 """Work in progress translation of FFC evaluatebasis code to uflacs CNodes format."""
 
+import itertools
 import logging
 
 import numpy
 
-from ffc.backends.ufc.evaluatebasis import (generate_compute_basisvalues,
+from ffc.backends.ufc.evaluatebasis import (generate_batched_basis_contraction,
+                                            generate_compute_basisvalues,
                                             generate_expansion_coefficients)
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,10 @@ logger = logging.getLogger(__name__)
 # Used for various indices and arrays in this file
 index_type = "int64_t"
 
+# Number of points per batch of the precomputed derivatives, if
+# evaluate_basis_batch_size is not set
+default_batch_size = 8
+
 
 def generate_evaluate_reference_basis_derivatives(L, data, classname, parameters):
     # Cutoff for feature to disable generation of this code (consider
@@ -97,6 +103,31 @@ def generate_evaluate_reference_basis_derivatives(L, data, classname, parameters
     if max_degree == 0:
         return setup_code + [ret]
 
+    # Evaluate the lowest orders with precomputed derivative coefficients
+    precompute_order = min(int(parameters["precompute_basis_derivatives"]), max_degree)
+    if precompute_order > 0:
+        batch_size = int(parameters["evaluate_basis_batch_size"]) or default_batch_size
+        precomputed_cases = []
+        for n in range(1, precompute_order + 1):
+            embedded_degree, coefficients = generate_stacked_derivative_coefficients(
+                data["dofs_data"], tdim, reference_value_size, n)
+            num_rows = num_dofs * tdim**n * reference_value_size
+            C = L.Symbol("derivative_coefficients")
+            tables_code = [
+                L.Comment("Coefficients of derivatives of order %d of all dofs, "
+                          "[members][dofs*derivatives*components]" % n),
+                L.ArrayDecl("static const double", C, coefficients.shape, values=coefficients),
+            ]
+            contraction_code = generate_batched_basis_contraction(
+                L, element_cellname, tdim, embedded_degree, C, num_rows, batch_size,
+                shared=parameters["shared_basisvalues"])
+            precomputed_cases.append((n, tables_code + contraction_code + [ret]))
+        setup_code += [L.Switch(order, precomputed_cases, autobreak=False)]
+
+        # No orders are left for the derivatives computed at runtime
+        if precompute_order == max_degree:
+            return setup_code + [ret]
+
     # Tabulate dmats tables for all dofs and all derivative directions
     dmats_names, dmats_code = generate_tabulate_dmats(L, data["dofs_data"])
 
@@ -106,7 +137,8 @@ def generate_evaluate_reference_basis_derivatives(L, data, classname, parameters
     # Generate code to compute tables of basisvalues
     basisvalues_code, basisvalues_for_degree, need_fiat_coordinates = \
         generate_compute_basisvalues(
-            L, data["dofs_data"], element_cellname, tdim, X, ip)
+            L, data["dofs_data"], element_cellname, tdim, X, ip,
+            shared=parameters["shared_basisvalues"])
 
     # Generate all possible combinations of derivatives.
     combinations_code, combinations = _generate_combinations(L, tdim, max_degree, order,
@@ -309,6 +341,43 @@ def generate_evaluate_reference_basis_derivatives(L, data, classname, parameters
     return code
 
 
+def generate_stacked_derivative_coefficients(dofs_data, tdim, reference_value_size, order):
+    """Combine the expansion coefficients and derivative matrices of all
+    dofs into one table of coefficients for the derivatives of given order.
+
+    Returns the highest embedded degree and a table with dimensions
+    [num_members][num_dofs * tdim**order * reference_value_size]. The
+    derivatives are ordered as the combinations of directions, i.e.
+    derivative number r is sum_k d_k tdim**(order - 1 - k) for the
+    directions (d_0, ..., d_{order - 1}).
+    """
+    from ffc.uflacs.elementtables import clamp_table_small_numbers
+
+    embedded_degree = max(dof_data["embedded_degree"] for dof_data in dofs_data)
+    num_members = max(dof_data["num_expansion_members"] for dof_data in dofs_data)
+    num_dofs = len(dofs_data)
+    num_derivatives = tdim**order
+    coefficients = numpy.zeros((num_members, num_dofs, num_derivatives, reference_value_size))
+    for idof, dof_data in enumerate(dofs_data):
+        offset = dof_data["reference_offset"]
+        fiat_coefficients = numpy.asarray(dof_data["coeffs"])
+        num_components, n = fiat_coefficients.shape
+
+        # Derivative matrices as tabulated by generate_tabulate_dmats
+        dmats = clamp_table_small_numbers(
+            numpy.array([numpy.transpose(dmat) for dmat in dof_data["dmats"]]))
+
+        for r, combination in enumerate(itertools.product(range(tdim), repeat=order)):
+            matrix = dmats[combination[0]]
+            for direction in combination[1:]:
+                matrix = numpy.dot(dmats[direction], matrix)
+            coefficients[:n, idof, r, offset:offset + num_components] = \
+                numpy.dot(fiat_coefficients, matrix).T
+
+    coefficients = coefficients.reshape((num_members, -1))
+    return embedded_degree, coefficients
+
+
 def generate_tabulate_dmats(L, dofs_data):
     """Tabulate the derivatives of the polynomial base"""
 
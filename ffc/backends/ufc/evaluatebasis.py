@@ -3,6 +3,7 @@
 CNodes format."""
 
 import logging
+import math
 
 import numpy
 
@@ -66,6 +67,12 @@ def generate_evaluate_reference_basis(L, data, parameters):
         # Return error code
         return [L.Return(-1)]
 
+    # Evaluate all dofs with one matrix product per batch of points
+    batch_size = int(parameters.get("evaluate_basis_batch_size") or 0)
+    if batch_size > 0:
+        return generate_evaluate_reference_basis_batched(
+            L, data, batch_size, shared=parameters["shared_basisvalues"])
+
     # Get some known dimensions
     element_cellname = data["cellname"]
     tdim = data["topological_dimension"]
@@ -108,7 +115,8 @@ def generate_evaluate_reference_basis(L, data, parameters):
     # Generate code to compute tables of basisvalues
     basisvalues_code, basisvalues_for_degree, need_fiat_coordinates = \
         generate_compute_basisvalues(
-            L, data["dofs_data"], element_cellname, tdim, X, ip)
+            L, data["dofs_data"], element_cellname, tdim, X, ip,
+            shared=parameters["shared_basisvalues"])
 
     # Accumulate products of basisvalues and coefficients into values
     accumulation_code = [
@@ -182,6 +190,172 @@ def generate_evaluate_reference_basis(L, data, parameters):
     return code
 
 
+def generate_evaluate_reference_basis_batched(L, data, batch_size, shared=False):
+    """Generate code to evaluate element basisfunctions at points on the
+    reference element, for batches of points at a time.
+
+    The expansion coefficients of all dofs are stacked into one table,
+    and the values for a batch of points are computed as the product
+    of the basisvalues at the points and this table with ufc_dgemm_tn.
+    If shared is true, the basisvalues of a batch are computed by one
+    call to the shared basisvalues function of the module.
+    """
+    # Get some known dimensions
+    element_cellname = data["cellname"]
+    tdim = data["topological_dimension"]
+    reference_value_size = data["reference_value_size"]
+    num_dofs = len(data["dofs_data"])
+    num_rows = num_dofs * reference_value_size
+
+    # Input geometry
+    num_points = L.Symbol("num_points")
+
+    # Output values
+    reference_values = L.Symbol("reference_values")
+
+    # Loop indices
+    k = L.Symbol("k")
+
+    # Table of coefficients for basisvalues of the highest embedded
+    # degree, the expansion sets of lower degrees are the first members
+    embedded_degree, num_members, coefficients = generate_stacked_expansion_coefficients(
+        data["dofs_data"], element_cellname, reference_value_size)
+    C = L.Symbol("coefficients")
+    tables_code = [
+        L.Comment("Expansion coefficients of all dofs and components, [members][dofs*components]"),
+        L.ArrayDecl("static const double", C, (num_members, num_rows), values=coefficients),
+    ]
+
+    # Reset reference_values[:] to 0
+    reset_values_code = [
+        L.ForRange(
+            k,
+            0,
+            num_points * num_rows,
+            index_type=index_type,
+            body=L.Assign(reference_values[k], 0.0))
+    ]
+
+    contraction_code = generate_batched_basis_contraction(
+        L, element_cellname, tdim, embedded_degree, C, num_rows, batch_size, shared)
+
+    # Stitch it all together
+    code = tables_code + reset_values_code + contraction_code + [L.Return(0)]
+    return code
+
+
+def generate_batched_basis_contraction(L, element_cellname, tdim, embedded_degree,
+                                       coefficients, num_rows, batch_size, shared=False):
+    """Generate code accumulating the products of the basisvalues of
+    given degree at the points X and the table of coefficients into
+    reference_values, for batches of batch_size points at a time.
+
+    The table of coefficients has dimensions [num_members][num_rows],
+    and reference_values the dimensions [num_points][num_rows].
+    """
+    num_members = num_expansion_members(element_cellname, embedded_degree)
+
+    # Input geometry
+    num_points = L.Symbol("num_points")
+    X = L.Symbol("X")
+
+    # Output values
+    reference_values = L.Symbol("reference_values")
+
+    # Loop indices
+    ip = L.Symbol("ip")
+    ib = L.Symbol("ib")
+    r = L.Symbol("r")
+
+    # Basisvalues of all points in the batch, [members][points]
+    B = L.Symbol("batch_basisvalues")
+    batch_begin = L.Symbol("batch_begin")
+    batch_points = L.Symbol("num_batch_points")
+    B_values = L.FlattenedArray(B, dims=(num_members, batch_size))
+    ibatch = L.Symbol("ibatch")
+    batch_code = [
+        L.VariableDecl("const int", batch_begin, ibatch * batch_size),
+        L.VariableDecl("const int", batch_points,
+                       L.Conditional(L.LT(num_points - batch_begin, batch_size),
+                                     num_points - batch_begin, batch_size)),
+    ]
+
+    # Generate code to compute table of basisvalues of the highest degree
+    if shared and embedded_degree > 0:
+        name = basisvalues_function_name(element_cellname, embedded_degree)
+        batch_code += [
+            L.Call(name, (B, batch_size, batch_points, L.AddressOf(X[batch_begin * tdim])))
+        ]
+    else:
+        dofs_data = [dict(embedded_degree=embedded_degree, num_expansion_members=num_members)]
+        basisvalues_code, basisvalues_for_degree, _ = generate_compute_basisvalues(
+            L, dofs_data, element_cellname, tdim, X, ip)
+        basisvalues = basisvalues_for_degree[embedded_degree]
+        # The degree 0 basisvalue is a constant, independent of the point
+        point_code = []
+        if embedded_degree > 0:
+            point_code = [L.VariableDecl("const " + index_type, ip, batch_begin + ib)]
+        batch_code += [
+            L.ForRange(
+                ib,
+                0,
+                batch_points,
+                index_type=index_type,
+                body=point_code + basisvalues_code + [
+                    L.ForRange(
+                        r,
+                        0,
+                        num_members,
+                        index_type=index_type,
+                        body=L.Assign(B_values[r, ib], basisvalues[r]))
+                ])
+        ]
+
+    batch_code += [
+        L.Comment("Accumulate products of basisvalues and coefficients of the batch"),
+        L.Call("ufc_dgemm_tn", (batch_points, num_rows, num_members, B, batch_size,
+                                L.AddressOf(coefficients[0, 0]), num_rows,
+                                L.AddressOf(reference_values[batch_begin * num_rows]), num_rows)),
+    ]
+
+    code = [
+        L.ArrayDecl("double", B, (num_members * batch_size, )),
+        L.ForRange(
+            ibatch,
+            0,
+            (num_points + (batch_size - 1)) / batch_size,
+            index_type="int",
+            body=batch_code),
+    ]
+    return code
+
+
+def generate_stacked_expansion_coefficients(dofs_data, element_cellname, reference_value_size):
+    """Stack the expansion coefficients of all dofs into one table.
+
+    Returns the highest embedded degree, the number of members of its
+    expansion set, and a table with dimensions
+    [num_members][num_dofs * reference_value_size], with zero
+    coefficients for the members of higher degree than the embedded
+    degree of each dof and for components outside the range of each dof.
+    The coefficients of dofs of degree 0 are scaled to the first member
+    of the highest degree.
+    """
+    embedded_degree = max(dof_data["embedded_degree"] for dof_data in dofs_data)
+    num_members = max(dof_data["num_expansion_members"] for dof_data in dofs_data)
+    num_dofs = len(dofs_data)
+    coefficients = numpy.zeros((num_members, num_dofs, reference_value_size))
+    for idof, dof_data in enumerate(dofs_data):
+        offset = dof_data["reference_offset"]
+        fiat_coefficients = numpy.asarray(dof_data["coeffs"])
+        num_components, n = fiat_coefficients.shape
+        if dof_data["embedded_degree"] == 0 and embedded_degree > 0:
+            fiat_coefficients = fiat_coefficients / _first_basisvalue(element_cellname)
+        coefficients[:n, idof, offset:offset + num_components] = fiat_coefficients.T
+    coefficients = coefficients.reshape((num_members, num_dofs * reference_value_size))
+    return embedded_degree, num_members, coefficients
+
+
 def generate_expansion_coefficients(L, dofs_data):
     # TODO: Use precision parameter to format coefficients to match
     # legacy implementation and make regression tests more robust
@@ -223,7 +397,97 @@ def generate_expansion_coefficients(L, dofs_data):
     return tables_code, coefficients_for_dof
 
 
-def generate_compute_basisvalues(L, dofs_data, element_cellname, tdim, X, ip):
+def basisvalues_function_name(element_cellname, embedded_degree):
+    """Name of the shared function computing the basisvalues of given
+    embedded degree on the reference cell."""
+    return "compute_basisvalues_{}_{}".format(element_cellname, embedded_degree)
+
+
+def num_expansion_members(element_cellname, embedded_degree):
+    """Number of members of the expansion set of given degree on the
+    reference cell."""
+    n = embedded_degree
+    if element_cellname == "interval":
+        return n + 1
+    elif element_cellname == "triangle":
+        return (n + 1) * (n + 2) // 2
+    elif element_cellname == "tetrahedron":
+        return (n + 1) * (n + 2) * (n + 3) // 6
+    else:
+        raise FFCError("Unsupported cell for basisvalues: {}".format(element_cellname))
+
+
+def generate_basisvalues_function(L, element_cellname, tdim, embedded_degree):
+    """Generate the body of the shared function computing the basisvalues
+    of given embedded degree at num_points points X on the reference cell.
+
+    The basisvalues of point ip are stored in basisvalues[r * ldb + ip],
+    i.e. [members][points] with leading dimension ldb.
+    """
+    num_points = L.Symbol("num_points")
+    ldb = L.Symbol("ldb")
+    X = L.Symbol("X")
+    values = L.Symbol("basisvalues")
+    ip = L.Symbol("ip")
+    r = L.Symbol("r")
+
+    num_members = num_expansion_members(element_cellname, embedded_degree)
+    dofs_data = [dict(embedded_degree=embedded_degree, num_expansion_members=num_members)]
+    basisvalues_code, basisvalues_for_degree, _ = generate_compute_basisvalues(
+        L, dofs_data, element_cellname, tdim, X, ip)
+    basisvalues = basisvalues_for_degree[embedded_degree]
+
+    code = [
+        L.ForRange(
+            ip,
+            0,
+            num_points,
+            index_type="int",
+            body=basisvalues_code + [
+                L.ForRange(
+                    r,
+                    0,
+                    num_members,
+                    index_type="int",
+                    body=L.Assign(values[r * ldb + ip], basisvalues[r]))
+            ])
+    ]
+    return code
+
+
+def generate_compute_basisvalues(L, dofs_data, element_cellname, tdim, X, ip, shared=False):
+    """Generate code computing the basisvalues at point ip for each
+    embedded degree of the dofs.
+
+    If shared is true, the basisvalues of the highest degree are computed
+    by a call to the shared basisvalues function of the module, and used
+    for all degrees. The expansion sets are hierarchical, so the
+    basisvalues of a lower degree are the first members.
+    """
+    embedded_degree = max(dof_data["embedded_degree"] for dof_data in dofs_data)
+    if shared and embedded_degree > 0:
+        num_members = num_expansion_members(element_cellname, embedded_degree)
+        basisvalues = L.Symbol("basisvalues%d" % embedded_degree)
+        name = basisvalues_function_name(element_cellname, embedded_degree)
+        basisvalues_code = [
+            L.Comment("Compute basisvalues of the highest embedded degree"),
+            L.ArrayDecl("double", basisvalues, (num_members, )),
+            L.Call(name, (basisvalues, 1, 1, L.AddressOf(X[ip * tdim]))),
+        ]
+        basisvalues_for_degree = {
+            dof_data["embedded_degree"]: basisvalues
+            for dof_data in dofs_data
+        }
+
+        # The basisvalues of degree 0 are not scaled as the first
+        # member of the higher degrees, and are computed separately
+        if 0 in basisvalues_for_degree:
+            basisvalues = L.Symbol("basisvalues0")
+            basisvalues_code += _generate_compute_basisvalues(
+                L, basisvalues, None, element_cellname, 0, 1)
+            basisvalues_for_degree[0] = basisvalues
+        return basisvalues_code, basisvalues_for_degree, False
+
     basisvalues_code = [
         L.Comment("Compute basisvalues for each relevant embedded degree"),
     ]
@@ -284,6 +548,19 @@ def _generate_compute_basisvalues(L, basisvalues, Y, element_cellname,
     return code
 
 
+def _first_basisvalue(element_cellname):
+    """Value of the first basisvalue of degree > 0, relative to the
+    (constant) basisvalue of degree 0."""
+    if element_cellname == "interval":
+        return 1.0
+    elif element_cellname == "triangle":
+        return math.sqrt(0.5)
+    elif element_cellname == "tetrahedron":
+        return math.sqrt(0.75)
+    else:
+        raise FFCError("Unsupported cell for basisvalues: {}".format(element_cellname))
+
+
 def _jrc(a, b, n):
     an = float((2 * n + 1 + a + b) *
                (2 * n + 2 + a + b)) / float(2 * (n + 1) * (n + 1 + a + b))
@@ -11,7 +11,6 @@
 
 from ffc.backends.ufc.jacobian import jacobian, inverse_jacobian, orientation
 from ufl.permutation import build_component_numbering
-from ffc.utils import pick_first
 
 index_type = "int64_t"
 
@@ -31,10 +30,14 @@ def reference_to_physical_map(cellname):
         return lambda x: ((1 - x[0]) * (1 - x[1]) * (1 - x[2]), (1 - x[0]) * (1 - x[1]) * x[2], (1 - x[0]) * x[1] * (1 - x[2]), (1 - x[0]) * x[1] * x[2], x[0] * (1 - x[1]) * (1 - x[2]), x[0] * (1 - x[1]) * x[2], x[0] * x[1] * (1 - x[2]), x[0] * x[1] * x[2])  # noqa: E501
 
 
-def _change_variables(L, mapping, gdim, tdim, offset):
+def _change_variables(L, mapping, gdim, tdim, offset, geometry=None):
     """Generate code for mapping function values according to
     'mapping' and offset.
 
+    The physical values and the geometry J, detJ and K of the cell are
+    taken from geometry = (values, J, detJ, K) if given, with J and K
+    flattened arrays of shape (gdim, tdim) and (tdim, gdim).
+
     The basics of how to map a field from a physical to the reference
     domain. (For the inverse approach -- see interpolatevertexvalues)
 
@@ -75,16 +78,19 @@ def _change_variables(L, mapping, gdim, tdim, offset):
     # meg: Various mappings must be handled both here and in
     # interpolate_vertex_values. Could this be abstracted out?
 
-    values = L.Symbol("physical_values")
+    if geometry is None:
+        values = L.Symbol("physical_values")
+        J = L.FlattenedArray(L.Symbol("J"), dims=(gdim, tdim))
+        detJ = L.Symbol("detJ")
+        K = L.FlattenedArray(L.Symbol("K"), dims=(tdim, gdim))
+    else:
+        values, J, detJ, K = geometry
 
     if mapping == "affine":
         return [values[offset]]
     elif mapping == "contravariant piola":
         # Map each component from physical to reference using inverse
         # contravariant piola
-        detJ = L.Symbol("detJ")
-        K = L.Symbol("K")
-        K = L.FlattenedArray(K, dims=(tdim, gdim))
         w = []
         for i in range(tdim):
             inner = 0.0
@@ -96,9 +102,6 @@ def _change_variables(L, mapping, gdim, tdim, offset):
     elif mapping == "covariant piola":
         # Map each component from physical to reference using inverse
         # covariant piola
-        detJ = L.Symbol("detJ")
-        J = L.Symbol("J")
-        J = L.FlattenedArray(J, dims=(gdim, tdim))
         w = []
         for i in range(tdim):
             inner = 0.0
@@ -110,8 +113,6 @@ def _change_variables(L, mapping, gdim, tdim, offset):
     elif mapping == "double covariant piola":
         # physical to reference pullback as a covariant 2-tensor
         w = []
-        J = L.Symbol("J")
-        J = L.FlattenedArray(J, dims=(gdim, tdim))
         for i in range(tdim):
             for l in range(tdim):
                 inner = 0.0
@@ -124,9 +125,6 @@ def _change_variables(L, mapping, gdim, tdim, offset):
     elif mapping == "double contravariant piola":
         # physical to reference using double contravariant piola
         w = []
-        K = L.Symbol("K")
-        K = L.FlattenedArray(K, dims=(tdim, gdim))
-        detJ = L.Symbol("detJ")
         for i in range(tdim):
             for l in range(tdim):
                 inner = 0.0
@@ -140,7 +138,7 @@ def _change_variables(L, mapping, gdim, tdim, offset):
         raise Exception("The mapping (%s) is not allowed" % mapping)
 
 
-def _generate_body(L, i, dof, mapping, gdim, tdim, cell_shape, offset=0):
+def _generate_body(L, i, dof, mapping, gdim, tdim, cell_shape, offset=0, geometry=None):
     """Generate code for a single dof."""
 
     # EnrichedElement is handled by having [None, ..., None] dual basis
@@ -148,12 +146,9 @@ def _generate_body(L, i, dof, mapping, gdim, tdim, cell_shape, offset=0):
         # Return error code
         return ([L.Return(-1)], 0.0)
 
+    # Integral moments are not handled here, only point evaluations
     points = list(dof.keys())
-
-    # Generate different code if multiple points. (Otherwise ffc
-    # compile time blows up.)
-    if len(points) > 1:
-        return _generate_multiple_points_body(L, i, dof, mapping, gdim, tdim, offset)
+    assert len(points) == 1
 
     # Get weights for mapping reference point to physical
     x = points[0]
@@ -163,7 +158,7 @@ def _generate_body(L, i, dof, mapping, gdim, tdim, cell_shape, offset=0):
     code = []
 
     # Map function values to the reference element
-    F = _change_variables(L, mapping, gdim, tdim, offset)
+    F = _change_variables(L, mapping, gdim, tdim, offset, geometry)
 
     # Simple affine functions deserve special case:
     if len(F) == 1:
@@ -180,118 +175,6 @@ def _generate_body(L, i, dof, mapping, gdim, tdim, cell_shape, offset=0):
     return (code, value)
 
 
-def _generate_multiple_points_body(L, i, dof, mapping, gdim, tdim, offset=0):
-    """Generate c++ for-loop for multiple points (integral bodies)"""
-
-    result = L.Symbol("result")
-    code = [L.Assign(result, 0.0)]
-    points = list(dof.keys())
-    n = len(points)
-
-    # Get number of tokens per point
-    tokens = [dof[x] for x in points]
-    len_tokens = pick_first([len(t) for t in tokens])
-
-    # Declare points
-    #    points = format["list"]([format["list"](x) for x in points])
-    X_i = L.Symbol("X_%d" % i)
-    code += [L.ArrayDecl("double", X_i, [n, tdim], points)]
-
-    # Declare components
-    components = [[c[0] for (w, c) in token] for token in tokens]
-    #    components = format["list"]([format["list"](c) for c in components])
-    D_i = L.Symbol("D_%d" % i)
-    code += [L.ArrayDecl("int", D_i, [n, len_tokens], components)]
-
-    # Declare weights
-    weights = [[w for (w, c) in token] for token in tokens]
-    #    weights = format["list"]([format["list"](w) for w in weights])
-    W_i = L.Symbol("W_%d" % i)
-    code += [L.ArrayDecl("double", W_i, [n, len_tokens], weights)]
-
-    # Declare copy variable:
-    copy_i = L.Symbol("copy_%d" % i)
-    code += [L.ArrayDecl("double", copy_i, tdim)]
-
-    # Add loop over points
-    code += [L.Comment("Loop over points")]
-
-    # Map the points from the reference onto the physical element
-    r = L.Symbol("r")
-    w0 = L.Symbol("w0")
-    w1 = L.Symbol("w1")
-    w2 = L.Symbol("w2")
-    w3 = L.Symbol("w3")
-    y = L.Symbol("y")
-    coordinate_dofs = L.Symbol("coordinate_dofs")
-
-    if tdim == 1:
-        lines_r = [
-            L.Comment("Evaluate basis functions for affine mapping"),
-            L.VariableDecl("const double", w0, 1 - X_i[r][0]),
-            L.VariableDecl("const double", w1, X_i[r][0]),
-            L.Comment("Compute affine mapping y = F(X)")
-        ]
-        for j in range(gdim):
-            lines_r += [L.Assign(y[j], w0 * coordinate_dofs[j] + w1 * coordinate_dofs[j + gdim])]
-    elif tdim == 2:
-        lines_r = [
-            L.Comment("Evaluate basis functions for affine mapping"),
-            L.VariableDecl("const double", w0, 1 - X_i[r][0] - X_i[r][1]),
-            L.VariableDecl("const double", w1, X_i[r][0]),
-            L.VariableDecl("const double", w2, X_i[r][1]),
-            L.Comment("Compute affine mapping y = F(X)")
-        ]
-        for j in range(gdim):
-            lines_r += [
-                L.Assign(y[j], w0 * coordinate_dofs[j] + w1 * coordinate_dofs[j + gdim] +
-                         w2 * coordinate_dofs[j + 2 * gdim])
-            ]
-    elif tdim == 3:
-        lines_r = [
-            L.Comment("Evaluate basis functions for affine mapping"),
-            L.VariableDecl("const double", w0, 1 - X_i[r][0] - X_i[r][1] - X_i[r][2]),
-            L.VariableDecl("const double", w1, X_i[r][0]),
-            L.VariableDecl("const double", w2, X_i[r][1]),
-            L.VariableDecl("const double", w3, X_i[r][2]),
-            L.Comment("Compute affine mapping y = F(X)")
-        ]
-        for j in range(gdim):
-            lines_r += [
-                L.Assign(y[j], w0 * coordinate_dofs[j] + w1 * coordinate_dofs[j + gdim] +
-                         w2 * coordinate_dofs[j + 2 * gdim] + w3 * coordinate_dofs[j + 3 * gdim])
-            ]
-
-    # Evaluate function at physical point
-    lines_r += [L.Comment("Evaluate function at physical point")]
-    y = L.Symbol("y")
-    vals = L.Symbol("physical_values")
-    c = L.Symbol("c")
-    lines_r += [L.Call("f.evaluate", (vals, y, c))]
-
-    # Map function values to the reference element
-    lines_r += [L.Comment("Map function to reference element")]
-    F = _change_variables(L, mapping, gdim, tdim, offset)
-    lines_r += [L.Assign(copy_i[k], F_k) for (k, F_k) in enumerate(F)]
-
-    # Add loop over directional components
-    lines_r += [L.Comment("Loop over directions")]
-
-    s = L.Symbol("s")
-    lines_r += [
-        L.ForRange(
-            s,
-            0,
-            len_tokens,
-            index_type=index_type,
-            body=[L.AssignAdd(result, copy_i[D_i[r, s]] * W_i[r, s])])
-    ]
-
-    # Generate loop over r and add to code.
-    code += [L.ForRange(r, 0, n, index_type=index_type, body=lines_r)]
-    return (code, result)
-
-
 def generate_transform_values(L, ir):
     """Generate code for transform_values. Transforms
     values in physical space into reference space. These
@@ -307,18 +190,17 @@ def generate_transform_values(L, ir):
     # Enriched element, no dofs defined
     if not any(ir["dofs"]):
         code = []
+    elif any(dof is not None and len(dof) > 1 for dof in ir["dofs"]):
+        # Integral moments need function values at the quadrature points,
+        # see interpolate_cells
+        return [L.Comment("transform_values: only point evaluation dofs are supported"),
+                L.Return(-1)]
     else:
         code = []
         # Check whether Jacobians are necessary.
         needs_inverse_jacobian = any(["contravariant piola" in m for m in ir["mappings"]])
         needs_jacobian = any(["covariant piola" in m for m in ir["mappings"]])
 
-        # Intermediate variable needed for multiple point dofs
-        needs_temporary = any(dof is not None and len(dof) > 1 for dof in ir["dofs"])
-        if needs_temporary:
-            result = L.Symbol("result")
-            code += [L.VariableDecl("double", result)]
-
         if needs_jacobian or needs_inverse_jacobian:
             code += jacobian(L, gdim, tdim, cell_shape)
 
@@ -340,4 +222,49 @@ def generate_transform_values(L, ir):
         code += c
         code += [L.Assign(values[i], r)]
 
+    code += [L.Return(0)]
     return code
+
+
+def generate_transform_values_cells(L, ir):
+    """Generate code for transform_values_cells. Transforms values in
+    physical space into reference space on multiple cells, with the
+    geometry of each cell given. Only point evaluation dofs are
+    supported, otherwise -1 is returned.
+    """
+    gdim = ir["geometric_dimension"]
+    tdim = ir["topological_dimension"]
+    cell_shape = ir["cell_shape"]
+    mappings = ir["mappings"]
+    offsets = ir["physical_offsets"]
+    value_size = ir["physical_value_size"]
+    num_dofs = len(ir["dofs"])
+
+    # Enriched element, no dofs defined
+    if not any(ir["dofs"]):
+        return [L.Return(-1)]
+    if any(dof is not None and len(dof) > 1 for dof in ir["dofs"]):
+        return [L.Comment("transform_values_cells: only point evaluation dofs are supported"),
+                L.Return(-1)]
+
+    # Geometry and values of one cell
+    c = L.Symbol("c")
+    num_cells = L.Symbol("num_cells")
+    reference_values = L.FlattenedArray(
+        L.Symbol("reference_values"), dims=(num_cells, num_dofs))
+    physical_values = L.FlattenedArray(
+        L.Symbol("physical_values"), dims=(num_cells, num_dofs * value_size))
+    J = L.FlattenedArray(L.Symbol("J"), dims=(num_cells, gdim, tdim))
+    detJ = L.Symbol("detJ")
+    K = L.FlattenedArray(L.Symbol("K"), dims=(num_cells, tdim, gdim))
+    geometry = (physical_values[c], J[c], detJ[c], K[c])
+
+    # Generate bodies for each degree of freedom
+    body = []
+    for (i, dof) in enumerate(ir["dofs"]):
+        code, r = _generate_body(L, i, dof, mappings[i], gdim, tdim, cell_shape,
+                                 offsets[i] + i * value_size, geometry)
+        body += code
+        body += [L.Assign(reference_values[c, i], r)]
+
+    return [L.ForRange(c, 0, num_cells, index_type=index_type, body=body), L.Return(0)]
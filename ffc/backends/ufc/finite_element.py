@@ -11,12 +11,17 @@
 
 from collections import defaultdict
 
+import numpy
+
 import ffc.backends.ufc.finite_element_template as ufc_finite_element
 from ffc import FFCError
 from ffc.backends.ufc.evalderivs import (_generate_combinations,
                                          generate_evaluate_reference_basis_derivatives)
-from ffc.backends.ufc.evaluatebasis import generate_evaluate_reference_basis
-from ffc.backends.ufc.evaluatedof import generate_transform_values
+from ffc.backends.ufc.evaluatebasis import (basisvalues_function_name,
+                                            generate_basisvalues_function,
+                                            generate_evaluate_reference_basis)
+from ffc.backends.ufc.evaluatedof import (generate_transform_values,
+                                          generate_transform_values_cells)
 from ffc.backends.ufc.utils import (generate_return_int_switch,
                                     generate_return_new_switch)
 from ufl import product
@@ -133,6 +138,11 @@ def transform_values(L, ir, parameters):
     return generate_transform_values(L, ir["evaluate_dof"])
 
 
+def transform_values_cells(L, ir, parameters):
+    """Generate code for transform_values_cells()"""
+    return generate_transform_values_cells(L, ir["evaluate_dof"])
+
+
 def tabulate_reference_dof_coordinates(L, ir, parameters):
     # TODO: ensure points is a numpy array,
     #   get tdim from points.shape[1],
@@ -161,6 +171,131 @@ def tabulate_reference_dof_coordinates(L, ir, parameters):
     return code
 
 
+def _generate_interpolation_matrix_tables(L, matrix):
+    """Generate static tables of the interpolation matrix, in
+    compressed sparse row format unless it is mostly nonzero. Returns
+    the declarations and a function generating code for one row."""
+    num_dofs = matrix.shape[0]
+    matrix = matrix.reshape(num_dofs, -1)
+    num_values = matrix.shape[1]
+    nonzeros = [numpy.flatnonzero(row) for row in matrix]
+    nnz = sum(len(cols) for cols in nonzeros)
+
+    if 2 * nnz > num_dofs * num_values:
+        M = L.Symbol("interpolation_matrix")
+        decls = [
+            L.ArrayDecl("static const double", M, (num_dofs, num_values), values=matrix),
+        ]
+
+        def row_loop(i, body):
+            j = L.Symbol("j")
+            return L.ForRange(j, 0, num_values, index_type="int", body=body(j, M[i, j]))
+    else:
+        row_ptr = L.Symbol("row_ptr")
+        cols = L.Symbol("cols")
+        vals = L.Symbol("vals")
+        decls = [
+            L.ArrayDecl("static const int", row_ptr, (num_dofs + 1, ),
+                        values=numpy.cumsum([0] + [len(c) for c in nonzeros])),
+            L.ArrayDecl("static const int", cols, (max(nnz, 1), ),
+                        values=numpy.concatenate(nonzeros + [[0]])[:max(nnz, 1)]),
+            L.ArrayDecl("static const double", vals, (max(nnz, 1), ),
+                        values=numpy.concatenate([row[c] for row, c in zip(matrix, nonzeros)]
+                                                 + [[0.0]])[:max(nnz, 1)]),
+        ]
+
+        def row_loop(i, body):
+            k = L.Symbol("k")
+            return L.ForRange(k, row_ptr[i], row_ptr[i + 1], index_type="int",
+                              body=body(cols[k], vals[k]))
+
+    return decls, row_loop
+
+
+def tabulate_interpolation_points(L, ir, parameters):
+    data = ir["interpolation_matrix"]
+    if not data:
+        # Return error code
+        return [L.Return(-1)]
+
+    tdim = data["tdim"]
+    points = data["points"]
+
+    # Output argument
+    X = L.Symbol("X")
+
+    # Reference coordinates
+    interpolation_X = L.Symbol("interpolation_X")
+    values = [x[jj] for x in points for jj in range(tdim)]
+    code = [
+        L.ArrayDecl("static const double", interpolation_X, (len(points) * tdim, ), values=values),
+        L.MemCopy(interpolation_X, X, tdim * len(points), "double"),
+        L.Return(0),
+    ]
+    return code
+
+
+def tabulate_interpolation_matrix(L, ir, parameters):
+    data = ir["interpolation_matrix"]
+    if not data:
+        # Return error code
+        return [L.Return(-1)]
+
+    matrix = data["matrix"]
+    num_dofs = matrix.shape[0]
+    num_values = matrix[0].size
+
+    # Output argument
+    M = L.FlattenedArray(L.Symbol("M"), dims=(num_dofs, num_values))
+    i = L.Symbol("i")
+    iz = L.Symbol("l")
+
+    decls, row_loop = _generate_interpolation_matrix_tables(L, matrix)
+    code = decls + [
+        L.ForRange(iz, 0, num_dofs * num_values, index_type="int",
+                   body=L.Assign(L.Symbol("M")[iz], 0.0)),
+        L.ForRange(i, 0, num_dofs, index_type="int",
+                   body=row_loop(i, lambda j, m: L.Assign(M[i, j], m))),
+        L.Return(0),
+    ]
+    return code
+
+
+def interpolate_cells(L, ir, parameters):
+    data = ir["interpolation_matrix"]
+    if not data:
+        # Return error code
+        return [L.Return(-1)]
+
+    matrix = data["matrix"]
+    num_dofs = matrix.shape[0]
+    num_values = matrix[0].size
+
+    # Arguments
+    num_cells = L.Symbol("num_cells")
+    dofs = L.FlattenedArray(L.Symbol("dofs"), dims=(num_cells, num_dofs))
+    values = L.FlattenedArray(L.Symbol("values"), dims=(num_cells, num_values))
+
+    c = L.Symbol("c")
+    i = L.Symbol("i")
+    dof_value = L.Symbol("dof_value")
+
+    # One matrix vector product per cell
+    decls, row_loop = _generate_interpolation_matrix_tables(L, matrix)
+    code = decls + [
+        L.ForRanges(
+            (c, 0, num_cells), (i, 0, num_dofs),
+            index_type="int",
+            body=[
+                L.VariableDecl("double", dof_value, 0.0),
+                row_loop(i, lambda j, m: L.AssignAdd(dof_value, m * values[c, j])),
+                L.Assign(dofs[c, i], dof_value),
+            ]),
+        L.Return(0),
+    ]
+    return code
+
+
 def evaluate_reference_basis(L, ir, parameters):
     data = ir["evaluate_basis"]
     if isinstance(data, str):
@@ -181,51 +316,17 @@ def evaluate_reference_basis_derivatives(L, ir, parameters):
     return generate_evaluate_reference_basis_derivatives(L, data, ir["classname"], parameters)
 
 
-def transform_reference_basis_derivatives(L, ir, parameters):
-    data = ir["evaluate_basis"]
-    if isinstance(data, str):
-        # Function has not been requested
-        msg = "transform_reference_basis_derivatives: {}".format(data)
-        return [L.Comment(msg), L.Return(-1)]
-
-    # Get some known dimensions
-    # element_cellname = data["cellname"]
+def _generate_derivative_combinations(L, data):
+    """Generate declarations of the number of reference and physical
+    derivatives of the runtime order, and their combinations."""
     gdim = data["geometric_dimension"]
     tdim = data["topological_dimension"]
     max_degree = data["max_degree"]
-    reference_value_size = data["reference_value_size"]
-    physical_value_size = data["physical_value_size"]
-    num_dofs = len(data["dofs_data"])
-
-    max_g_d = gdim**max_degree
-    max_t_d = tdim**max_degree
-
-    # Output arguments
-    values_symbol = L.Symbol("values")
-
-    # Input arguments
     order = L.Symbol("order")
-    # FIXME: Currently assuming 1 point?
-    num_points = L.Symbol("num_points")
-    reference_values = L.Symbol("reference_values")
-    J = L.Symbol("J")
-    detJ = L.Symbol("detJ")
-    K = L.Symbol("K")
-
-    # Internal variables
-    transform = L.Symbol("transform")
-
-    # Indices, I've tried to use these for a consistent purpose
-    ip = L.Symbol("ip")  # point
-    i = L.Symbol("i")  # physical component
-    k = L.Symbol("k")  # order
-    r = L.Symbol("r")  # physical derivative number
-    s = L.Symbol("s")  # reference derivative number
-    d = L.Symbol("d")  # dof
-
-    iz = L.Symbol("l")  # zeroing arrays
 
     combinations_code = []
+    combinations_t = None
+    combinations_g = None
     if max_degree == 0:
         # Don't need combinations
         # TODO: I think this is the right thing to do to make this still work for order=0?
@@ -258,17 +359,23 @@ def transform_reference_basis_derivatives(L, ir, parameters):
         combinations_code += combinations_code_t
         combinations_code += combinations_code_g
 
-    # Define expected dimensions of argument arrays
-    J = L.FlattenedArray(J, dims=(num_points, gdim, tdim))
-    detJ = L.FlattenedArray(detJ, dims=(num_points, ))
-    K = L.FlattenedArray(K, dims=(num_points, tdim, gdim))
+    return combinations_code, num_derivatives_t, num_derivatives_g, combinations_t, combinations_g
 
-    values = L.FlattenedArray(
-        values_symbol, dims=(num_points, num_dofs, num_derivatives_g, physical_value_size))
-    reference_values = L.FlattenedArray(
-        reference_values, dims=(num_points, num_dofs, num_derivatives_t, reference_value_size))
 
-    # Generate code to compute the derivative transform matrix
+def _generate_transform_matrix(L, data, K, derivatives):
+    """Generate code computing the derivative transform matrix from
+    the inverse Jacobian K[tdim][gdim] at one point."""
+    num_derivatives_t, num_derivatives_g, combinations_t, combinations_g = derivatives
+    max_degree = data["max_degree"]
+    max_g_d = data["geometric_dimension"]**max_degree
+    max_t_d = data["topological_dimension"]**max_degree
+
+    transform = L.Symbol("transform")
+    order = L.Symbol("order")
+    r = L.Symbol("r")
+    s = L.Symbol("s")
+    k = L.Symbol("k")
+
     transform_matrix_code = [
         # Initialize transform matrix to all 1.0
         L.ArrayDecl("double", transform, (max_g_d, max_t_d)),
@@ -284,18 +391,16 @@ def transform_reference_basis_derivatives(L, ir, parameters):
                 (r, 0, num_derivatives_g), (s, 0, num_derivatives_t), (k, 0, order),
                 index_type=index_type,
                 body=L.AssignMul(transform[r, s],
-                                 K[ip, combinations_t[s, k], combinations_g[r, k]])),
+                                 K[combinations_t[s, k], combinations_g[r, k]])),
         ]
+    return transform_matrix_code
 
-    # Initialize values to 0, will be added to inside loops
-    values_init_code = [
-        L.ForRange(
-            iz,
-            0,
-            num_points * num_dofs * num_derivatives_g * physical_value_size,
-            index_type=index_type,
-            body=L.Assign(values_symbol[iz], 0.0)),
-    ]
+
+def _generate_dof_mappings(L, data):
+    """Generate declarations of the dof offsets, and return them with
+    (mapping, dofrange, idof, num_reference_components) for each
+    mapping type of the dofs."""
+    d = L.Symbol("d")
 
     # Make offsets available in generated code
     reference_offsets = L.Symbol("reference_offsets")
@@ -303,11 +408,11 @@ def transform_reference_basis_derivatives(L, ir, parameters):
     dof_attributes_code = [
         L.ArrayDecl(
             "const " + index_type,
-            reference_offsets, (num_dofs, ),
+            reference_offsets, (len(data["dofs_data"]), ),
             values=[dof_data["reference_offset"] for dof_data in data["dofs_data"]]),
         L.ArrayDecl(
             "const " + index_type,
-            physical_offsets, (num_dofs, ),
+            physical_offsets, (len(data["dofs_data"]), ),
             values=[dof_data["physical_offset"] for dof_data in data["dofs_data"]]),
     ]
 
@@ -316,9 +421,7 @@ def transform_reference_basis_derivatives(L, ir, parameters):
     for idof, dof_data in enumerate(data["dofs_data"]):
         mapping_dofs[dof_data["mapping"]].append(idof)
 
-    # Generate code for each mapping type
-    d = L.Symbol("d")
-    transform_apply_code = []
+    dof_mappings = []
     for mapping in sorted(mapping_dofs):
         # Get list of dofs using this mapping
         idofs = mapping_dofs[mapping]
@@ -337,16 +440,39 @@ def transform_reference_basis_derivatives(L, ir, parameters):
             dofrange = (d, 0, len(idofs))
             idof = idofs_symbol[d]
 
-        # NB! Array access to offsets, these are not Python integers
-        reference_offset = reference_offsets[idof]
-        physical_offset = physical_offsets[idof]
-
         # How many components does each basis function with this mapping have?
         # This should be uniform, i.e. there should be only one element in this set:
         num_reference_components, = set(data["dofs_data"][i]["num_components"] for i in idofs)
 
+        dof_mappings.append((mapping, dofrange, idof, num_reference_components))
+
+    return dof_attributes_code, dof_mappings
+
+
+def _generate_transform_apply(L, data, dof_mappings, derivatives, values, reference_values, J,
+                              detJ, K):
+    """Generate code applying the element mappings and the derivative
+    transform at one point, with values[num_dofs][num_derivatives_g][physical_value_size]
+    and reference_values[num_dofs][num_derivatives_t][reference_value_size]."""
+    num_derivatives_t, num_derivatives_g = derivatives[:2]
+    gdim = data["geometric_dimension"]
+    tdim = data["topological_dimension"]
+
+    transform = L.Symbol("transform")
+    reference_offsets = L.Symbol("reference_offsets")
+    physical_offsets = L.Symbol("physical_offsets")
+    i = L.Symbol("i")  # physical component
+    r = L.Symbol("r")  # physical derivative number
+    s = L.Symbol("s")  # reference derivative number
+
+    transform_apply_code = []
+    for mapping, dofrange, idof, num_reference_components in dof_mappings:
+        # NB! Array access to offsets, these are not Python integers
+        reference_offset = reference_offsets[idof]
+        physical_offset = physical_offsets[idof]
+
         M_scale, M_row, num_physical_components = generate_element_mapping(
-            mapping, i, num_reference_components, tdim, gdim, J[ip], detJ[ip], K[ip])
+            mapping, i, num_reference_components, tdim, gdim, J, detJ, K)
 
         #            transform_apply_body = [
         #                L.AssignAdd(values[ip, idof, r, physical_offset + k],
@@ -372,7 +498,7 @@ def transform_reference_basis_derivatives(L, ir, parameters):
                     L.VariableDecl(
                         "const double", mapped_value,
                         M_scale * sum(
-                            M_row[jj] * reference_values[ip, idof, s, reference_offset + jj]
+                            M_row[jj] * reference_values[idof, s, reference_offset + jj]
                             for jj in range(num_reference_components))),
                     # Apply derivative transformation, for order=0 this reduces to
                     # values[ip,idof,0,physical_offset+i] = transform[0,0]*mapped_value
@@ -381,12 +507,77 @@ def transform_reference_basis_derivatives(L, ir, parameters):
                         (r, 0, num_derivatives_g),
                         index_type=index_type,
                         body=[
-                            L.AssignAdd(values[ip, idof, r, physical_offset + i],
+                            L.AssignAdd(values[idof, r, physical_offset + i],
                                         transform[r, s] * mapped_value)
                         ])
                 ])
         ]
 
+    return transform_apply_code, msg
+
+
+def transform_reference_basis_derivatives(L, ir, parameters):
+    data = ir["evaluate_basis"]
+    if isinstance(data, str):
+        # Function has not been requested
+        msg = "transform_reference_basis_derivatives: {}".format(data)
+        return [L.Comment(msg), L.Return(-1)]
+
+    # Get some known dimensions
+    # element_cellname = data["cellname"]
+    gdim = data["geometric_dimension"]
+    tdim = data["topological_dimension"]
+    reference_value_size = data["reference_value_size"]
+    physical_value_size = data["physical_value_size"]
+    num_dofs = len(data["dofs_data"])
+
+    # Output arguments
+    values_symbol = L.Symbol("values")
+
+    # Input arguments
+    # FIXME: Currently assuming 1 point?
+    num_points = L.Symbol("num_points")
+    reference_values = L.Symbol("reference_values")
+    J = L.Symbol("J")
+    detJ = L.Symbol("detJ")
+    K = L.Symbol("K")
+
+    # Indices, I've tried to use these for a consistent purpose
+    ip = L.Symbol("ip")  # point
+    iz = L.Symbol("l")  # zeroing arrays
+
+    combinations_code, *derivatives = _generate_derivative_combinations(L, data)
+    num_derivatives_t, num_derivatives_g = derivatives[:2]
+
+    # Define expected dimensions of argument arrays
+    J = L.FlattenedArray(J, dims=(num_points, gdim, tdim))
+    detJ = L.FlattenedArray(detJ, dims=(num_points, ))
+    K = L.FlattenedArray(K, dims=(num_points, tdim, gdim))
+
+    values = L.FlattenedArray(
+        values_symbol, dims=(num_points, num_dofs, num_derivatives_g, physical_value_size))
+    reference_values = L.FlattenedArray(
+        reference_values, dims=(num_points, num_dofs, num_derivatives_t, reference_value_size))
+
+    # Generate code to compute the derivative transform matrix
+    transform_matrix_code = _generate_transform_matrix(L, data, K[ip], derivatives)
+
+    # Initialize values to 0, will be added to inside loops
+    values_init_code = [
+        L.ForRange(
+            iz,
+            0,
+            num_points * num_dofs * num_derivatives_g * physical_value_size,
+            index_type=index_type,
+            body=L.Assign(values_symbol[iz], 0.0)),
+    ]
+
+    # Generate code for each mapping type
+    dof_attributes_code, dof_mappings = _generate_dof_mappings(L, data)
+    transform_apply_code, msg = _generate_transform_apply(
+        L, data, dof_mappings, derivatives, values[ip], reference_values[ip], J[ip], detJ[ip],
+        K[ip])
+
     # Transform for each point
     point_loop_code = [
         L.ForRange(
@@ -403,6 +594,105 @@ def transform_reference_basis_derivatives(L, ir, parameters):
     return code
 
 
+def transform_reference_basis_derivatives_cells(L, ir, parameters):
+    data = ir["evaluate_basis"]
+    if isinstance(data, str):
+        # Function has not been requested
+        msg = "transform_reference_basis_derivatives_cells: {}".format(data)
+        return [L.Comment(msg), L.Return(-1)]
+
+    # Get some known dimensions
+    gdim = data["geometric_dimension"]
+    tdim = data["topological_dimension"]
+    reference_value_size = data["reference_value_size"]
+    physical_value_size = data["physical_value_size"]
+    num_dofs = len(data["dofs_data"])
+
+    # Input arguments
+    num_cells = L.Symbol("num_cells")
+    num_points = L.Symbol("num_points")
+    affine = L.Symbol("affine")
+
+    # Indices
+    c = L.Symbol("c")  # cell
+    ip = L.Symbol("ip")  # point
+    iz = L.Symbol("l")  # zeroing arrays
+
+    combinations_code, *derivatives = _generate_derivative_combinations(L, data)
+    num_derivatives_t, num_derivatives_g = derivatives[:2]
+
+    # The reference values are shared by all cells, and the values of
+    # each cell are addressed from the start of the cell
+    cell_size = num_points * num_dofs * num_derivatives_g * physical_value_size
+    values_cell = L.Symbol("values_cell")
+    values = L.FlattenedArray(
+        values_cell, dims=(num_points, num_dofs, num_derivatives_g, physical_value_size))
+    reference_values = L.FlattenedArray(
+        L.Symbol("reference_values"),
+        dims=(num_points, num_dofs, num_derivatives_t, reference_value_size))
+
+    # Initialize values of each cell to 0 right before they are added
+    # to, while they are in cache
+    values_init_code = [
+        L.VariableDecl("double* restrict", values_cell, L.Symbol("values") + c * cell_size),
+        L.ForRange(
+            iz, 0, cell_size, index_type=index_type, body=L.Assign(values_cell[iz], 0.0)),
+    ]
+
+    dof_attributes_code, dof_mappings = _generate_dof_mappings(L, data)
+
+    # Affine cells, geometry given once per cell and the transform
+    # matrix computed outside the loop over points
+    J = L.FlattenedArray(L.Symbol("J"), dims=(num_cells, gdim, tdim))
+    detJ = L.FlattenedArray(L.Symbol("detJ"), dims=(num_cells, ))
+    K = L.FlattenedArray(L.Symbol("K"), dims=(num_cells, tdim, gdim))
+    transform_apply_code, msg = _generate_transform_apply(
+        L, data, dof_mappings, derivatives, values[ip], reference_values[ip], J[c], detJ[c],
+        K[c])
+    affine_code = [
+        L.ForRange(
+            c,
+            0,
+            num_cells,
+            index_type=index_type,
+            body=values_init_code + _generate_transform_matrix(L, data, K[c], derivatives) + [
+                L.ForRange(ip, 0, num_points, index_type=index_type, body=transform_apply_code)
+            ])
+    ]
+
+    # Non-affine cells, geometry given for each point of each cell
+    J = L.FlattenedArray(L.Symbol("J"), dims=(num_cells, num_points, gdim, tdim))
+    detJ = L.FlattenedArray(L.Symbol("detJ"), dims=(num_cells, num_points))
+    K = L.FlattenedArray(L.Symbol("K"), dims=(num_cells, num_points, tdim, gdim))
+    transform_apply_code, msg = _generate_transform_apply(
+        L, data, dof_mappings, derivatives, values[ip], reference_values[ip], J[c, ip],
+        detJ[c, ip], K[c, ip])
+    nonaffine_code = [
+        L.ForRange(
+            c,
+            0,
+            num_cells,
+            index_type=index_type,
+            body=values_init_code + [
+                L.ForRange(
+                    ip,
+                    0,
+                    num_points,
+                    index_type=index_type,
+                    body=_generate_transform_matrix(L, data, K[c, ip], derivatives)
+                    + transform_apply_code)
+            ])
+    ]
+
+    # Join code
+    code = (combinations_code + dof_attributes_code + [
+        L.If(affine, affine_code),
+        L.Else(nonaffine_code),
+        L.Return(0),
+    ])
+    return code
+
+
 def generator(ir, parameters):
     """Generate UFC code for a finite element"""
     d = {}
@@ -441,10 +731,32 @@ def generator(ir, parameters):
     assert isinstance(statements, list)
     d["transform_values"] = L.StatementList(statements)
 
+    statements = transform_reference_basis_derivatives_cells(L, ir, parameters)
+    assert isinstance(statements, list)
+    d["transform_reference_basis_derivatives_cells"] = L.StatementList(statements)
+
+    statements = transform_values_cells(L, ir, parameters)
+    assert isinstance(statements, list)
+    d["transform_values_cells"] = L.StatementList(statements)
+
     statements = tabulate_reference_dof_coordinates(L, ir, parameters)
     assert isinstance(statements, list)
     d["tabulate_reference_dof_coordinates"] = L.StatementList(statements)
 
+    d["num_interpolation_points"] = len(ir["interpolation_matrix"].get("points", ()))
+
+    statements = tabulate_interpolation_points(L, ir, parameters)
+    assert isinstance(statements, list)
+    d["tabulate_interpolation_points"] = L.StatementList(statements)
+
+    statements = tabulate_interpolation_matrix(L, ir, parameters)
+    assert isinstance(statements, list)
+    d["tabulate_interpolation_matrix"] = L.StatementList(statements)
+
+    statements = interpolate_cells(L, ir, parameters)
+    assert isinstance(statements, list)
+    d["interpolate_cells"] = L.StatementList(statements)
+
     statements = create_sub_element(L, ir)
     d["sub_element_declaration"] = sub_element_declaration(L, ir)
     d["create_sub_element"] = statements
@@ -464,3 +776,31 @@ def generator(ir, parameters):
     declaration = ufc_finite_element.declaration.format(factory_name=ir["classname"])
 
     return declaration, implementation
+
+
+def basisvalues_generator(ir_finite_elements, parameters):
+    """Generate the basisvalues functions shared by the finite elements,
+    one for each cell and highest embedded degree of an element"""
+    import ffc.uflacs.language.cnodes as L
+
+    degrees = set()
+    for ir in ir_finite_elements:
+        data = ir["evaluate_basis"]
+        if isinstance(data, str):
+            continue
+        embedded_degree = max(dof_data["embedded_degree"] for dof_data in data["dofs_data"])
+        if embedded_degree > 0:
+            degrees.add((data["cellname"], data["topological_dimension"], embedded_degree))
+
+    implementation = ""
+    for cellname, tdim, embedded_degree in sorted(degrees):
+        statements = generate_basisvalues_function(L, cellname, tdim, embedded_degree)
+        name = basisvalues_function_name(cellname, embedded_degree)
+        implementation += ufc_finite_element.basisvalues_implementation.format(
+            name=name,
+            guard="UFC_" + name.upper(),
+            cellname=cellname,
+            embedded_degree=embedded_degree,
+            body=L.StatementList(statements))
+
+    return "", implementation
@@ -45,7 +45,7 @@ int transform_reference_basis_derivatives_{factory_name}(
   {transform_reference_basis_derivatives}
 }}
 
-void transform_values_{factory_name}(
+int transform_values_{factory_name}(
      ufc_scalar_t* restrict reference_values,
      const ufc_scalar_t* restrict physical_values,
      const double* restrict coordinate_dofs,
@@ -55,11 +55,44 @@ void transform_values_{factory_name}(
   {transform_values}
 }}
 
+int transform_reference_basis_derivatives_cells_{factory_name}(
+    double * restrict values, int order, int num_cells, int num_points,
+    const double * restrict reference_values, const double * restrict J,
+    const double * restrict detJ, const double * restrict K, int affine)
+{{
+  {transform_reference_basis_derivatives_cells}
+}}
+
+int transform_values_cells_{factory_name}(
+     ufc_scalar_t* restrict reference_values,
+     const ufc_scalar_t* restrict physical_values,
+     int num_cells, const double* restrict J,
+     const double* restrict detJ, const double* restrict K)
+{{
+  {transform_values_cells}
+}}
+
 void tabulate_reference_dof_coordinates_{factory_name}(double* restrict reference_dof_coordinates)
 {{
   {tabulate_reference_dof_coordinates}
 }}
 
+int tabulate_interpolation_points_{factory_name}(double* restrict X)
+{{
+  {tabulate_interpolation_points}
+}}
+
+int tabulate_interpolation_matrix_{factory_name}(double* restrict M)
+{{
+  {tabulate_interpolation_matrix}
+}}
+
+int interpolate_cells_{factory_name}(double* restrict dofs, int num_cells,
+                                     const double* restrict values)
+{{
+  {interpolate_cells}
+}}
+
 {sub_element_declaration}
 ufc_finite_element* create_sub_element_{factory_name}(int i)
 {{
@@ -87,7 +120,13 @@ ufc_finite_element* create_{factory_name}(void)
   element->evaluate_reference_basis_derivatives = evaluate_reference_basis_derivatives_{factory_name};
   element->transform_reference_basis_derivatives = transform_reference_basis_derivatives_{factory_name};
   element->transform_values = transform_values_{factory_name};
+  element->transform_reference_basis_derivatives_cells = transform_reference_basis_derivatives_cells_{factory_name};
+  element->transform_values_cells = transform_values_cells_{factory_name};
   element->tabulate_reference_dof_coordinates = tabulate_reference_dof_coordinates_{factory_name};
+  element->num_interpolation_points = {num_interpolation_points};
+  element->tabulate_interpolation_points = tabulate_interpolation_points_{factory_name};
+  element->tabulate_interpolation_matrix = tabulate_interpolation_matrix_{factory_name};
+  element->interpolate_cells = interpolate_cells_{factory_name};
   element->num_sub_elements = {num_sub_elements};
   element->create_sub_element = create_sub_element_{factory_name};
   element->create = create_{factory_name};
@@ -97,3 +136,17 @@ ufc_finite_element* create_{factory_name}(void)
 
 // End of code for element {factory_name}
 """
+
+basisvalues_implementation = """
+// Orthonormal expansion basis of degree {embedded_degree} on the reference {cellname},
+// shared by the elements of this file. Computes the basisvalues at
+// num_points points X, stored as basisvalues[member * ldb + point].
+#ifndef {guard}
+#define {guard}
+static void {name}(double* restrict basisvalues, int ldb, int num_points,
+                   const double* restrict X)
+{{
+  {body}
+}}
+#endif
+"""
@@ -8,6 +8,7 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with UFLACS. If not, see <http://www.gnu.org/licenses/>.
 
+from ffc.classname import make_name
 from ffc.representation import pick_representation
 from ffc.backends.ufc import integrals_template as ufc_integrals
 
@@ -33,17 +34,84 @@ def ufc_integral_generator(ir, parameters):
     if parameters["generate_dummy_tabulate_tensor"]:
         code["tabulate_tensor"] = ""
 
+    # Count calls and accumulate time spent in tabulate_tensor
+    if parameters["add_tabulate_tensor_timing"]:
+        start = ufc_integrals.timing_start
+        end = ufc_integrals.timing_end.format(factory_name=factory_name)
+        code["tabulate_tensor"] = start + code["tabulate_tensor"] + end
+        for name in ("tabulate_tensor_workspace", "tabulate_tensor_geometry"):
+            if code.get(name) is not None:
+                code[name] = start + code[name] + end
+
     # Format tabulate tensor body
     tabulate_tensor_declaration = ufc_integrals.tabulate_implementation[
         integral_type]
     tabulate_tensor_fn = tabulate_tensor_declaration.format(
         factory_name=factory_name, tabulate_tensor=code["tabulate_tensor"])
 
+    # Declare functions of other generated objects called by tabulate_tensor
+    declarations = code.get("tabulate_tensor_declarations")
+    if declarations:
+        tabulate_tensor_fn = "\n" + declarations + "\n" + tabulate_tensor_fn
+
+    # Declare timing counters of this integral, visible to the timings
+    # accessor if the integral is in a separate source file
+    if parameters["add_tabulate_tensor_timing"]:
+        storage = "" if parameters["split_integrals"] else "static "
+        tabulate_tensor_fn = ufc_integrals.timing_declaration.format(
+            storage=storage, factory_name=factory_name) + tabulate_tensor_fn
+
+    # Format tabulate tensor variant taking a workspace for temporaries,
+    # if generated by the representation
+    tabulate_tensor_workspace = code.get("tabulate_tensor_workspace")
+    if tabulate_tensor_workspace is not None and not parameters["generate_dummy_tabulate_tensor"]:
+        tabulate_tensor_workspace_fn = ufc_integrals.tabulate_workspace_implementation[
+            integral_type].format(
+                factory_name=factory_name, tabulate_tensor=tabulate_tensor_workspace)
+        tabulate_tensor_workspace_name = "tabulate_tensor_workspace_" + factory_name
+        workspace_size = code["workspace_size"]
+    else:
+        tabulate_tensor_workspace_fn = ""
+        tabulate_tensor_workspace_name = "NULL"
+        workspace_size = 0
+
+    # Format tabulate tensor variant taking the cell constant geometry
+    # of affine simplex cells, if generated by the representation
+    tabulate_tensor_geometry = code.get("tabulate_tensor_geometry")
+    if tabulate_tensor_geometry is not None and not parameters["generate_dummy_tabulate_tensor"]:
+        tabulate_tensor_geometry_fn = ufc_integrals.tabulate_geometry_implementation[
+            integral_type].format(
+                factory_name=factory_name, tabulate_tensor=tabulate_tensor_geometry)
+        tabulate_tensor_geometry_name = "tabulate_tensor_geometry_" + factory_name
+    else:
+        tabulate_tensor_geometry_fn = ""
+        tabulate_tensor_geometry_name = "NULL"
+
     # Format implementation code
     implementation = ufc_integrals.factory.format(
         type=integral_type,
         factory_name=factory_name,
         enabled_coefficients=code["enabled_coefficients"],
-        tabulate_tensor=tabulate_tensor_fn)
+        tabulate_tensor=tabulate_tensor_fn,
+        tabulate_tensor_workspace=tabulate_tensor_workspace_fn,
+        tabulate_tensor_workspace_name=tabulate_tensor_workspace_name,
+        workspace_size=workspace_size,
+        tabulate_tensor_geometry=tabulate_tensor_geometry_fn,
+        tabulate_tensor_geometry_name=tabulate_tensor_geometry_name)
+
+    return declaration, implementation
+
 
+def ufc_integral_timings_generator(ir_integrals, prefix, parameters):
+    """Generate UFC code for reading and resetting the timings of all
+    integrals, generated with add_tabulate_tensor_timing"""
+    name = make_name(prefix, "tabulate_tensor", "timings")
+    declaration = ufc_integrals.timings_declaration.format(name=name)
+    all_timings = ", ".join("&timing_" + ir["classname"] for ir in ir_integrals)
+    implementation = ufc_integrals.timings_implementation.format(
+        name=name, num_integrals=len(ir_integrals), all_timings=all_timings)
+    if parameters["split_integrals"]:
+        implementation = "".join(
+            ufc_integrals.timing_extern_declaration.format(factory_name=ir["classname"])
+            for ir in ir_integrals) + implementation
     return declaration, implementation
@@ -62,11 +62,131 @@ void tabulate_tensor_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t
 """
 }
 
+tabulate_workspace_implementation = {
+    "cell":
+    """
+void tabulate_tensor_workspace_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                              const double* restrict coordinate_dofs,
+                                              int cell_orientation,
+                                              double* restrict workspace)
+{{
+{tabulate_tensor}
+}}
+""",
+    "exterior_facet":
+    """
+void tabulate_tensor_workspace_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t* const *w,
+                                               const double* restrict coordinate_dofs,
+                                               int facet, int cell_orientation,
+                                               double* restrict workspace)
+{{
+{tabulate_tensor}
+}}
+""",
+    "interior_facet":
+    """
+void tabulate_tensor_workspace_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t*const * w,
+                                              const double* restrict coordinate_dofs_0,
+                                              const double* restrict coordinate_dofs_1, int facet_0,
+                                              int facet_1, int cell_orientation_0,
+                                              int cell_orientation_1,
+                                              double* restrict workspace)
+{{
+{tabulate_tensor}
+}}
+""",
+    "vertex":
+    """
+void tabulate_tensor_workspace_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t* const * w,
+                                              const double* restrict coordinate_dofs, int vertex,
+                                              int cell_orientation,
+                                              double* restrict workspace)
+{{
+{tabulate_tensor}
+}}
+""",
+    "custom":
+    """
+void tabulate_tensor_workspace_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t* const * w,
+                                    const double* restrict coordinate_dofs,
+                                    int num_quadrature_points,
+                                    const double* restrict quadrature_points,
+                                    const double* restrict quadrature_weights,
+                                    const double* restrict facet_normals,
+                                    int cell_orientation,
+                                    double* restrict workspace)
+{{
+{tabulate_tensor}
+}}
+"""
+}
+
+tabulate_geometry_implementation = {
+    "cell":
+    """
+void tabulate_tensor_geometry_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                             const double* restrict coordinate_dofs,
+                                             int cell_orientation,
+                                             const ufc_affine_geometry* restrict geometry)
+{{
+{tabulate_tensor}
+}}
+""",
+    "exterior_facet":
+    """
+void tabulate_tensor_geometry_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t* const *w,
+                                              const double* restrict coordinate_dofs,
+                                              int facet, int cell_orientation,
+                                              const ufc_affine_geometry* restrict geometry)
+{{
+{tabulate_tensor}
+}}
+""",
+    "interior_facet":
+    """
+void tabulate_tensor_geometry_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t*const * w,
+                                             const double* restrict coordinate_dofs_0,
+                                             const double* restrict coordinate_dofs_1, int facet_0,
+                                             int facet_1, int cell_orientation_0,
+                                             int cell_orientation_1,
+                                             const ufc_affine_geometry* restrict geometry_0,
+                                             const ufc_affine_geometry* restrict geometry_1)
+{{
+{tabulate_tensor}
+}}
+""",
+    "vertex":
+    """
+void tabulate_tensor_geometry_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t* const * w,
+                                             const double* restrict coordinate_dofs, int vertex,
+                                             int cell_orientation,
+                                             const ufc_affine_geometry* restrict geometry)
+{{
+{tabulate_tensor}
+}}
+""",
+    "custom":
+    """
+void tabulate_tensor_geometry_{factory_name}(ufc_scalar_t* restrict A, const ufc_scalar_t* const * w,
+                                    const double* restrict coordinate_dofs,
+                                    int num_quadrature_points,
+                                    const double* restrict quadrature_points,
+                                    const double* restrict quadrature_weights,
+                                    const double* restrict facet_normals,
+                                    int cell_orientation,
+                                    const ufc_affine_geometry* restrict geometry)
+{{
+{tabulate_tensor}
+}}
+"""
+}
+
 factory = """
 // Code for {type}_integral {factory_name}
 
 {tabulate_tensor}
-
+{tabulate_tensor_workspace}
+{tabulate_tensor_geometry}
 ufc_{type}_integral* create_{factory_name}(void)
 {{
   static const bool enabled{enabled_coefficients}
@@ -74,8 +194,56 @@ ufc_{type}_integral* create_{factory_name}(void)
   ufc_{type}_integral* integral = malloc(sizeof(*integral));
   integral->enabled_coefficients = enabled;
   integral->tabulate_tensor = tabulate_tensor_{factory_name};
+  integral->workspace_size = {workspace_size};
+  integral->tabulate_tensor_workspace = {tabulate_tensor_workspace_name};
+  integral->tabulate_tensor_geometry = {tabulate_tensor_geometry_name};
   return integral;
 }};
 
 // End of code for {type}_integral {factory_name}
 """
+
+timing_declaration = """
+{storage}ufc_tabulate_tensor_timing timing_{factory_name} = {{ "{factory_name}", 0, 0.0 }};
+"""
+
+timing_extern_declaration = """\
+extern ufc_tabulate_tensor_timing timing_{factory_name};
+"""
+
+timing_start = """\
+    struct timespec timing_start, timing_end;
+    clock_gettime(CLOCK_MONOTONIC, &timing_start);
+"""
+
+timing_end = """
+    clock_gettime(CLOCK_MONOTONIC, &timing_end);
+    timing_{factory_name}.num_calls += 1;
+    timing_{factory_name}.time += (timing_end.tv_sec - timing_start.tv_sec)
+        + 1e-9 * (timing_end.tv_nsec - timing_start.tv_nsec);\
+"""
+
+timings_declaration = """
+int {name}(ufc_tabulate_tensor_timing* timings, bool reset);
+"""
+
+timings_implementation = """
+// Copy the call counts and times of all integrals into timings, if
+// not NULL, and reset them if reset is true. Returns the number of
+// integrals.
+int {name}(ufc_tabulate_tensor_timing* timings, bool reset)
+{{
+  static ufc_tabulate_tensor_timing* const all_timings[{num_integrals}] = {{ {all_timings} }};
+  for (int i = 0; i < {num_integrals}; ++i)
+  {{
+    if (timings)
+      timings[i] = *all_timings[i];
+    if (reset)
+    {{
+      all_timings[i]->num_calls = 0;
+      all_timings[i]->time = 0.0;
+    }}
+  }}
+  return {num_integrals};
+}}
+"""
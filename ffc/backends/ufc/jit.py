@@ -5,16 +5,32 @@
 #
 # SPDX-License-Identifier:    LGPL-3.0-or-later
 
+import concurrent.futures
+import functools
 import hashlib
 import importlib
+import importlib.util
+import logging
+import os
+import shlex
+import subprocess
+import sysconfig
 
 import cffi
+import numpy
 
 import ffc
+import ffc.backends.ufc
+import ffc.classname
+import ffc.compiler
+import ffc.parameters
+import ffc.representation
 
-UFC_HEADER_DECL = """
-typedef double ufc_scalar_t;  /* Hack to deal with scalar type */
+logger = logging.getLogger(__name__)
+
+UFC_SCALAR_DECL = "typedef {} ufc_scalar_t;  /* Hack to deal with scalar type */\n"
 
+UFC_HEADER_DECL = """
 typedef struct ufc_coordinate_mapping ufc_coordinate_mapping;
 typedef struct ufc_finite_element ufc_finite_element;
 typedef struct ufc_dofmap ufc_dofmap;
@@ -56,13 +72,27 @@ int (*transform_reference_basis_derivatives)(
     const double* restrict reference_values, const double* restrict X,
     const double* restrict J, const double* restrict detJ,
     const double* restrict K, int cell_orientation);
-void (*transform_values)(
+int (*transform_values)(
     ufc_scalar_t* restrict reference_values,
     const ufc_scalar_t* restrict physical_values,
     const double* restrict coordinate_dofs,
     int cell_orientation, const ufc_coordinate_mapping* cm);
+int (*transform_reference_basis_derivatives_cells)(
+    double* restrict values, int order, int num_cells, int num_points,
+    const double* restrict reference_values, const double* restrict J,
+    const double* restrict detJ, const double* restrict K, int affine);
+int (*transform_values_cells)(
+    ufc_scalar_t* restrict reference_values,
+    const ufc_scalar_t* restrict physical_values,
+    int num_cells, const double* restrict J, const double* restrict detJ,
+    const double* restrict K);
 void (*tabulate_reference_dof_coordinates)(
     double* restrict reference_dof_coordinates);
+int num_interpolation_points;
+int (*tabulate_interpolation_points)(double* restrict X);
+int (*tabulate_interpolation_matrix)(double* restrict M);
+int (*interpolate_cells)(double* restrict dofs, int num_cells,
+                         const double* restrict values);
 int num_sub_elements;
 ufc_finite_element* (*create_sub_element)(int i);
 ufc_finite_element* (*create)(void);
@@ -82,6 +112,10 @@ int num_entity_closure_dofs[4];
 void (*tabulate_dofs)(int64_t* restrict dofs,
                         const int64_t* restrict num_global_entities,
                         const int64_t** entity_indices);
+void (*tabulate_dofs_cells)(int64_t* restrict dofs, int num_cells,
+                            const int64_t* restrict num_global_entities,
+                            const int64_t* restrict entity_indices);
+void (*tabulate_dof_permutations)(int* restrict perm, const int64_t* restrict global_indices);
 void (*tabulate_facet_dofs)(int* restrict dofs, int facet);
 void (*tabulate_entity_dofs)(int* restrict dofs, int d, int i);
 void (*tabulate_entity_closure_dofs)(int* restrict dofs, int d, int i);
@@ -92,6 +126,14 @@ ufc_dofmap* (*create)(void);
 """
 
 UFC_COORDINATEMAPPING_DECL = """
+typedef struct ufc_affine_geometry
+{
+double x0[3];
+double J[9];
+double detJ;
+double K[9];
+} ufc_affine_geometry;
+
 typedef struct ufc_coordinate_mapping
 {
 const char* signature;
@@ -129,6 +171,34 @@ void (*compute_geometry)(double* restrict x, double* restrict J,
                             int cell_orientation);
 void (*compute_midpoint_geometry)(double* restrict x, double* restrict J,
                                     const double* restrict coordinate_dofs);
+int (*compute_affine_geometry)(ufc_affine_geometry* restrict geometry,
+                               const double* restrict coordinate_dofs,
+                               int cell_orientation);
+void (*compute_physical_coordinates_cells)(
+    double* restrict x, int num_cells, int num_points, const double* restrict X,
+    const double* restrict coordinate_dofs);
+void (*compute_jacobians_cells)(double* restrict J, int num_cells, int num_points,
+                                const double* restrict X,
+                                const double* restrict coordinate_dofs);
+void (*compute_jacobian_determinants_cells)(double* restrict detJ, int num_cells,
+                                            int num_points, const double* restrict J,
+                                            const int* restrict cell_orientations);
+void (*compute_jacobian_inverses_cells)(double* restrict K, int num_cells, int num_points,
+                                        const double* restrict J,
+                                        const double* restrict detJ);
+void (*compute_geometry_cells)(double* restrict x, double* restrict J,
+                               double* restrict detJ, double* restrict K,
+                               int num_cells, int num_points,
+                               const double* restrict X,
+                               const double* restrict coordinate_dofs,
+                               const int* restrict cell_orientations);
+void (*compute_midpoint_geometry_cells)(double* restrict x, double* restrict J,
+                                        int num_cells,
+                                        const double* restrict coordinate_dofs);
+int (*compute_reference_coordinates_batched)(
+    double* restrict X, int num_points, const double* restrict x,
+    const double* restrict coordinate_dofs, int cell_orientation,
+    double tolerance, int max_iterations, int* restrict num_iterations);
 
 } ufc_coordinate_mapping;
 """
@@ -137,50 +207,117 @@ UFC_INTEGRAL_DECL = """
 typedef struct ufc_cell_integral
 {
 const bool* enabled_coefficients;
-void (*tabulate_tensor)(double* restrict A, const double* const* w,
+void (*tabulate_tensor)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
                         const double* restrict coordinate_dofs,
                         int cell_orientation);
+int workspace_size;
+void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                  const double* restrict coordinate_dofs,
+                                  int cell_orientation,
+                                  double* restrict workspace);
+void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                 const double* restrict coordinate_dofs,
+                                 int cell_orientation,
+                                 const ufc_affine_geometry* restrict geometry);
 } ufc_cell_integral;
 
 typedef struct ufc_exterior_facet_integral
 {
 const bool* enabled_coefficients;
-void (*tabulate_tensor)(double* restrict A, const double* const* w,
+void (*tabulate_tensor)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
                         const double* restrict coordinate_dofs, int facet,
                         int cell_orientation);
+int workspace_size;
+void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                  const double* restrict coordinate_dofs, int facet,
+                                  int cell_orientation,
+                                  double* restrict workspace);
+void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                 const double* restrict coordinate_dofs, int facet,
+                                 int cell_orientation,
+                                 const ufc_affine_geometry* restrict geometry);
 } ufc_exterior_facet_integral;
 
 typedef struct ufc_interior_facet_integral
 {
 const bool* enabled_coefficients;
-void (*tabulate_tensor)(double* restrict A, const double* const* w,
+void (*tabulate_tensor)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
                         const double* restrict coordinate_dofs_0,
                         const double* restrict coordinate_dofs_1,
                         int facet_0, int facet_1, int cell_orientation_0,
                         int cell_orientation_1);
+int workspace_size;
+void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                  const double* restrict coordinate_dofs_0,
+                                  const double* restrict coordinate_dofs_1,
+                                  int facet_0, int facet_1, int cell_orientation_0,
+                                  int cell_orientation_1,
+                                  double* restrict workspace);
+void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                 const double* restrict coordinate_dofs_0,
+                                 const double* restrict coordinate_dofs_1,
+                                 int facet_0, int facet_1, int cell_orientation_0,
+                                 int cell_orientation_1,
+                                 const ufc_affine_geometry* restrict geometry_0,
+                                 const ufc_affine_geometry* restrict geometry_1);
 } ufc_interior_facet_integral;
 
 typedef struct ufc_vertex_integral
 {
 const bool* enabled_coefficients;
-void (*tabulate_tensor)(double* restrict A, const double* const* w,
+void (*tabulate_tensor)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
                         const double* restrict coordinate_dofs, int vertex,
                         int cell_orientation);
+int workspace_size;
+void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                  const double* restrict coordinate_dofs, int vertex,
+                                  int cell_orientation,
+                                  double* restrict workspace);
+void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                 const double* restrict coordinate_dofs, int vertex,
+                                 int cell_orientation,
+                                 const ufc_affine_geometry* restrict geometry);
 } ufc_vertex_integral;
 
 typedef struct ufc_custom_integral
 {
 const bool* enabled_coefficients;
-void (*tabulate_tensor)(double* restrict A, const double* const* w,
+void (*tabulate_tensor)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
                         const double* restrict coordinate_dofs,
                         int num_quadrature_points,
                         const double* restrict quadrature_points,
                         const double* restrict quadrature_weights,
                         const double* restrict facet_normals,
                         int cell_orientation);
+int workspace_size;
+void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                  const double* restrict coordinate_dofs,
+                                  int num_quadrature_points,
+                                  const double* restrict quadrature_points,
+                                  const double* restrict quadrature_weights,
+                                  const double* restrict facet_normals,
+                                  int cell_orientation,
+                                  double* restrict workspace);
+void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                 const double* restrict coordinate_dofs,
+                                 int num_quadrature_points,
+                                 const double* restrict quadrature_points,
+                                 const double* restrict quadrature_weights,
+                                 const double* restrict facet_normals,
+                                 int cell_orientation,
+                                 const ufc_affine_geometry* restrict geometry);
 } ufc_custom_integral;
 """
 
+UFC_TIMING_DECL = """
+typedef struct ufc_tabulate_tensor_timing
+{
+const char* name;
+int64_t num_calls;
+double time;
+} ufc_tabulate_tensor_timing;
+"""
+
 UFC_FORM_DECL = """
 typedef struct ufc_form
 {
@@ -219,27 +356,189 @@ ufc_custom_integral* (*create_default_custom_integral)(void);
 """
 
 
-def compile_elements(elements, module_name=None):
+# Function of the instrumented module of build profile "pgo", writing
+# the profiles recorded by the training run
+PROFILE_DUMP_CODE = """
+extern void __gcov_dump(void);
+void ffc_profile_dump(void) { __gcov_dump(); }
+"""
+
+PROFILE_DUMP_DECL = "void ffc_profile_dump(void);\n"
+
+
+def _scalar_decl(parameters):
+    """Declare ufc_scalar_t as in the generated code, double or float"""
+    scalar_type = (parameters or {}).get("scalar_type", "double")
+    return UFC_SCALAR_DECL.format("float" if scalar_type == "float" else "double")
+
+
+def _write_if_changed(filename, code):
+    """Write code to file, keeping the file if it has the same contents"""
+    if os.path.exists(filename):
+        with open(filename) as f:
+            if f.read() == code:
+                return
+    with open(filename, "w") as f:
+        f.write(code)
+
+
+def _c_compiler():
+    """Return the C compiler command used for Python extensions"""
+    return os.environ.get("CC") or sysconfig.get_config_var("CC") or "cc"
+
+
+def _build_profile(parameters):
+    """Return build profile, its extra C compiler flags, and a string
+    identifying the profile and compiler for module names"""
+    profile = (parameters or {}).get("build_profile", "portable")
+    flags = ffc.backends.ufc.get_build_profile_flags(profile)
+    identity = ffc.backends.ufc.get_compiler_identity(_c_compiler(), tuple(flags))
+    return profile, flags, profile + ";" + identity
+
+
+def _compile_objects(sources, header, header_name, build_dir, include_dirs, define_macros,
+                     extra_args, num_workers, rebuild=False):
+    """Compile sources [(name, code)] including the header into object
+    files in build_dir, with a pool of num_workers C compiler processes
+    (0 for the number of CPUs). Objects newer than their source are
+    kept, unless rebuild is true. Returns the object filenames in the
+    order of sources."""
+    os.makedirs(build_dir, exist_ok=True)
+    _write_if_changed(os.path.join(build_dir, header_name), header)
+
+    # Compile with the compiler and flags used for Python extensions
+    flags = [sysconfig.get_config_var(name) or "" for name in ("CFLAGS", "CCSHARED")]
+    flags.append(os.environ.get("CFLAGS", ""))
+    command = shlex.split(_c_compiler()) + shlex.split(" ".join(flags)) + list(extra_args)
+    command += ["-I" + d for d in [build_dir] + include_dirs]
+    command += ["-D" + name if value is None else "-D{}={}".format(name, value)
+                for name, value in define_macros]
+
+    def compile_object(name, code):
+        source = os.path.join(build_dir, name + ".c")
+        obj = os.path.join(build_dir, name + ".o")
+        _write_if_changed(source, code)
+        if not rebuild and os.path.exists(obj) and os.path.getmtime(obj) >= os.path.getmtime(source):
+            return obj
+        result = subprocess.run(command + ["-c", source, "-o", obj],
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True)
+        if result.returncode != 0:
+            raise cffi.VerificationError("CompileError: {}\n{}".format(source, result.stdout))
+        return obj
+
+    num_workers = min(num_workers or os.cpu_count() or 1, max(len(sources), 1))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as pool:
+        return list(pool.map(lambda source: compile_object(*source), sources))
+
+
+def _train_form(form, compiled_form, ffi, scalar_type, num_calls=20, seed=17):
+    """Call tabulate_tensor of the integrals of compiled_form on
+    perturbed reference cells with random coefficients, on all facets
+    and vertices"""
+    rng = numpy.random.RandomState(seed)
+    cell = form.ufl_domain().ufl_cell()
+    ctype = "float" if scalar_type == "float" else "double"
+    dtype = numpy.float32 if scalar_type == "float" else numpy.float64
+
+    # Coordinate dofs of two perturbed reference cells
+    element = compiled_form.create_coordinate_finite_element()
+    X = numpy.zeros((element.space_dimension, element.topological_dimension))
+    element.tabulate_reference_dof_coordinates(ffi.cast("double *", ffi.from_buffer(X)))
+    x = numpy.zeros((X.shape[0], element.geometric_dimension))
+    x[:, :X.shape[1]] = X
+    coordinate_dofs = [(x + 0.05 * rng.random_sample(x.shape)).flatten() for k in range(2)]
+    c0, c1 = [ffi.cast("double *", ffi.from_buffer(c)) for c in coordinate_dofs]
+
+    # Element tensor and coefficients large enough for interior facets
+    rank = compiled_form.rank
+    dims = [compiled_form.create_finite_element(i).space_dimension
+            for i in range(rank + compiled_form.num_coefficients)]
+    A = numpy.zeros(2**rank * int(numpy.prod(dims[:rank])), dtype=dtype)
+    A_ptr = ffi.cast(ctype + " *", ffi.from_buffer(A))
+    coefficients = [rng.random_sample(2 * dim).astype(dtype) for dim in dims[rank:]]
+    w = ffi.new(ctype + "*[]", max(1, len(coefficients)))
+    for i, c in enumerate(coefficients):
+        w[i] = ffi.cast(ctype + " *", ffi.from_buffer(c))
+
+    integral_ids = set()
+    for integral in form.integrals():
+        ids = integral.subdomain_id()
+        for subdomain_id in (ids if isinstance(ids, tuple) else (ids, )):
+            integral_ids.add((integral.integral_type(), subdomain_id))
+
+    num_facets = cell.num_facets()
+    for integral_type, subdomain_id in sorted(integral_ids, key=str):
+        if subdomain_id in ("everywhere", "otherwise"):
+            integral = getattr(compiled_form, "create_default_%s_integral" % integral_type)()
+        else:
+            integral = getattr(compiled_form, "create_%s_integral" % integral_type)(subdomain_id)
+        if integral == ffi.NULL:
+            continue
+        for k in range(num_calls):
+            if integral_type == "cell":
+                integral.tabulate_tensor(A_ptr, w, c0, 0)
+            elif integral_type == "exterior_facet":
+                for facet in range(num_facets):
+                    integral.tabulate_tensor(A_ptr, w, c0, facet, 0)
+            elif integral_type == "interior_facet":
+                for facet in range(num_facets):
+                    integral.tabulate_tensor(A_ptr, w, c0, c1, facet, (facet + 1) % num_facets, 0, 0)
+            elif integral_type == "vertex":
+                for vertex in range(cell.num_vertices()):
+                    integral.tabulate_tensor(A_ptr, w, c0, vertex, 0)
+
+
+def _profile_integrals(forms, module_name, compile_dir, code_body, decl, build_options,
+                       compile_objects, parameters):
+    """Build module with the integral objects instrumented for
+    profiling, and write the profiles of a training run next to the
+    objects"""
+    objects = compile_objects(extra_args=["-fprofile-generate"], rebuild=True)
+    profile_module_name = module_name + "_profile"
+    ffibuilder = cffi.FFI()
+    ffibuilder.set_source(
+        profile_module_name,
+        code_body + PROFILE_DUMP_CODE,
+        extra_objects=objects,
+        extra_link_args=["-fprofile-generate"],
+        **build_options)
+    ffibuilder.cdef(decl + PROFILE_DUMP_DECL)
+    ffibuilder.compile(tmpdir=compile_dir, verbose=False)
+
+    module = importlib.import_module(compile_dir + "." + profile_module_name)
+    scalar_type = (parameters or {}).get("scalar_type", "double")
+    for f in forms:
+        create_form = "create_" + ffc.classname.make_name("Form", "form", 0)
+        _train_form(f, getattr(module.lib, create_form)(), module.ffi, scalar_type)
+    module.lib.ffc_profile_dump()
+
+
+def compile_elements(elements, module_name=None, parameters=None):
     """Compile a list of UFL elements into UFC Python objects"""
+    # Elements have no integrals to compile separately
+    parameters = dict(parameters or {}, split_integrals=False)
+    build_profile, build_flags, build_identity = _build_profile(parameters)
     code_body = ""
-    decl = UFC_HEADER_DECL + UFC_ELEMENT_DECL
+    decl = _scalar_decl(parameters) + UFC_HEADER_DECL + UFC_ELEMENT_DECL
     element_template = "ufc_finite_element * create_{name}(void);"
+    p = ffc.parameters.validate_parameters(parameters)
     for e in elements:
-        _, impl = ffc.compiler.compile_element(e)
+        _, impl = ffc.compiler.compile_element(e, parameters=parameters)
         code_body += impl
-        p = ffc.parameters.validate_parameters(None)
         name = ffc.representation.make_finite_element_jit_classname(e, p)
         create_element = element_template.format(name=name)
         decl += create_element + "\n"
 
     if not module_name:
         h = hashlib.sha1()
-        h.update((code_body + decl).encode('utf-8'))
+        h.update((code_body + decl + build_identity).encode('utf-8'))
         module_name = "_" + h.hexdigest()
 
     ffibuilder = cffi.FFI()
     ffibuilder.set_source(
-        module_name, code_body, include_dirs=[ffc.backends.ufc.get_include_path()])
+        module_name, code_body, include_dirs=[ffc.backends.ufc.get_include_path()],
+        extra_compile_args=build_flags)
     ffibuilder.cdef(decl)
 
     compile_dir = "compile_cache"
@@ -249,7 +548,6 @@ def compile_elements(elements, module_name=None):
     compiled_elements = []
     compiled_module = importlib.import_module(compile_dir + "." + module_name)
     for e in elements:
-        p = ffc.parameters.validate_parameters(None)
         name = ffc.representation.make_finite_element_jit_classname(e, p)
         create_element = "create_" + name
         compiled_elements.append(getattr(compiled_module.lib, create_element)())
@@ -257,36 +555,91 @@ def compile_elements(elements, module_name=None):
     return compiled_elements, compiled_module
 
 
-def compile_forms(forms, module_name=None):
+def compile_forms(forms, module_name=None, parameters=None):
     """Compile a list of UFL forms into UFC Python objects"""
 
     # FIXME: support list of forms. Problem is that FFC does not use a
     # hash for form signature, unlike for other objects
 
+    # Profile-guided builds use GCC profiles of the integral objects
+    build_profile, build_flags, build_identity = _build_profile(parameters)
+    pgo = build_profile == "pgo"
+    if pgo and "clang" in build_identity.lower():
+        logger.warning("Build profile \"pgo\" requires GCC, building without profile feedback.")
+        pgo = False
+    if pgo:
+        parameters = dict(parameters or {}, split_integrals=True)
+
     code_body = ""
-    decl = UFC_HEADER_DECL + UFC_ELEMENT_DECL + UFC_DOFMAP_DECL + UFC_COORDINATEMAPPING_DECL \
-        + UFC_INTEGRAL_DECL + UFC_FORM_DECL
+    code_units = []
+    decl = _scalar_decl(parameters) + UFC_HEADER_DECL + UFC_ELEMENT_DECL + UFC_DOFMAP_DECL \
+        + UFC_COORDINATEMAPPING_DECL + UFC_INTEGRAL_DECL + UFC_FORM_DECL
     form_template = "ufc_form * create_{name}(void);"
+    timings_template = "int {name}(ufc_tabulate_tensor_timing* timings, bool reset);\n"
+    split_integrals = (parameters or {}).get("split_integrals")
     for f in forms:
-        _, impl = ffc.compiler.compile_form(f)
-        code_body += impl
+        code_h, impl = ffc.compiler.compile_form(f, parameters=parameters)
+        if split_integrals:
+            # The first source has the code other than integrals, and
+            # all sources include the header of the form
+            code_body += impl[0][1]
+            code_units += impl[1:]
+            code_header = code_h
+        else:
+            code_body += impl
 
         # FIXME: FFC should has the form name
         name = ffc.classname.make_name("Form", "form", 0)
         create_form = form_template.format(name=name)
         decl += create_form + "\n"
 
+    # Expose the tabulate_tensor timings of the module
+    if (parameters or {}).get("add_tabulate_tensor_timing"):
+        decl += UFC_TIMING_DECL + timings_template.format(
+            name=ffc.classname.make_name("Form", "tabulate_tensor", "timings"))
+
     if not module_name:
         h = hashlib.sha1()
-        h.update((code_body + decl).encode('utf-8'))
+        h.update((code_body + decl + build_identity).encode('utf-8'))
+        for name, code in code_units:
+            h.update(code.encode('utf-8'))
         module_name = "_" + h.hexdigest()
 
+    # Let ufc_dgemm_tn and ufc_sgemm_tn call CBLAS if a library is given
+    build_options = {"include_dirs": [ffc.backends.ufc.get_include_path()],
+                     "extra_compile_args": build_flags}
+    blas_library = (parameters or {}).get("blas_library")
+    if blas_library:
+        build_options["define_macros"] = [("UFC_USE_CBLAS", None)]
+        build_options["libraries"] = [blas_library]
+
+    compile_dir = "compile_cache"
+
+    # Compile the integrals in parallel, and link them into the module
+    if split_integrals:
+        build_dir = os.path.abspath(os.path.join(compile_dir, module_name))
+        compile_objects = functools.partial(
+            _compile_objects, code_units, code_header, "Form.h", build_dir,
+            build_options["include_dirs"], build_options.get("define_macros", []),
+            num_workers=parameters.get("build_workers", 0))
+        build_options["include_dirs"] = build_options["include_dirs"] + [build_dir]
+
+        # Recompile the objects with the profiles of a training run,
+        # unless the module is already built
+        extra_args = build_flags
+        rebuild = False
+        if pgo and importlib.util.find_spec(compile_dir + "." + module_name) is None:
+            _profile_integrals(forms, module_name, compile_dir, code_body, decl, build_options,
+                               functools.partial(compile_objects, rebuild=True), parameters)
+            rebuild = True
+        if pgo:
+            extra_args = extra_args + ["-fprofile-use", "-fprofile-correction", "-Wno-missing-profile"]
+        build_options["extra_objects"] = compile_objects(extra_args=extra_args, rebuild=rebuild)
+
     ffibuilder = cffi.FFI()
-    ffibuilder.set_source(
-        module_name, code_body, include_dirs=[ffc.backends.ufc.get_include_path()])
+    ffibuilder.set_source(module_name, code_body, **build_options)
     ffibuilder.cdef(decl)
 
-    compile_dir = "compile_cache"
     ffibuilder.compile(tmpdir=compile_dir, verbose=False)
 
     # Build list of compiled elements
@@ -298,3 +651,15 @@ def compile_forms(forms, module_name=None):
         compiled_forms.append(getattr(compiled_module.lib, create_form)())
 
     return compiled_forms, compiled_module
+
+
+def get_tabulate_tensor_timings(module, reset=False):
+    """Return {integral name: (number of calls, time)} for the integrals
+    of a module compiled by compile_forms with add_tabulate_tensor_timing,
+    resetting the timings if reset is true"""
+    ffi = module.ffi
+    get_timings = getattr(module.lib, ffc.classname.make_name("Form", "tabulate_tensor", "timings"))
+    num_integrals = get_timings(ffi.NULL, False)
+    timings = ffi.new("ufc_tabulate_tensor_timing[]", num_integrals)
+    get_timings(timings, reset)
+    return {ffi.string(t.name).decode(): (t.num_calls, t.time) for t in timings}
@@ -22,6 +22,7 @@
 
 #include <stdbool.h>
 #include <stdint.h>
+#include <ufc_gemm.h>
 #include <ufc_geometry.h>
 
 #ifdef __cplusplus
@@ -109,17 +110,75 @@ extern "C"
 
     /// Map values of field from physical to reference space which has
     /// been evaluated at points given by tabulate_reference_dof_coordinates.
-    void (*transform_values)(ufc_scalar_t* restrict reference_values,
-                             const ufc_scalar_t* restrict physical_values,
-                             const double* restrict coordinate_dofs,
-                             int cell_orientation,
-                             const ufc_coordinate_mapping* cm);
+    /// Returns -1 if the dofs are not all point evaluations.
+    int (*transform_values)(ufc_scalar_t* restrict reference_values,
+                            const ufc_scalar_t* restrict physical_values,
+                            const double* restrict coordinate_dofs,
+                            int cell_orientation,
+                            const ufc_coordinate_mapping* cm);
+
+    /// Evaluate values and derivatives of basis functions on multiple
+    /// cells from their values and reference derivatives at the same
+    /// reference points, the mapping type applied being fixed for each
+    /// basis function
+    ///   values[num_cells][num_points][num_dofs][num_derivatives][value_size]
+    ///   reference_values[num_points][num_dofs][num_derivatives][reference_value_size]
+    /// If affine is nonzero the geometry is constant on each cell,
+    ///   J[num_cells][gdim][tdim], detJ[num_cells], K[num_cells][tdim][gdim]
+    /// otherwise it is given at each point of each cell,
+    ///   J[num_cells][num_points][gdim][tdim], detJ[num_cells][num_points],
+    ///   K[num_cells][num_points][tdim][gdim]
+    /// with detJ including the cell orientation on manifolds
+    int (*transform_reference_basis_derivatives_cells)(
+        double* restrict values, int order, int num_cells, int num_points,
+        const double* restrict reference_values, const double* restrict J,
+        const double* restrict detJ, const double* restrict K, int affine);
+
+    /// Map values of field from physical to reference space on multiple
+    /// affine cells, evaluated at points given by
+    /// tabulate_reference_dof_coordinates on each cell
+    ///   reference_values[num_cells][num_dofs]
+    ///   physical_values[num_cells][num_dofs][value_size]
+    ///   J[num_cells][gdim][tdim], detJ[num_cells], K[num_cells][tdim][gdim]
+    /// with detJ including the cell orientation on manifolds. Returns -1
+    /// if the dofs are not all point evaluations.
+    int (*transform_values_cells)(ufc_scalar_t* restrict reference_values,
+                                  const ufc_scalar_t* restrict physical_values,
+                                  int num_cells, const double* restrict J,
+                                  const double* restrict detJ,
+                                  const double* restrict K);
 
     // FIXME: change to 'const double* reference_dof_coordinates()'
     /// Tabulate the coordinates of all dofs on a reference cell
     void (*tabulate_reference_dof_coordinates)(
         double* restrict reference_dof_coordinates);
 
+    /// The number of points at which a function is evaluated to
+    /// compute its dofs, both point evaluations and integral moments,
+    /// 0 if the dofs are not defined by point values
+    int num_interpolation_points;
+
+    /// Tabulate the reference coordinates of the interpolation points
+    ///   X[num_interpolation_points][tdim]
+    /// Returns -1 if not available
+    int (*tabulate_interpolation_points)(double* restrict X);
+
+    /// Tabulate the dense interpolation matrix, mapping the values of a
+    /// function in reference space at the interpolation points to the
+    /// dofs
+    ///   M[num_dofs][num_interpolation_points][reference_value_size]
+    /// Returns -1 if not available
+    int (*tabulate_interpolation_matrix)(double* restrict M);
+
+    /// Compute the dofs of functions on multiple cells from their
+    /// values in reference space at the interpolation points, one
+    /// product with the interpolation matrix per cell
+    ///   dofs[num_cells][num_dofs]
+    ///   values[num_cells][num_interpolation_points][reference_value_size]
+    /// Returns -1 if not available
+    int (*interpolate_cells)(double* restrict dofs, int num_cells,
+                             const double* restrict values);
+
     /// Return the number of sub elements (for a mixed element)
     int num_sub_elements;
 
@@ -165,6 +224,17 @@ extern "C"
                           const int64_t* restrict num_global_entities,
                           const int64_t** entity_indices);
 
+    /// Tabulate the local-to-global mapping of dofs on multiple cells
+    ///   dofs[num_cells][num_element_dofs]
+    ///   num_global_entities[num_entities_per_cell]
+    ///   entity_indices[num_cells][num_cell_entities], with the
+    ///   indices of the entities of each cell ordered by dimension,
+    ///   vertices first, num_cell_entities being the total number of
+    ///   entities of all dimensions of a cell
+    void (*tabulate_dofs_cells)(int64_t* restrict dofs, int num_cells,
+                                const int64_t* restrict num_global_entities,
+                                const int64_t* restrict entity_indices);
+
     /// Calculate dof permutation for given global vertex index ordering
     /// perm[num_element_dofs] - integer permutation
     /// global_indices[num_vertices_per_cell] - global indices of cell vertices
@@ -190,6 +260,25 @@ extern "C"
     ufc_dofmap* (*create)(void);
   } ufc_dofmap;
 
+  /// Cell constant geometry of an affine simplex cell, computed once
+  /// per cell by compute_affine_geometry and reusable for all points
+  /// and integrals on the cell. The arrays are flattened with the
+  /// actual dimensions, x0[gdim], J[gdim][tdim] and K[tdim][gdim].
+  typedef struct ufc_affine_geometry
+  {
+    /// Physical coordinates of the reference cell origin (vertex 0)
+    double x0[3];
+
+    /// Jacobian of the coordinate mapping, J = dx/dX
+    double J[9];
+
+    /// (Pseudo-)Determinant of the Jacobian
+    double detJ;
+
+    /// (Pseudo-)Inverse of the Jacobian
+    double K[9];
+  } ufc_affine_geometry;
+
   /// A representation of a coordinate mapping parameterized by a local
   /// finite element basis on each cell
   typedef struct ufc_coordinate_mapping
@@ -400,8 +489,216 @@ extern "C"
     void (*compute_midpoint_geometry)(double* restrict x, double* restrict J,
                                       const double* restrict coordinate_dofs);
 
+    /// Compute the cell constant geometry of an affine simplex cell
+    ///
+    /// @param[out] geometry
+    ///         Geometry of the cell.
+    /// @param[in] coordinate_dofs
+    ///         Dofs of the coordinate field on the cell.
+    ///         Dimensions: coordinate_dofs[num_dofs][gdim].
+    /// @param[in] cell_orientation
+    ///         Orientation of the cell, 1 means flipped w.r.t. reference cell.
+    ///         Only relevant on manifolds (tdim < gdim).
+    /// @return
+    ///         0 on success, -1 if the coordinate mapping is not affine.
+    ///
+    int (*compute_affine_geometry)(ufc_affine_geometry* restrict geometry,
+                                   const double* restrict coordinate_dofs,
+                                   int cell_orientation);
+
+    /// Compute physical coordinates x from reference coordinates X
+    /// on multiple cells, the same reference points on each cell
+    ///
+    /// @param[out] x
+    ///         Physical coordinates.
+    ///         Dimensions: x[num_cells][num_points][gdim]
+    /// @param[in] num_cells
+    ///         Number of cells.
+    /// @param[in] num_points
+    ///         Number of points per cell.
+    /// @param[in] X
+    ///         Reference cell coordinates.
+    ///         Dimensions: X[num_points][tdim]
+    /// @param[in] coordinate_dofs
+    ///         Dofs of the coordinate field on the cells.
+    ///         Dimensions: coordinate_dofs[num_cells][num_dofs][gdim].
+    ///
+    void (*compute_physical_coordinates_cells)(
+        double* restrict x, int num_cells, int num_points,
+        const double* restrict X, const double* restrict coordinate_dofs);
+
+    /// Compute Jacobian of coordinate mapping J = dx/dX at reference
+    /// coordinates X on multiple cells
+    ///
+    /// @param[out] J
+    ///         Jacobian of coordinate field, J = dx/dX.
+    ///         Dimensions: J[num_cells][num_points][gdim][tdim]
+    /// @param[in] num_cells
+    ///         Number of cells.
+    /// @param[in] num_points
+    ///         Number of points per cell.
+    /// @param[in] X
+    ///         Reference cell coordinates.
+    ///         Dimensions: X[num_points][tdim]
+    /// @param[in] coordinate_dofs
+    ///         Dofs of the coordinate field on the cells.
+    ///         Dimensions: coordinate_dofs[num_cells][num_dofs][gdim].
+    ///
+    void (*compute_jacobians_cells)(double* restrict J, int num_cells,
+                                    int num_points, const double* restrict X,
+                                    const double* restrict coordinate_dofs);
+
+    /// Compute determinants of (pseudo-)Jacobians J on multiple cells
+    ///
+    /// @param[out] detJ
+    ///         (Pseudo-)Determinant of Jacobian.
+    ///         Dimensions: detJ[num_cells][num_points]
+    /// @param[in] num_cells
+    ///         Number of cells.
+    /// @param[in] num_points
+    ///         Number of points per cell.
+    /// @param[in] J
+    ///         Jacobian of coordinate field, J = dx/dX.
+    ///         Dimensions: J[num_cells][num_points][gdim][tdim]
+    /// @param[in] cell_orientations
+    ///         Orientation of each cell, -1 or +1 (or 0 if unknown).
+    ///         Dimensions: cell_orientations[num_cells]
+    ///         Only relevant on manifolds (tdim < gdim), may be NULL
+    ///         otherwise.
+    ///
+    void (*compute_jacobian_determinants_cells)(
+        double* restrict detJ, int num_cells, int num_points,
+        const double* restrict J, const int* restrict cell_orientations);
+
+    /// Compute (pseudo-)inverses K of (pseudo-)Jacobians J on multiple
+    /// cells
+    ///
+    /// @param[out] K
+    ///         (Pseudo-)Inverse of Jacobian of coordinate field.
+    ///         Dimensions: K[num_cells][num_points][tdim][gdim]
+    /// @param[in] num_cells
+    ///         Number of cells.
+    /// @param[in] num_points
+    ///         Number of points per cell.
+    /// @param[in] J
+    ///         Jacobian of coordinate field, J = dx/dX.
+    ///         Dimensions: J[num_cells][num_points][gdim][tdim]
+    /// @param[in] detJ
+    ///         (Pseudo-)Determinant of Jacobian.
+    ///         Dimensions: detJ[num_cells][num_points]
+    ///
+    void (*compute_jacobian_inverses_cells)(double* restrict K, int num_cells,
+                                            int num_points,
+                                            const double* restrict J,
+                                            const double* restrict detJ);
+
+    /// Combined (for convenience) computation of x, J, detJ, K from X
+    /// and coordinate_dofs on multiple cells
+    ///
+    /// @param[out] x
+    ///         Physical coordinates.
+    ///         Dimensions: x[num_cells][num_points][gdim]
+    /// @param[out] J
+    ///         Jacobian of coordinate field, J = dx/dX.
+    ///         Dimensions: J[num_cells][num_points][gdim][tdim]
+    /// @param[out] detJ
+    ///         (Pseudo-)Determinant of Jacobian.
+    ///         Dimensions: detJ[num_cells][num_points]
+    /// @param[out] K
+    ///         (Pseudo-)Inverse of Jacobian of coordinate field.
+    ///         Dimensions: K[num_cells][num_points][tdim][gdim]
+    /// @param[in] num_cells
+    ///         Number of cells.
+    /// @param[in] num_points
+    ///         Number of points per cell.
+    /// @param[in] X
+    ///         Reference cell coordinates.
+    ///         Dimensions: X[num_points][tdim]
+    /// @param[in] coordinate_dofs
+    ///         Dofs of the coordinate field on the cells.
+    ///         Dimensions: coordinate_dofs[num_cells][num_dofs][gdim].
+    /// @param[in] cell_orientations
+    ///         Orientation of each cell, -1 or +1 (or 0 if unknown).
+    ///         Dimensions: cell_orientations[num_cells]
+    ///         Only relevant on manifolds (tdim < gdim), may be NULL
+    ///         otherwise.
+    ///
+    void (*compute_geometry_cells)(double* restrict x, double* restrict J,
+                                   double* restrict detJ, double* restrict K,
+                                   int num_cells, int num_points,
+                                   const double* restrict X,
+                                   const double* restrict coordinate_dofs,
+                                   const int* restrict cell_orientations);
+
+    /// Compute x and J at midpoints of multiple cells
+    ///
+    /// @param[out] x
+    ///         Physical coordinates.
+    ///         Dimensions: x[num_cells][gdim]
+    /// @param[out] J
+    ///         Jacobian of coordinate field, J = dx/dX.
+    ///         Dimensions: J[num_cells][gdim][tdim]
+    /// @param[in] num_cells
+    ///         Number of cells.
+    /// @param[in] coordinate_dofs
+    ///         Dofs of the coordinate field on the cells.
+    ///         Dimensions: coordinate_dofs[num_cells][num_dofs][gdim].
+    ///
+    void (*compute_midpoint_geometry_cells)(double* restrict x, double* restrict J,
+                                            int num_cells,
+                                            const double* restrict coordinate_dofs);
+
+    /// Compute reference coordinates X from physical coordinates x,
+    /// like compute_reference_coordinates, with the Newton iterations
+    /// of blocks of points carried out in lockstep
+    ///
+    /// @param[out] X
+    ///         Reference cell coordinates.
+    ///         Dimensions: X[num_points][tdim]
+    /// @param[in] num_points
+    ///         Number of points.
+    /// @param[in] x
+    ///         Physical coordinates.
+    ///         Dimensions: x[num_points][gdim]
+    /// @param[in] coordinate_dofs
+    ///         Dofs of the coordinate field on the cell.
+    ///         Dimensions: coordinate_dofs[num_dofs][gdim].
+    /// @param[in] cell_orientation
+    ///         Orientation of the cell, 1 means flipped w.r.t. reference cell.
+    ///         Only relevant on manifolds (tdim < gdim).
+    /// @param[in] tolerance
+    ///         A point is converged when the Newton increment |dX| < tolerance.
+    /// @param[in] max_iterations
+    ///         Maximum number of Newton iterations.
+    /// @param[out] num_iterations
+    ///         Number of iterations for each point, -1 if not converged.
+    ///         Not written if NULL. Dimensions: num_iterations[num_points]
+    /// @return
+    ///         Number of points not converged within max_iterations.
+    ///
+    int (*compute_reference_coordinates_batched)(
+        double* restrict X, int num_points, const double* restrict x,
+        const double* restrict coordinate_dofs, int cell_orientation,
+        double tolerance, int max_iterations, int* restrict num_iterations);
+
   } ufc_coordinate_mapping;
 
+  /// Call count and accumulated time of the tabulate_tensor function
+  /// of an integral, collected when the code is generated with the
+  /// parameter add_tabulate_tensor_timing. The counters are not
+  /// updated atomically, so calls from concurrent threads may be lost.
+  typedef struct ufc_tabulate_tensor_timing
+  {
+    /// Name of the integral
+    const char* name;
+
+    /// Number of calls to tabulate_tensor
+    int64_t num_calls;
+
+    /// Accumulated wall time in seconds spent in tabulate_tensor
+    double time;
+  } ufc_tabulate_tensor_timing;
+
   // FIXME: Is this required for integrals?
   // Number of coefficients
   // int num_coefficients() const = 0;
@@ -414,6 +711,28 @@ extern "C"
     void (*tabulate_tensor)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
                             const double* restrict coordinate_dofs,
                             int cell_orientation);
+
+    /// Size in bytes of the workspace for tabulate_tensor_workspace
+    int workspace_size;
+
+    /// Variant of tabulate_tensor storing its temporary arrays in a
+    /// caller provided workspace of workspace_size bytes instead of
+    /// on the stack, NULL if not generated. The workspace can be
+    /// reused between calls, and should be aligned to 64 bytes.
+    void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                      const double* restrict coordinate_dofs,
+                                      int cell_orientation,
+                                      double* restrict workspace);
+
+    /// Variant of tabulate_tensor reading the Jacobian determinant and
+    /// inverse of an affine simplex cell from a caller provided
+    /// geometry, as computed by compute_affine_geometry of the
+    /// coordinate mapping, instead of computing them from
+    /// coordinate_dofs. NULL if not generated.
+    void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                     const double* restrict coordinate_dofs,
+                                     int cell_orientation,
+                                     const ufc_affine_geometry* restrict geometry);
   } ufc_cell_integral;
 
   typedef struct ufc_exterior_facet_integral
@@ -422,6 +741,28 @@ extern "C"
     void (*tabulate_tensor)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
                             const double* restrict coordinate_dofs, int facet,
                             int cell_orientation);
+
+    /// Size in bytes of the workspace for tabulate_tensor_workspace
+    int workspace_size;
+
+    /// Variant of tabulate_tensor storing its temporary arrays in a
+    /// caller provided workspace of workspace_size bytes instead of
+    /// on the stack, NULL if not generated. The workspace can be
+    /// reused between calls, and should be aligned to 64 bytes.
+    void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                      const double* restrict coordinate_dofs, int facet,
+                                      int cell_orientation,
+                                      double* restrict workspace);
+
+    /// Variant of tabulate_tensor reading the Jacobian determinant and
+    /// inverse of an affine simplex cell from a caller provided
+    /// geometry, as computed by compute_affine_geometry of the
+    /// coordinate mapping, instead of computing them from
+    /// coordinate_dofs. NULL if not generated.
+    void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                     const double* restrict coordinate_dofs, int facet,
+                                     int cell_orientation,
+                                     const ufc_affine_geometry* restrict geometry);
   } ufc_exterior_facet_integral;
 
   typedef struct ufc_interior_facet_integral
@@ -432,6 +773,33 @@ extern "C"
                             const double* restrict coordinate_dofs_1,
                             int facet_0, int facet_1, int cell_orientation_0,
                             int cell_orientation_1);
+
+    /// Size in bytes of the workspace for tabulate_tensor_workspace
+    int workspace_size;
+
+    /// Variant of tabulate_tensor storing its temporary arrays in a
+    /// caller provided workspace of workspace_size bytes instead of
+    /// on the stack, NULL if not generated. The workspace can be
+    /// reused between calls, and should be aligned to 64 bytes.
+    void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                      const double* restrict coordinate_dofs_0,
+                                      const double* restrict coordinate_dofs_1,
+                                      int facet_0, int facet_1, int cell_orientation_0,
+                                      int cell_orientation_1,
+                                      double* restrict workspace);
+
+    /// Variant of tabulate_tensor reading the Jacobian determinant and
+    /// inverse of an affine simplex cell from a caller provided
+    /// geometry, as computed by compute_affine_geometry of the
+    /// coordinate mapping, instead of computing them from
+    /// coordinate_dofs. NULL if not generated.
+    void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                     const double* restrict coordinate_dofs_0,
+                                     const double* restrict coordinate_dofs_1,
+                                     int facet_0, int facet_1, int cell_orientation_0,
+                                     int cell_orientation_1,
+                                     const ufc_affine_geometry* restrict geometry_0,
+                                     const ufc_affine_geometry* restrict geometry_1);
   } ufc_interior_facet_integral;
 
   typedef struct ufc_vertex_integral
@@ -440,6 +808,28 @@ extern "C"
     void (*tabulate_tensor)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
                             const double* restrict coordinate_dofs, int vertex,
                             int cell_orientation);
+
+    /// Size in bytes of the workspace for tabulate_tensor_workspace
+    int workspace_size;
+
+    /// Variant of tabulate_tensor storing its temporary arrays in a
+    /// caller provided workspace of workspace_size bytes instead of
+    /// on the stack, NULL if not generated. The workspace can be
+    /// reused between calls, and should be aligned to 64 bytes.
+    void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                      const double* restrict coordinate_dofs, int vertex,
+                                      int cell_orientation,
+                                      double* restrict workspace);
+
+    /// Variant of tabulate_tensor reading the Jacobian determinant and
+    /// inverse of an affine simplex cell from a caller provided
+    /// geometry, as computed by compute_affine_geometry of the
+    /// coordinate mapping, instead of computing them from
+    /// coordinate_dofs. NULL if not generated.
+    void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                     const double* restrict coordinate_dofs, int vertex,
+                                     int cell_orientation,
+                                     const ufc_affine_geometry* restrict geometry);
   } ufc_vertex_integral;
 
   typedef struct ufc_custom_integral
@@ -452,6 +842,36 @@ extern "C"
                             const double* restrict quadrature_weights,
                             const double* restrict facet_normals,
                             int cell_orientation);
+
+    /// Size in bytes of the workspace for tabulate_tensor_workspace
+    int workspace_size;
+
+    /// Variant of tabulate_tensor storing its temporary arrays in a
+    /// caller provided workspace of workspace_size bytes instead of
+    /// on the stack, NULL if not generated. The workspace can be
+    /// reused between calls, and should be aligned to 64 bytes.
+    void (*tabulate_tensor_workspace)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                      const double* restrict coordinate_dofs,
+                                      int num_quadrature_points,
+                                      const double* restrict quadrature_points,
+                                      const double* restrict quadrature_weights,
+                                      const double* restrict facet_normals,
+                                      int cell_orientation,
+                                      double* restrict workspace);
+
+    /// Variant of tabulate_tensor reading the Jacobian determinant and
+    /// inverse of an affine simplex cell from a caller provided
+    /// geometry, as computed by compute_affine_geometry of the
+    /// coordinate mapping, instead of computing them from
+    /// coordinate_dofs. NULL if not generated.
+    void (*tabulate_tensor_geometry)(ufc_scalar_t* restrict A, const ufc_scalar_t* const* w,
+                                     const double* restrict coordinate_dofs,
+                                     int num_quadrature_points,
+                                     const double* restrict quadrature_points,
+                                     const double* restrict quadrature_weights,
+                                     const double* restrict facet_normals,
+                                     int cell_orientation,
+                                     const ufc_affine_geometry* restrict geometry);
   } ufc_custom_integral;
 
   /// This class defines the interface for the assembly of the global
@@ -0,0 +1,115 @@
+// This file provides a small dense matrix product used by generated
+// tabulate_tensor code to integrate element tensor blocks.
+// This code is released into the public domain.
+//
+// The FEniCS Project (http://www.fenicsproject.org/) 2018.
+
+#pragma once
+
+#ifdef UFC_USE_CBLAS
+#include <cblas.h>
+#endif
+
+/// A note regarding data structures. All matrices are represented as
+/// row-major flattened raw C arrays.
+
+/// Size of the register blocked tiles of C in ufc_dgemm_tn and ufc_sgemm_tn
+#define UFC_GEMM_TILE_M 4
+#define UFC_GEMM_TILE_N 4
+
+/// Compute C += A^T B, where A is k x m, B is k x n and C is m x n.
+///
+/// This is the contraction over quadrature points of the (point x dof)
+/// argument tables, with k the number of points. If UFC_USE_CBLAS is
+/// defined when compiling, the product is computed by cblas_dgemm,
+/// otherwise by a register blocked micro-kernel accumulating one
+/// UFC_GEMM_TILE_M x UFC_GEMM_TILE_N tile of C at a time.
+static inline void ufc_dgemm_tn(int m, int n, int k, const double* A, int lda,
+                                const double* B, int ldb, double* C, int ldc)
+{
+#ifdef UFC_USE_CBLAS
+  cblas_dgemm(CblasRowMajor, CblasTrans, CblasNoTrans, m, n, k, 1.0, A, lda,
+              B, ldb, 1.0, C, ldc);
+#else
+  const int m0 = m - m % UFC_GEMM_TILE_M;
+  const int n0 = n - n % UFC_GEMM_TILE_N;
+
+  // Full tiles, accumulated in registers
+  for (int i = 0; i < m0; i += UFC_GEMM_TILE_M)
+  {
+    for (int j = 0; j < n0; j += UFC_GEMM_TILE_N)
+    {
+      double c[UFC_GEMM_TILE_M][UFC_GEMM_TILE_N] = {{0.0}};
+      for (int q = 0; q < k; ++q)
+      {
+        const double* a = A + q * lda + i;
+        const double* b = B + q * ldb + j;
+        for (int r = 0; r < UFC_GEMM_TILE_M; ++r)
+          for (int s = 0; s < UFC_GEMM_TILE_N; ++s)
+            c[r][s] += a[r] * b[s];
+      }
+      for (int r = 0; r < UFC_GEMM_TILE_M; ++r)
+        for (int s = 0; s < UFC_GEMM_TILE_N; ++s)
+          C[(i + r) * ldc + j + s] += c[r][s];
+    }
+  }
+
+  // Remaining rows and columns
+  for (int i = 0; i < m; ++i)
+  {
+    for (int j = (i < m0 ? n0 : 0); j < n; ++j)
+    {
+      double c = 0.0;
+      for (int q = 0; q < k; ++q)
+        c += A[q * lda + i] * B[q * ldb + j];
+      C[i * ldc + j] += c;
+    }
+  }
+#endif
+}
+
+/// Single precision version of ufc_dgemm_tn, computed by cblas_sgemm
+/// if UFC_USE_CBLAS is defined when compiling.
+static inline void ufc_sgemm_tn(int m, int n, int k, const float* A, int lda,
+                                const float* B, int ldb, float* C, int ldc)
+{
+#ifdef UFC_USE_CBLAS
+  cblas_sgemm(CblasRowMajor, CblasTrans, CblasNoTrans, m, n, k, 1.0f, A, lda,
+              B, ldb, 1.0f, C, ldc);
+#else
+  const int m0 = m - m % UFC_GEMM_TILE_M;
+  const int n0 = n - n % UFC_GEMM_TILE_N;
+
+  // Full tiles, accumulated in registers
+  for (int i = 0; i < m0; i += UFC_GEMM_TILE_M)
+  {
+    for (int j = 0; j < n0; j += UFC_GEMM_TILE_N)
+    {
+      float c[UFC_GEMM_TILE_M][UFC_GEMM_TILE_N] = {{0.0f}};
+      for (int q = 0; q < k; ++q)
+      {
+        const float* a = A + q * lda + i;
+        const float* b = B + q * ldb + j;
+        for (int r = 0; r < UFC_GEMM_TILE_M; ++r)
+          for (int s = 0; s < UFC_GEMM_TILE_N; ++s)
+            c[r][s] += a[r] * b[s];
+      }
+      for (int r = 0; r < UFC_GEMM_TILE_M; ++r)
+        for (int s = 0; s < UFC_GEMM_TILE_N; ++s)
+          C[(i + r) * ldc + j + s] += c[r][s];
+    }
+  }
+
+  // Remaining rows and columns
+  for (int i = 0; i < m; ++i)
+  {
+    for (int j = (i < m0 ? n0 : 0); j < n; ++j)
+    {
+      float c = 0.0f;
+      for (int q = 0; q < k; ++q)
+        c += A[q * lda + i] * B[q * ldb + j];
+      C[i * ldc + j] += c;
+    }
+  }
+#endif
+}
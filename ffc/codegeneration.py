@@ -18,10 +18,14 @@ import logging
 from ffc.backends.ufc.coordinate_mapping import \
     ufc_coordinate_mapping_generator
 from ffc.backends.ufc.dofmap import ufc_dofmap_generator
+from ffc.backends.ufc.finite_element import \
+    basisvalues_generator as ufc_basisvalues_generator
 from ffc.backends.ufc.finite_element import \
     generator as ufc_finite_element_generator
 from ffc.backends.ufc.form import ufc_form_generator
-from ffc.backends.ufc.integrals import ufc_integral_generator
+from ffc.backends.ufc.integrals import (ufc_integral_generator,
+                                        ufc_integral_timings_generator)
+from ffc.utils import parallel_apply
 
 logger = logging.getLogger(__name__)
 
@@ -41,31 +45,34 @@ def generate_code(ir, parameters, jit):
     # Extract representations
     ir_finite_elements, ir_dofmaps, ir_coordinate_mappings, ir_integrals, ir_forms = ir
 
-    # Generate code for finite_elements
-    logger.debug("Generating code for {} finite_element(s)".format(len(ir_finite_elements)))
-    code_finite_elements = [
-        ufc_finite_element_generator(ir, parameters) for ir in ir_finite_elements
-    ]
-
-    # Generate code for dofmaps
-    logger.debug("Generating code for {} dofmap(s)".format(len(ir_dofmaps)))
-    code_dofmaps = [ufc_dofmap_generator(ir, parameters) for ir in ir_dofmaps]
-
-    # Generate code for coordinate_mappings
-    logger.debug("Generating code for {} coordinate_mapping(s)".format(len(ir_coordinate_mappings)))
-    code_coordinate_mappings = [
-        ufc_coordinate_mapping_generator(ir, parameters) for ir in ir_coordinate_mappings
-    ]
-
-    ufc_coordinate_mapping_generator
-
-    # Generate code for integrals
-    logger.debug("Generating code for integrals")
-    code_integrals = [ufc_integral_generator(ir, parameters) for ir in ir_integrals]
-
-    # Generate code for forms
-    logger.debug("Generating code for forms")
-    code_forms = [ufc_form_generator(ir, parameters) for ir in ir_forms]
+    # Generate code for finite_elements, dofmaps, coordinate_mappings,
+    # integrals and forms, in parallel if requested, keeping the order
+    logger.debug("Generating code for {} finite_element(s), {} dofmap(s), {} coordinate_mapping(s), "
+                 "{} integral(s) and {} form(s)".format(
+                     len(ir_finite_elements), len(ir_dofmaps), len(ir_coordinate_mappings),
+                     len(ir_integrals), len(ir_forms)))
+    groups = [(ufc_finite_element_generator, ir_finite_elements),
+              (ufc_dofmap_generator, ir_dofmaps),
+              (ufc_coordinate_mapping_generator, ir_coordinate_mappings),
+              (ufc_integral_generator, ir_integrals),
+              (ufc_form_generator, ir_forms)]
+    tasks = [(generator, (ir, parameters)) for generator, irs in groups for ir in irs]
+    num_workers = parameters.get("codegen_workers", 0)
+    if num_workers > 1:
+        logger.debug("Generating code for {} objects using {} processes".format(
+            len(tasks), num_workers))
+    code = parallel_apply(tasks, num_workers)
+    code_finite_elements, code_dofmaps, code_coordinate_mappings, code_integrals, code_forms = [
+        code[begin:end] for begin, end in _group_ranges(groups)]
+
+    # Generate code for basisvalues shared by finite_elements, placed before them
+    if parameters["shared_basisvalues"] and ir_finite_elements:
+        code_finite_elements.insert(0, ufc_basisvalues_generator(ir_finite_elements, parameters))
+
+    # Generate code for reading timings of all integrals, placed after them
+    if parameters["add_tabulate_tensor_timing"] and ir_integrals:
+        prefix = ir_integrals[0]["prefix"]
+        code_integrals.append(ufc_integral_timings_generator(ir_integrals, prefix, parameters))
 
     # Extract additional includes
     includes = _extract_includes(full_ir, code_integrals, jit)
@@ -74,6 +81,16 @@ def generate_code(ir, parameters, jit):
             code_forms, includes)
 
 
+def _group_ranges(groups):
+    """Return the (begin, end) range of the tasks of each group."""
+    ranges = []
+    begin = 0
+    for generator, irs in groups:
+        ranges.append((begin, begin + len(irs)))
+        begin += len(irs)
+    return ranges
+
+
 def _extract_includes(full_ir, code_integrals, jit):
     ir_finite_elements, ir_dofmaps, ir_coordinate_mappings, ir_integrals, ir_forms = full_ir
 
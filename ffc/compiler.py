@@ -84,7 +84,7 @@ from time import time
 
 import ufl
 from ffc import FFCError
-from ffc.analysis import analyze_ufl_objects
+from ffc.analysis import analyze_ufl_objects, write_quadrature_report
 from ffc.codegeneration import generate_code
 from ffc.formatting import format_code
 from ffc.optimization import optimize_ir
@@ -148,6 +148,11 @@ def compile_ufl_objects(ufl_objects,
     analysis = analyze_ufl_objects(ufl_objects, kind, parameters)
     _print_timing(1, time() - cpu_time)
 
+    # Write the quadrature degrees selected in analysis
+    if kind == "form" and parameters.get("quadrature_report"):
+        write_quadrature_report(analysis[0], os.path.join(parameters["output_dir"],
+                                                          parameters["quadrature_report"]))
+
     # Stage 2: intermediate representation
     cpu_time = time()
     ir = compute_ir(analysis, prefix, parameters, jit)
@@ -64,7 +64,12 @@ c_extern_post = """
 
 
 def format_code(code, wrapper_code, prefix, parameters):
-    """Format given code in UFC format. Returns two strings with header and source file contents."""
+    """Format given code in UFC format. Returns two strings with header and source file contents.
+
+    With the split_integrals parameter, the source is instead returned
+    as a list of (name, contents) of source files including the header,
+    one for each integral and one named prefix for the other code.
+    """
 
     logger.debug("Compiler stage 5: Formatting code")
 
@@ -106,9 +111,17 @@ def format_code(code, wrapper_code, prefix, parameters):
     code_h += "".join([c[0] for c in code_coordinate_mappings])
     code_c += "".join([c[1] for c in code_coordinate_mappings])
 
-    # Add code for integrals
+    # Add code for integrals, except for separate integral source files
     code_h += "".join([integral[0] for integral in code_integrals])
-    code_c += "".join([integral[1] for integral in code_integrals])
+    if parameters["split_integrals"]:
+        # The timings accessor following the integrals refers to all of them
+        num_units = len(code_integrals)
+        if parameters["add_tabulate_tensor_timing"] and code_integrals:
+            num_units -= 1
+        code_units = [integral[1] for integral in code_integrals[:num_units]]
+        code_c += "".join([integral[1] for integral in code_integrals[num_units:]])
+    else:
+        code_c += "".join([integral[1] for integral in code_integrals])
 
     # Add code for form
     code_h += "".join([form[0] for form in code_forms])
@@ -121,7 +134,17 @@ def format_code(code, wrapper_code, prefix, parameters):
 
     # Add headers to body
     code_h = code_h_pre + code_h + code_h_post
-    code_c = code_c_pre + code_c
+    if parameters["split_integrals"]:
+        # Source files declare ufc_scalar_t and all functions by
+        # including the header
+        code_c_pre = _generate_comment(parameters) + "\n"
+        code_c_pre += "#include \"{}.h\"\n".format(prefix) + includes_c
+        code_c = [(prefix, code_c_pre + code_c)] + [
+            ("{}_integral_{}".format(prefix, i), code_c_pre + code)
+            for i, code in enumerate(code_units)
+        ]
+    else:
+        code_c = code_c_pre + code_c
 
     return code_h, code_c
 
@@ -129,7 +152,10 @@ def format_code(code, wrapper_code, prefix, parameters):
 def write_code(code_h, code_c, prefix, parameters):
     # Write file(s)
     _write_file(code_h, prefix, ".h", parameters)
-    if code_c:
+    if isinstance(code_c, list):
+        for name, code in code_c:
+            _write_file(code, name, ".c", parameters)
+    elif code_c:
         _write_file(code_c, prefix, ".c", parameters)
 
 
@@ -188,6 +214,10 @@ def _generate_includes(includes, parameters):
     s_h = set(default_h_includes) | includes
     s_c = set(default_c_includes)
 
+    # For clock_gettime in timing of tabulate_tensor
+    if parameters["add_tabulate_tensor_timing"]:
+        s_c.add("#include <time.h>")
+
     # s2 = external_includes - s
 
     includes_h = "\n".join(sorted(s_h)) + "\n" if s_h else ""
@@ -211,6 +241,8 @@ def _define_scalar(parameters):
             "#endif",
             "\n",
         ])
+    elif scalar_type == "float":
+        scalar = "typedef float ufc_scalar_t;" + "\n"
     else:
         scalar = "typedef double ufc_scalar_t;" + "\n"
 
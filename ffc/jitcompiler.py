@@ -9,16 +9,20 @@ code into a Python module.
 
 """
 
+import concurrent.futures
 import hashlib
 import logging
 import os
+import shutil
+import subprocess
+import tempfile
+import uuid
 
 import dijitso
 import ufl
 from ffc import __version__ as FFC_VERSION
 from ffc import FFCError, classname
 from ffc.backends import ufc
-from ffc import compiler
 from ffc.parameters import (compute_jit_parameters_signature, validate_jit_parameters)
 
 logger = logging.getLogger(__name__)
@@ -26,8 +30,26 @@ logger = logging.getLogger(__name__)
 
 def generate(ufl_object, module_name, signature, parameters):
     """Callback function passed to dijitso.jit: generate code and return as strings."""
+    code_h, code_c, dependencies = _generate_code(ufl_object, module_name, parameters)
+
+    # dijitso builds a single source file, which can hold split
+    # integral sources in sequence since they all include the header
+    if isinstance(code_c, list):
+        code_c = "".join(code for name, code in code_c)
+
+    return code_h, code_c, dependencies
+
+
+def _generate_code(ufl_object, module_name, parameters):
+    """Generate code, returning header, source and the names of the
+    modules of the dependencies. The source is a list of (name, code)
+    with the split_integrals parameter."""
     logger.info("Calling FFC just-in-time (JIT) compiler.")
 
+    # The compiler stages import FIAT and the code generators, which a
+    # lookup of modules in the cache does not need
+    from ffc import compiler
+
     # Pick the generator for actual code for this object
     if isinstance(ufl_object, ufl.Form):
         compile_object = compiler.compile_form
@@ -73,6 +95,74 @@ def _string_tuple(param):
 
 def build(ufl_object, module_name, parameters):
     """Wraps dijitso jit with some parameter conversion etc."""
+    params = _dijitso_params(parameters)
+
+    # With split_integrals, compile the integral sources to objects in
+    # parallel first, and let dijitso link them with the other code
+    generate_module = generate
+    build_dir = None
+    split_integrals = parameters.get("split_integrals")
+    if split_integrals and dijitso.cache.lookup_lib(module_name, params["cache"]) is None:
+        code_h, code_c, dependencies = _generate_code(ufl_object, module_name, parameters)
+        build_dir = tempfile.mkdtemp(dir=params["cache"]["temp_dir_root"] or None)
+        try:
+            objects = _compile_objects(code_c[1:], code_h, module_name, build_dir, params,
+                                       parameters.get("build_workers", 0))
+        except Exception:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+        params["build"]["cxxflags"] = tuple(params["build"]["cxxflags"]) + tuple(objects)
+
+        def generate_module(ufl_object, module_name, signature, parameters):
+            return code_h, code_c[0][1], dependencies
+
+    # Carry out jit compilation, calling generate only if needed
+    try:
+        module, signature = dijitso.jit(
+            jitable=ufl_object, name=module_name, params=params, generate=generate_module)
+    finally:
+        if build_dir:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+    return module
+
+
+def _compile_objects(sources, header, module_name, build_dir, params, num_workers):
+    """Compile sources [(name, code)] including the header of the module
+    into object files in build_dir, with the compiler and flags of the
+    dijitso build params and a pool of num_workers C compiler processes
+    (0 for the number of CPUs). Returns the object filenames."""
+    build_params = params["build"]
+    with open(os.path.join(build_dir, module_name + ".h"), "w") as f:
+        f.write(header)
+
+    flags = [flag for flag in build_params["cxxflags"] if flag != "-shared"]
+    if build_params["debug"]:
+        flags += build_params["cxxflags_debug"]
+    else:
+        flags += build_params["cxxflags_opt"]
+    include_dirs = (build_dir, ) + tuple(build_params["include_dirs"]) + (
+        dijitso.cache.make_inc_dir(params["cache"]), )
+    command = [build_params["cxx"]] + flags + ["-I" + os.path.abspath(d) for d in include_dirs]
+
+    def compile_object(name, code):
+        source = os.path.join(build_dir, name + ".c")
+        obj = os.path.join(build_dir, name + ".o")
+        with open(source, "w") as f:
+            f.write(code)
+        result = subprocess.run(command + ["-c", source, "-o", obj], stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, universal_newlines=True)
+        if result.returncode != 0:
+            raise FFCJitError("JIT compilation of {} failed:\n{}".format(name, result.stdout))
+        return obj
+
+    num_workers = min(num_workers or os.cpu_count() or 1, max(len(sources), 1))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as pool:
+        return list(pool.map(lambda source: compile_object(*source), sources))
+
+
+def _dijitso_params(parameters):
+    """Translate FFC parameters to validated dijitso parameters."""
     # FIXME: Expose more dijitso parameters?
     # FIXME: dijitso build params are not part of module_name here.
     #        Currently dijitso doesn't add to the module signature.
@@ -81,7 +171,8 @@ def build(ufl_object, module_name, parameters):
     # equivalent behaviour to instant code
     build_params = {}
     build_params["debug"] = not parameters["cpp_optimize"]
-    build_params["cxxflags_opt"] = tuple(parameters["cpp_optimize_flags"].split())
+    build_params["cxxflags_opt"] = tuple(parameters["cpp_optimize_flags"].split()) + tuple(
+        ufc.get_build_profile_flags(parameters["build_profile"]))
     build_params["cxxflags_debug"] = ("-O0", )
     build_params["include_dirs"] = (ufc.get_include_path(), ) + _string_tuple(
         parameters.get("external_include_dirs"))
@@ -110,11 +201,80 @@ def build(ufl_object, module_name, parameters):
         "generator": parameters,  # ffc parameters, just passed on to generate
     })
 
-    # Carry out jit compilation, calling generate only if needed
-    module, signature = dijitso.jit(
-        jitable=ufl_object, name=module_name, params=params, generate=generate)
+    # Let libraries find their dependencies in the node-local copy of
+    # the cache first
+    local_cache_dir = parameters.get("local_cache_dir")
+    if local_cache_dir:
+        local_lib_dir = os.path.join(os.path.abspath(local_cache_dir), params["cache"]["lib_dir"])
+        params["build"]["rpath_dirs"] = (local_lib_dir, ) + tuple(params["build"]["rpath_dirs"])
 
-    return module
+    return params
+
+
+def _collective_build(ufl_object, parameters, comm):
+    """Build module on rank 0 of comm and load it on all ranks,
+    returning kind, module name and module.
+
+    The other ranks neither compute the module name nor look in the
+    cache before rank 0 is done. With the local_cache_dir parameter,
+    rank 0 sends the libraries to all ranks, which load them from a
+    copy of the cache in that directory.
+    """
+    local_cache_dir = parameters.get("local_cache_dir")
+    if comm.rank == 0:
+        try:
+            kind, module_name = compute_prefix(ufl_object, parameters)
+            module = build(ufl_object, module_name, parameters)
+            if module is None:
+                raise FFCJitError("Failed to build or load module {}.".format(module_name))
+            libraries = _read_libraries(module_name, parameters) if local_cache_dir else None
+        except Exception as e:
+            # Let the other ranks fail too, rather than wait
+            comm.bcast((None, None, None, "{}: {}".format(type(e).__name__, e)), root=0)
+            raise
+        comm.bcast((kind, module_name, libraries, None), root=0)
+        return kind, module_name, module
+
+    kind, module_name, libraries, error = comm.bcast(None, root=0)
+    if error is not None:
+        raise FFCJitError("JIT compilation failed on rank 0 with {}".format(error))
+
+    cache_params = _dijitso_params(parameters)["cache"]
+    if local_cache_dir:
+        cache_params = dict(cache_params, cache_dir=os.path.abspath(local_cache_dir))
+        _write_libraries(libraries, cache_params)
+    module = dijitso.cache.lookup_lib(module_name, cache_params)
+    if module is None:
+        raise FFCJitError("Failed to load module {} built on rank 0.".format(module_name))
+    return kind, module_name, module
+
+
+def _read_libraries(module_name, parameters):
+    """Return {signature: binary} of the library of a module in the cache,
+    and of the libraries in the cache it depends on."""
+    cache_params = _dijitso_params(parameters)["cache"]
+    lib_filename = dijitso.cache.create_lib_filename(module_name, cache_params)
+    prefix = cache_params["lib_prefix"] + cache_params["lib_basename"]
+    postfix = cache_params["lib_postfix"]
+    filenames = {module_name: lib_filename}
+    for basename, path in dijitso.system.ldd(lib_filename).items():
+        if basename.startswith(prefix) and basename.endswith(postfix) and path:
+            filenames[basename[len(prefix):-len(postfix)]] = path
+    return {signature: dijitso.cache.read_library_binary(filename)
+            for signature, filename in filenames.items()}
+
+
+def _write_libraries(libraries, cache_params):
+    """Write libraries from _read_libraries to the cache, unless present."""
+    dijitso.cache.make_lib_dir(cache_params)
+    for signature, lib_data in libraries.items():
+        lib_filename = dijitso.cache.create_lib_filename(signature, cache_params)
+        if not os.path.exists(lib_filename):
+            # Ranks sharing the directory may write the same library
+            # at the same time, so move complete files into place
+            temp_filename = "{}.{}".format(lib_filename, uuid.uuid4().hex)
+            lib_data.tofile(temp_filename)
+            os.replace(temp_filename, lib_filename)
 
 
 def compute_prefix(ufl_object, parameters, kind=None):
@@ -143,6 +303,12 @@ def compute_prefix(ufl_object, parameters, kind=None):
     # Compute deterministic string of relevant parameters
     parameters_signature = compute_jit_parameters_signature(parameters)
 
+    # Binaries of different compilers, and of the native build profile
+    # on different machines, are kept apart
+    build_profile_flags = ufc.get_build_profile_flags(parameters.get("build_profile", "portable"))
+    compiler_signature = ufc.get_compiler_identity(os.getenv("CC", "cc"),
+                                                   tuple(build_profile_flags))
+
     # Increase this number at any time to invalidate cache signatures if
     # code generation has changed in important ways without the change
     # being visible in regular signatures:
@@ -155,6 +321,7 @@ def compute_prefix(ufl_object, parameters, kind=None):
         str(FFC_VERSION),
         str(jit_version_bump),
         ufc.get_signature(),
+        compiler_signature,
         kind,
     ]
     string = ";".join(signatures)
@@ -174,23 +341,37 @@ class FFCJitError(FFCError):
     pass
 
 
-def jit(ufl_object, parameters=None, indirect=False):
+def jit(ufl_object, parameters=None, indirect=False, comm=None):
     """Just-in-time compile the given form or element
 
     Parameters
     ----------
       ufl_object : The UFL object to be compiled
       parameters : A set of parameters
+      comm       : A communicator of the processes compiling the same
+                   object collectively, with a rank attribute and a
+                   bcast(obj, root=0) method like an mpi4py communicator.
+                   The module is generated and built on rank 0 only,
+                   and loaded by all ranks.
 
     """
     # Check parameters
     parameters = validate_jit_parameters(parameters)
 
-    # Make unique module name for generated code
-    kind, module_name = compute_prefix(ufl_object, parameters)
+    # dijitso builds each module once, leaving no room for a training
+    # run between an instrumented and a final build
+    if parameters["build_profile"] == "pgo":
+        raise FFCJitError("Build profile \"pgo\" is only supported by the cffi JIT "
+                          "in ffc.backends.ufc.jit.")
+
+    if comm is None:
+        # Make unique module name for generated code
+        kind, module_name = compute_prefix(ufl_object, parameters)
 
-    # Get module (inspect cache and generate+build if necessary)
-    module = build(ufl_object, module_name, parameters)
+        # Get module (inspect cache and generate+build if necessary)
+        module = build(ufl_object, module_name, parameters)
+    else:
+        kind, module_name, module = _collective_build(ufl_object, parameters, comm)
 
     # Raise exception on failure to build or import module
     if module is None:
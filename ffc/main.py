@@ -16,9 +16,7 @@ import pathlib
 import re
 import string
 
-import ufl
 from ffc import __version__ as FFC_VERSION
-from ffc import compiler, formatting
 from ffc.parameters import default_parameters
 
 logger = logging.getLogger(__name__)
@@ -79,6 +77,7 @@ parser.add_argument("ufl_file", nargs='+', help="UFL file(s) to be compiled")
 
 
 def compile_ufl_data(ufd, prefix, parameters):
+    from ffc import compiler
     if len(ufd.forms) > 0:
         code_h, code_c = compiler.compile_form(
             ufd.forms, ufd.object_names, prefix=prefix, parameters=parameters)
@@ -127,6 +126,11 @@ def main(args=None):
 
 
 def _compile_files(args, parameters, enable_profile):
+    # The form language and compiler are imported only when there are
+    # files to compile, not for --help and --version
+    import ufl
+    from ffc import formatting
+
     # Call parser and compiler for each file
     for filename in args:
         file = pathlib.Path(filename)
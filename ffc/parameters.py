@@ -15,7 +15,7 @@ logger = logging.getLogger(__name__)
 # FIXME: Document option -fconvert_exceptions_to_warnings
 
 # NB! Parameters in the generate and build sets are
-# included in jit signature, cache and log are not.
+# included in jit signature, cache, parallel and log are not.
 _FFC_GENERATE_PARAMETERS = {
     "format": "ufc",  # code generation format
     "representation": "auto",  # form representation / code generation strategy
@@ -24,9 +24,21 @@ _FFC_GENERATE_PARAMETERS = {
     None,
     # quadrature degree used for computing integrals (None is auto)
     "quadrature_degree": None,
+    # maximum auto quadrature degree, for all cells or per cell type
+    # as e.g. "triangle:8,tetrahedron:6" ("" for no maximum)
+    "max_quadrature_degree": "",
+    # maximum auto quadrature degree for integrands with non-polynomial operators (-1 for none)
+    "nonpolynomial_quadrature_degree": -1,
+    # lower auto quadrature degrees until the number of points times the element
+    # tensor size is at most this (0 for no budget)
+    "quadrature_cost_budget": 0,
     # precision used when writing numbers (None for max precision)
     "precision": None,
     "epsilon": 1e-14,  # machine precision, used for dropping zero terms in tables
+    # type of element tensors, coefficients and tables ("double", "float" or "double complex")
+    "scalar_type": "double",
+    # with scalar_type "float", compute the geometry and its element tables in double
+    "mixed_precision": False,
     "form_postfix": True,  # postfix form name with "Function", "LinearForm" or BilinearForm
     # convert all exceptions to warning in generated code
     "convert_exceptions_to_warnings": False,
@@ -36,8 +48,28 @@ _FFC_GENERATE_PARAMETERS = {
     # set to True to add timing inside tabulate_tensor
     "generate_dummy_tabulate_tensor": False,
     "add_tabulate_tensor_timing": False,
+    # generate tabulate_tensor_workspace, with temporaries in a caller provided workspace
+    "generate_tabulate_tensor_workspace": False,
+    # generate tabulate_tensor_geometry for affine simplex cells, reading the Jacobian
+    # determinant and inverse from a caller provided ufc_affine_geometry
+    "generate_tabulate_tensor_geometry": False,
+    # evaluate basis functions for batches of this many points as one matrix product
+    # of stacked expansion coefficients and basisvalues, 0 for loops over dofs
+    "evaluate_basis_batch_size": 0,
+    # evaluate basis derivatives up to this order with precomputed derivative
+    # coefficients, one matrix product per batch of points, 0 for none
+    "precompute_basis_derivatives": 0,
+    # compute basisvalues with one function per cell and degree shared by all elements,
+    # for smaller code, called once per point unless evaluate_basis_batch_size > 0
+    "shared_basisvalues": False,
+    # generate tabulate_dofs as a loop over static tables for dofmaps with at
+    # least this many dofs, 0 for one assignment per dof
+    "tabulate_dofs_table_min_size": 0,
     # ':' separated list of include filenames to add to generated code
     "external_includes": "",
+    # write each integral to a separate source file including the header,
+    # for compiling the integrals in parallel
+    "split_integrals": False,
 }
 _FFC_BUILD_PARAMETERS = {
     "cpp_optimize": True,  # optimization for the C++ compiler
@@ -48,18 +80,45 @@ _FFC_BUILD_PARAMETERS = {
     "",  # ':' separated list of library search dirs to add when JIT compiling
     # ':' separated list of include dirs to add when JIT compiling
     "external_include_dirs": "",
+    # CBLAS library to link JIT compiled libraries with, used by ufc_dgemm_tn and ufc_sgemm_tn if set
+    "blas_library": "",
+    # JIT build profile: "portable", "native" (-march=native -ffast-math) or "pgo"
+    # (profile-guided, with a training run of tabulate_tensor on synthetic cells,
+    # cffi JIT only)
+    "build_profile": "portable",
 }
 _FFC_CACHE_PARAMETERS = {
     "cache_dir": "",  # cache dir used by Instant
     "output_dir": ".",  # output directory for generated code
+    # node-local directory to which collective JIT compilation copies the
+    # libraries from the cache, at the same path on all nodes ("" for none)
+    "local_cache_dir": "",
+    # number of preprocessed forms kept for reuse by analysis (0 to disable)
+    "analysis_cache_size": 32,
+    # number of representations of forms kept for reuse by structurally
+    # identical forms (0 to disable)
+    "ir_cache_size": 32,
+}
+_FFC_PARALLEL_PARAMETERS = {
+    # number of processes computing integral representations (0 or 1 for serial)
+    "ir_workers": 0,
+    # number of processes generating code for elements, dofmaps, coordinate mappings,
+    # integrals and forms (0 or 1 for serial)
+    "codegen_workers": 0,
+    # number of C compiler processes building split_integrals sources in the
+    # JIT (0 for the number of CPUs)
+    "build_workers": 0,
 }
 _FFC_LOG_PARAMETERS = {
     # "log_level": INFO + 5,  # log level, displaying only messages with level >= log_level
     "log_prefix": "",  # log prefix
+    # JSON file to write the quadrature degree selected for each integral to
+    "quadrature_report": "",
 }
 FFC_PARAMETERS = {}
 FFC_PARAMETERS.update(_FFC_BUILD_PARAMETERS)
 FFC_PARAMETERS.update(_FFC_CACHE_PARAMETERS)
+FFC_PARAMETERS.update(_FFC_PARALLEL_PARAMETERS)
 FFC_PARAMETERS.update(_FFC_LOG_PARAMETERS)
 FFC_PARAMETERS.update(_FFC_GENERATE_PARAMETERS)
 
@@ -149,6 +208,8 @@ def compilation_relevant_parameters(parameters):
         del p[k]
     for k in _FFC_CACHE_PARAMETERS:
         del p[k]
+    for k in _FFC_PARALLEL_PARAMETERS:
+        del p[k]
 
     # This doesn't work because some parameters may not be among the defaults above.
     # That is somewhat confusing but we'll just have to live with it at least for now.
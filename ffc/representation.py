@@ -17,7 +17,7 @@ function "foo", one should only need to use the data stored
 in the intermediate representation under the key "foo".
 """
 
-import itertools
+import collections
 import logging
 
 import numpy
@@ -25,6 +25,8 @@ import numpy
 import ufl
 from ffc import FFCError
 from ffc import classname
+from ffc.parameters import compute_jit_parameters_signature
+from ffc.utils import parallel_apply
 from ffc.fiatinterface import (EnrichedElement, MixedElement, QuadratureElement, SpaceOfReals,
                                create_element)
 import ffc.fiatinterface
@@ -37,6 +39,11 @@ logger = logging.getLogger(__name__)
 # List of supported integral types
 ufc_integral_types = ("cell", "exterior_facet", "interior_facet", "vertex", "custom")
 
+# Cache of representations of canonical forms, in least recently used order,
+# { (signatures, prefix, jit, parameters signature): (canonical forms, representation) }
+_ir_cache = collections.OrderedDict()
+_ir_cache_stats = {"hits": 0, "misses": 0}
+
 
 def pick_representation(representation):
     """Return one of the specialized code generation modules from a
@@ -98,6 +105,51 @@ def compute_ir(analysis, prefix, parameters, jit=False):
     # Extract data from analysis
     form_datas, elements, element_numbers, coordinate_elements = analysis
 
+    # Reuse the representation of structurally identical forms, which
+    # have equal canonical forms
+    cache_size = int(parameters.get("ir_cache_size", 0))
+    if form_datas and cache_size > 0:
+        canonical_forms = [fd.canonical_form for fd in form_datas]
+        key = (tuple(form.signature() for form in canonical_forms), prefix, jit,
+               compute_jit_parameters_signature(parameters))
+        cached = _ir_cache.get(key)
+        if cached is not None and all(a.equals(b) for a, b in zip(cached[0], canonical_forms)):
+            _ir_cache.move_to_end(key)
+            _ir_cache_stats["hits"] += 1
+            logger.info("Reusing intermediate representation from cache.")
+            return tuple(list(irs) for irs in cached[1])
+        _ir_cache_stats["misses"] += 1
+        ir = _compute_ir(form_datas, elements, element_numbers, coordinate_elements, prefix,
+                         parameters, jit)
+        _ir_cache[key] = (canonical_forms, ir)
+        while len(_ir_cache) > cache_size:
+            _ir_cache.popitem(last=False)
+        return tuple(list(irs) for irs in ir)
+
+    return _compute_ir(form_datas, elements, element_numbers, coordinate_elements, prefix,
+                       parameters, jit)
+
+
+def ir_cache_info():
+    """Return dict with the number of hits and misses of the cache of
+    form representations, and the number of cached representations."""
+    return {
+        "hits": _ir_cache_stats["hits"],
+        "misses": _ir_cache_stats["misses"],
+        "size": len(_ir_cache),
+    }
+
+
+def clear_ir_cache():
+    """Clear the cache of form representations and its statistics."""
+    _ir_cache.clear()
+    _ir_cache_stats["hits"] = 0
+    _ir_cache_stats["misses"] = 0
+
+
+def _compute_ir(form_datas, elements, element_numbers, coordinate_elements, prefix, parameters,
+                jit):
+    """Compute intermediate representation of analyzed forms or elements."""
     # Construct classnames for all element objects and coordinate mappings
     classnames = make_all_element_classnames(prefix, elements, coordinate_elements, element_numbers,
                                              parameters)
@@ -124,33 +176,38 @@ def compute_ir(analysis, prefix, parameters, jit=False):
         # only process the last (main) element from here on
         elements = [elements[-1]]
 
-    # Compute representation of elements
+    # Collect the independent computations of representations of
+    # elements, dofmaps, coordinate mappings and integrals
     logger.info("Computing representation of {} elements".format(len(elements)))
-    ir_elements = [
-        _compute_element_ir(e, element_numbers, classnames, parameters, jit) for e in elements
-    ]
+    tasks = [(_compute_element_ir, (e, element_numbers, classnames, parameters, jit))
+             for e in elements]
 
-    # Compute representation of dofmaps
     logger.info("Computing representation of {} dofmaps".format(len(elements)))
-    ir_dofmaps = [
-        _compute_dofmap_ir(e, element_numbers, classnames, parameters, jit) for e in elements
-    ]
+    tasks += [(_compute_dofmap_ir, (e, element_numbers, classnames, parameters, jit))
+              for e in elements]
 
-    # Compute representation of coordinate mappings
     logger.info("Computing representation of {} coordinate mappings".format(
         len(coordinate_elements)))
-    ir_coordinate_mappings = [
-        _compute_coordinate_mapping_ir(e, element_numbers, classnames, parameters, jit)
-        for e in coordinate_elements
-    ]
+    tasks += [(_compute_coordinate_mapping_ir, (e, element_numbers, classnames, parameters, jit))
+              for e in coordinate_elements]
 
-    # Compute and flatten representation of integrals
     logger.info("Computing representation of integrals")
-    irs = [
-        _compute_integral_ir(fd, form_index, prefix, element_numbers, classnames, parameters, jit)
-        for (form_index, fd) in enumerate(form_datas)
-    ]
-    ir_integrals = list(itertools.chain(*irs))
+    tasks += [(_compute_integral_ir, (itg_data, _integral_form_data(fd, itg_data), form_index,
+                                      prefix, element_numbers, classnames, parameters, jit))
+              for (form_index, fd) in enumerate(form_datas) for itg_data in fd.integral_data]
+
+    # Compute representations, in parallel if requested, keeping the
+    # order of tasks
+    num_workers = parameters.get("ir_workers", 0)
+    if num_workers > 1:
+        logger.info("Computing {} representations using {} processes".format(
+            len(tasks), num_workers))
+    irs = parallel_apply(tasks, num_workers)
+    n, m = len(elements), len(coordinate_elements)
+    ir_elements = irs[:n]
+    ir_dofmaps = irs[n:2 * n]
+    ir_coordinate_mappings = irs[2 * n:2 * n + m]
+    ir_integrals = irs[2 * n + m:]
 
     # Compute representation of forms
     logger.info("Computing representation of forms")
@@ -188,6 +245,7 @@ def _compute_element_ir(ufl_element, element_numbers, classnames, parameters, ji
     ir["evaluate_basis"] = _evaluate_basis(ufl_element, fiat_element, parameters["epsilon"])
     ir["evaluate_dof"] = _evaluate_dof(ufl_element, fiat_element)
     ir["tabulate_dof_coordinates"] = _tabulate_dof_coordinates(ufl_element, fiat_element)
+    ir["interpolation_matrix"] = _interpolation_matrix(ufl_element, fiat_element)
     ir["num_sub_elements"] = ufl_element.num_sub_elements()
     ir["create_sub_element"] = [classnames["finite_element"][e] for e in ufl_element.sub_elements()]
 
@@ -290,6 +348,7 @@ def _compute_dofmap_ir(ufl_element, element_numbers, classnames, parameters, jit
     ir["num_entity_dofs"] = num_dofs_per_entity
     ir["num_entity_closure_dofs"] = num_dofs_per_entity_closure
     ir["tabulate_dofs"] = _tabulate_dofs(fiat_element, cell)
+    ir["num_cell_entities"] = [len(entity_dofs[dim]) for dim in sorted(entity_dofs.keys())]
     ir["dof_permutations"] = (edge_permutations, face_permutations, cell, cell_topology)
     ir["tabulate_facet_dofs"] = facet_dofs
     ir["tabulate_entity_dofs"] = (entity_dofs, num_dofs_per_entity)
@@ -445,52 +504,73 @@ def _needs_mesh_entities(fiat_element):
         return [d > 0 for d in num_dofs_per_entity]
 
 
-def _compute_integral_ir(form_data, form_index, prefix, element_numbers, classnames, parameters,
-                         jit):
-    """Compute intermediate represention for form integrals."""
+class _IntegralFormData(object):
+    """The attributes of a form data used by the uflacs representation
+    of an integral.
+
+    The full form data holds the integral data of all integrals of the
+    form, so this is passed to each integral task instead, to avoid
+    pickling the whole form for each worker process.
+    """
+
+    __slots__ = ("rank", "geometric_dimension", "argument_elements", "unique_elements",
+                 "function_replace_map")
+
+    def __init__(self, form_data):
+        for name in self.__slots__:
+            setattr(self, name, getattr(form_data, name))
+
+
+def _integral_form_data(form_data, itg_data):
+    """Return the form data needed for the representation of an integral."""
+    # The tsfc representation passes the form data on to tsfc
+    if itg_data.metadata["representation"] == "tsfc":
+        return form_data
+    return _IntegralFormData(form_data)
+
+
+def _compute_integral_ir(itg_data, form_data, form_index, prefix, element_numbers, classnames,
+                         parameters, jit):
+    """Compute intermediate represention for an integral of a form.
+
+    The arguments and the returned representation are picklable, for
+    computing the representations of integrals in worker processes.
+    """
     # For consistency, all jit objects now have classnames with postfix "main"
     if jit:
         assert form_index == 0
         form_index = "main"
 
-    irs = []
-
-    # Iterate over integrals
-    for itg_data in form_data.integral_data:
+    # Select representation
+    # TODO: Is it possible to detach this metadata from
+    # IntegralData? It's a bit strange from the ufl side.
+    r = pick_representation(itg_data.metadata["representation"])
 
-        # Select representation
-        # TODO: Is it possible to detach this metadata from
-        # IntegralData? It's a bit strange from the ufl side.
-        r = pick_representation(itg_data.metadata["representation"])
+    # Compute representation
+    ir = r.compute_integral_ir(
+        itg_data,
+        form_data,
+        form_index,  # FIXME: Can we remove this?
+        element_numbers,
+        classnames,
+        parameters)
 
-        # Compute representation
-        ir = r.compute_integral_ir(
-            itg_data,
-            form_data,
-            form_index,  # FIXME: Can we remove this?
-            element_numbers,
-            classnames,
-            parameters)
+    # Build classname
+    ir["classname"] = classname.make_integral_name(prefix, itg_data.integral_type, form_index,
+                                                   itg_data.subdomain_id)
 
-        # Build classname
-        ir["classname"] = classname.make_integral_name(prefix, itg_data.integral_type, form_index,
-                                                       itg_data.subdomain_id)
+    ir["classnames"] = classnames  # FIXME XXX: Use this everywhere needed?
 
-        ir["classnames"] = classnames  # FIXME XXX: Use this everywhere needed?
-
-        # Storing prefix here for reconstruction of classnames on code
-        # generation side
-        ir["prefix"] = prefix  # FIXME: Drop this?
-
-        # Store metadata for later reference (eg. printing as comment)
-        # NOTE: We make a commitment not to modify it!
-        ir["integrals_metadata"] = itg_data.metadata
-        ir["integral_metadata"] = [integral.metadata() for integral in itg_data.integrals]
+    # Storing prefix here for reconstruction of classnames on code
+    # generation side
+    ir["prefix"] = prefix  # FIXME: Drop this?
 
-        # Append representation
-        irs.append(ir)
+    # Store metadata for later reference (eg. printing as comment)
+    # NOTE: We make a commitment not to modify it!
+    ir["integrals_metadata"] = itg_data.metadata
+    ir["integral_metadata"] = [integral.metadata() for integral in itg_data.integrals]
 
-    return irs
+    return ir
 
 
 def _compute_form_ir(form_data, form_id, prefix, element_numbers, classnames, parameters,
@@ -807,6 +887,47 @@ def _tabulate_dof_coordinates(ufl_element, element):
     return data
 
 
+def _interpolation_matrix(ufl_element, element):
+    """Compute intermediate representation of the interpolation matrix,
+    mapping values of a function in reference space at the
+    interpolation points to the dofs. Point evaluation dofs and
+    integral moments are both linear combinations of point values, the
+    interpolation points being all points of the dual basis."""
+    # Bail out if any dual basis member is missing (element is not nodal)
+    dual_basis = element.dual_basis()
+    if any(L is None for L in dual_basis):
+        return {}
+
+    tdim = ufl_element.cell().topological_dimension()
+    reference_offsets = _generate_reference_offsets(element)
+
+    # Number points in order of appearance in the dual basis
+    points = []
+    point_numbers = {}
+    entries = []
+    for (i, L), offset in zip(enumerate(dual_basis), reference_offsets):
+        for x, tokens in L.pt_dict.items():
+            if x not in point_numbers:
+                point_numbers[x] = len(points)
+                points.append(x)
+            for (w, k) in tokens:
+                # Flatten reference value component
+                component = offset
+                if k:
+                    component += int(numpy.ravel_multi_index(k, (tdim, ) * len(k)))
+                entries.append((i, point_numbers[x], component, w))
+
+    matrix = numpy.zeros((len(dual_basis), len(points), ufl_element.reference_value_size()))
+    for (i, ip, component, w) in entries:
+        matrix[i, ip, component] += w
+
+    data = {}
+    data["tdim"] = tdim
+    data["points"] = points
+    data["matrix"] = matrix
+    return data
+
+
 def _tabulate_dofs(element, cell):
     """Compute intermediate representation of tabulate_dofs."""
     if isinstance(element, SpaceOfReals):
@@ -31,7 +31,7 @@ from ffc.uflacs.elementtables import (build_optimized_tables,
                                       piecewise_ttypes)
 from ufl import as_ufl, product
 from ufl.checks import is_cellwise_constant
-from ufl.classes import CellCoordinate, FacetCoordinate, QuadratureWeight
+from ufl.classes import CellCoordinate, FacetCoordinate, QuadratureWeight, SpatialCoordinate
 from ufl.measure import (custom_integral_types, facet_integral_types,
                          point_integral_types)
 
@@ -43,7 +43,7 @@ logger = logging.getLogger(__name__)
 ma_data_t = namedtuple("ma_data_t", ["ma_index", "tabledata"])
 
 common_block_data_fields = [
-    "block_mode",  # block mode name: "safe" | "full" | "preintegrated" | "premultiplied"
+    "block_mode",  # block mode name: "safe" | "full" | "gemm" | "partial" | "preintegrated" | "premultiplied"
     "ttypes",  # list of table types for each block rank
     "factor_index",  # int: index of factor in vertex array
     "factor_is_piecewise",  # bool: factor is found in piecewise vertex array instead of quadloop specific vertex array
@@ -202,6 +202,19 @@ def uflacs_default_parameters(optimize):
         "padlen": 1,
         "use_symbol_array": True,
         "tensor_init_mode": "upfront",  # interleaved | direct | upfront
+
+        # Integrate varying rank 2 blocks with at least this many
+        # entries as a matrix product over quadrature points after
+        # the quadrature loop (0 disables the gemm block mode)
+        "gemm_block_min_size": 0,
+        # Call ufc_dgemm_tn for gemm blocks with at least this many
+        # entries, generate register blocked loops for smaller blocks
+        "gemm_call_min_size": 400,
+
+        # Optimization passes applied to the generated code ast
+        "enable_cse": False,
+        "enable_strength_reduction": False,
+        "enable_loop_invariant_hoisting": False,
     }
     if optimize:
         # Override defaults if optimization is turned on
@@ -220,6 +233,13 @@ def uflacs_default_parameters(optimize):
             "padlen": 1,
             "use_symbol_array": True,
             "tensor_init_mode": "interleaved",  # interleaved | direct | upfront
+            "gemm_block_min_size": 0,
+            "gemm_call_min_size": 400,
+
+            # Optimization passes applied to the generated code ast
+            "enable_cse": True,
+            "enable_strength_reduction": True,
+            "enable_loop_invariant_hoisting": True,
         })
     return p
 
@@ -253,6 +273,10 @@ def parse_uflacs_optimization_parameters(parameters, integral_type):
     if integral_type in skip_premultiplied:
         p["enable_premultiplication"] = False
 
+    skip_gemm = point_integral_types + custom_integral_types
+    if integral_type in skip_gemm:
+        p["gemm_block_min_size"] = 0
+
     return p
 
 
@@ -275,6 +299,7 @@ def build_uflacs_ir(cell, integral_type, entitytype, integrands, tensor_shape,
     # Shared unique tables for all quadrature loops
     ir["unique_tables"] = {}
     ir["unique_table_types"] = {}
+    ir["unique_table_origins"] = {}
 
     # Shared piecewise expr_ir for all quadrature loops
     ir["piecewise_ir"] = empty_expr_ir()
@@ -322,7 +347,8 @@ def build_uflacs_ir(cell, integral_type, entitytype, integrands, tensor_shape,
         # necessary.
         initial_terminal_indices = [i for i, v in enumerate(V) if is_modified_terminal(v)]
         initial_terminal_data = [analyse_modified_terminal(V[i]) for i in initial_terminal_indices]
-        unique_tables, unique_table_types, unique_table_num_dofs, mt_unique_table_reference = build_optimized_tables(
+        (unique_tables, unique_table_types, unique_table_num_dofs, unique_table_origins,
+         mt_unique_table_reference) = build_optimized_tables(
             num_points,
             quadrature_rules,
             cell,
@@ -496,6 +522,13 @@ def build_uflacs_ir(cell, integral_type, entitytype, integrands, tensor_shape,
                 # Integrate functional in quadloop, scale block after
                 # quadloop
                 block_mode = "premultiplied"
+            elif (p["gemm_block_min_size"] and rank == 2 and (num_points or 0) > 1
+                  and not any(tt in piecewise_ttypes or tt == "quadrature" for tt in ttypes)
+                  and product(len(dofmap) for dofmap in blockmap) >= p["gemm_block_min_size"]):
+                # Store weight*f*u[i] and v[j] for each point in
+                # quadloop, compute sum_q (weight*f*u)[q,i]*v[q,j] as
+                # a dense matrix product after quadloop
+                block_mode = "gemm"
             elif p["enable_sum_factorization"]:
                 if (rank == 2 and any(tt in piecewise_ttypes for tt in ttypes)):
                     # Partial computation in quadloop of f*u[i],
@@ -605,7 +638,7 @@ def build_uflacs_ir(cell, integral_type, entitytype, integrands, tensor_shape,
 #                # premultiplied, except no P table name or values)
 #                block_is_piecewise = False
 
-            elif block_mode in ("partial", "full", "safe"):
+            elif block_mode in ("partial", "full", "safe", "gemm"):
                 # Translate indices to piecewise context if necessary
                 block_is_piecewise = factor_is_piecewise and not expect_weight
                 ma_data = []
@@ -637,9 +670,10 @@ def build_uflacs_ir(cell, integral_type, entitytype, integrands, tensor_shape,
                                                      factor_is_piecewise, block_unames,
                                                      block_restrictions, block_is_transposed,
                                                      tuple(ma_data), piecewise_ma_index)
-                elif block_mode in ("full", "safe"):
+                elif block_mode in ("full", "safe", "gemm"):
                     # Add to contributions:
                     # B[i] = sum_q weight * f * u[i] * v[j];  generated inside quadloop
+                    #                                         (after quadloop for gemm)
                     # A[blockmap] += B[i];                    generated after quadloop
 
                     block_unames = unames
@@ -671,7 +705,7 @@ def build_uflacs_ir(cell, integral_type, entitytype, integrands, tensor_shape,
             for blockdata in contributions:
                 if blockdata.block_mode in ("preintegrated", "premultiplied"):
                     active_table_names.add(blockdata.name)
-                elif blockdata.block_mode in ("partial", "full", "safe"):
+                elif blockdata.block_mode in ("partial", "full", "safe", "gemm"):
                     for mad in blockdata.ma_data:
                         active_table_names.add(mad.tabledata.name)
 
@@ -696,6 +730,9 @@ def build_uflacs_ir(cell, integral_type, entitytype, integrands, tensor_shape,
                     tbl, table, rtol=p["table_rtol"], atol=p["table_atol"]):
                 raise FFCError("Table values mismatch with same name.")
         ir["unique_tables"].update(unique_tables)
+        ir["unique_table_origins"].update(
+            (name, unique_table_origins[name]) for name in unique_tables
+            if name in unique_table_origins)
 
         # Analyse active terminals to check what we'll need to generate code for
         active_mts = []
@@ -710,7 +747,8 @@ def build_uflacs_ir(cell, integral_type, entitytype, integrands, tensor_shape,
         elif integral_type in facet_integral_types:
             need_points = any(isinstance(mt.terminal, FacetCoordinate) for mt in active_mts)
         elif integral_type in custom_integral_types:
-            need_points = True  # TODO: Always?
+            # Element tables are computed from the runtime points directly
+            need_points = any(isinstance(mt.terminal, SpatialCoordinate) for mt in active_mts)
         else:
             need_points = False
 
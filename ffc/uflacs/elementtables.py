@@ -31,7 +31,7 @@ default_rtol = 1e-5
 default_atol = 1e-8
 
 table_origin_t = namedtuple(
-    "table_origin",
+    "table_origin_t",
     ["element", "avg", "derivatives", "flat_component", "dofrange", "dofmap"])
 
 piecewise_ttypes = ("piecewise", "fixed", "ones", "zeros")
@@ -41,7 +41,7 @@ uniform_ttypes = ("uniform", "fixed", "ones", "zeros")
 valid_ttypes = set(
     ("quadrature", )) | set(piecewise_ttypes) | set(uniform_ttypes)
 
-unique_table_reference_t = namedtuple("unique_table_reference", [
+unique_table_reference_t = namedtuple("unique_table_reference_t", [
     "name", "values", "dofrange", "dofmap", "original_dim", "ttype",
     "is_piecewise", "is_uniform"
 ])
@@ -216,6 +216,35 @@ def get_ffc_table_values(points, cell, integral_type, ufl_element, avg,
     return res
 
 
+def reference_value_component(ufl_element, flat_component):
+    """Return the component of the flattened reference value of the
+    element corresponding to the flat component of the table."""
+    sh = ufl_element.value_shape()
+    if sh == ():
+        return 0
+    elif len(sh) == 2 and ufl_element.num_sub_elements() == 0:
+        # 2-tensor-valued elements, not a tensor product
+        (_, f2t) = build_component_numbering(sh, ufl_element.symmetry())
+        t_comp = f2t[flat_component]
+        return t_comp[0] * sh[1] + t_comp[1]
+    else:
+        return flat_component
+
+
+def reference_derivative_index(derivative_counts):
+    """Return the index of the derivative with given counts among the
+    derivatives of the same order in evaluate_reference_basis_derivatives.
+
+    The derivatives of order n are numbered by the directions
+    (d_1, ..., d_n) in lexicographical order."""
+    tdim = len(derivative_counts)
+    directions = [d for d, count in enumerate(derivative_counts) for _ in range(count)]
+    index = 0
+    for d in directions:
+        index = index * tdim + d
+    return index
+
+
 def generate_psi_table_name(num_points, element_counter, averaged, entitytype,
                             derivative_counts, flat_component):
     """Generate a name for the psi table of the form:
@@ -409,11 +438,11 @@ def optimize_element_tables(tables,
 
     Input:
       tables - { name: table }
-      table_origins - FIXME
+      table_origins - { name: (element, avg, derivative_counts, flat_component) }
 
     Output:
       unique_tables - { unique_name: stripped_table }
-      unique_table_origins - FIXME
+      unique_table_origins - { unique_name: table_origin_t }
     """
     used_names = sorted(tables)
     compressed_tables = {}
@@ -464,20 +493,14 @@ def optimize_element_tables(tables,
         uname = unique_names[ui]
         unique_tables[uname] = tbl
 
+    # Track table origins for runtime recomputation in custom integrals,
+    # the unique table is the compressed table of its first constructed name
     unique_table_origins = {}
-    # for ui in range(len(unique_tables_list)):
-    for ui in []:  # FIXME
+    for ui in range(len(unique_tables_list)):
         uname = unique_names[ui]
-
-        # Track table origins for runtime recomputation in custom integrals:
-        name = "name of 'smallest' element we can use to compute this table"
-        dofrange = "FIXME"  # table_ranges[name]
-        dofmap = "FIXME"  # table_dofmaps[name]
-
-        # FIXME: Make sure the "smallest" element is chosen
-        (element, avg, derivative_counts, fc) = table_origins[name]
+        element, avg, derivative_counts, fc = table_origins[uname]
         unique_table_origins[uname] = table_origin_t(
-            element, avg, derivative_counts, fc, dofrange, dofmap)
+            element, avg, derivative_counts, fc, table_ranges[uname], table_dofmaps[uname])
 
     return unique_tables, unique_table_origins, table_unames, table_ranges, table_dofmaps, table_original_num_dofs
 
@@ -601,6 +624,7 @@ def build_optimized_tables(num_points,
     for uname in unused_unames:
         del unique_table_ttypes[uname]
         del unique_tables[uname]
+        del unique_table_origins[uname]
 
     # Change tables to point to existing optimized tables
     # (i.e. tables from other contexts that have been compressed to look the same)
@@ -623,6 +647,7 @@ def build_optimized_tables(num_points,
         del unique_tables[uname]
         unique_table_ttypes[ename] = unique_table_ttypes[uname]
         del unique_table_ttypes[uname]
+        unique_table_origins[ename] = unique_table_origins.pop(uname)
 
     # Build mapping from modified terminal to unique table with metadata
     # { mt: (unique name,
@@ -658,4 +683,4 @@ def build_optimized_tables(num_points,
             ename, unique_tables[ename], dofrange, dofmap, original_dim, ttype,
             ttype in piecewise_ttypes, ttype in uniform_ttypes)
 
-    return unique_tables, unique_table_ttypes, unique_table_num_dofs, mt_unique_table_reference
+    return unique_tables, unique_table_ttypes, unique_table_num_dofs, unique_table_origins, mt_unique_table_reference
@@ -12,7 +12,8 @@ from collections import defaultdict
 
 from ffc import FFCError
 from ffc.uflacs.build_uflacs_ir import get_common_block_data
-from ffc.uflacs.elementtables import piecewise_ttypes
+from ffc.uflacs.elementtables import (piecewise_ttypes, reference_derivative_index,
+                                      reference_value_component)
 from ffc.uflacs.language.cnodes import pad_dim, pad_innermost_dim
 from ufl import product
 from ufl.classes import Condition
@@ -20,6 +21,9 @@ from ufl.measure import custom_integral_types, point_integral_types
 
 logger = logging.getLogger(__name__)
 
+# Shape of the register blocked tiles of B in gemm block mode
+gemm_tile_shape = (4, 4)
+
 
 class IntegralGenerator(object):
     def __init__(self, ir, backend, precision):
@@ -53,6 +57,10 @@ class IntegralGenerator(object):
         # TODO: Should this be part of the backend symbols? Doesn't really matter now.
         self.symbol_counters = defaultdict(int)
 
+        # Declarations of functions from other generated objects called
+        # by the generated code
+        self._external_declarations = set()
+
     def get_includes(self):
         """Return list of include statements needed to support generated code."""
         includes = set()
@@ -108,6 +116,10 @@ class IntegralGenerator(object):
 
         return sorted(includes)
 
+    def get_declarations(self):
+        """Return list of declarations of external functions called by generated code."""
+        return sorted(self._external_declarations)
+
     def init_scopes(self):
         """Initialize variable scope dicts."""
         # Reset variables, separate sets for quadrature loop
@@ -238,6 +250,34 @@ class IntegralGenerator(object):
 
         return L.StatementList(parts)
 
+    def generate_affine_geometry(self):
+        """Generate code computing the cell constant geometry of affine
+        simplex cells read by the generated code, which is given by the
+        caller to the tabulate_tensor_geometry variant instead."""
+        L = self.backend.language
+        restrictions = self.backend.access.affine_geometry_restrictions
+        if not restrictions:
+            return []
+
+        # Compute the geometry with the coordinate mapping of the form
+        cm_classname = self.ir["classnames"]["coordinate_mapping"][self.ir["coordinate_element"]]
+        self._external_declarations.add(
+            "int compute_affine_geometry_%s(ufc_affine_geometry* restrict geometry,\n"
+            "    const double* restrict coordinate_dofs, int cell_orientation);" % (cm_classname, ))
+
+        parts = []
+        for restriction in (None, "+", "-"):
+            if restriction not in restrictions:
+                continue
+            geometry = self.backend.symbols.affine_geometry(restriction)
+            parts += [
+                L.ArrayDecl("ufc_affine_geometry", geometry, 1),
+                L.Call("compute_affine_geometry_%s" % (cm_classname, ),
+                       (geometry, self.backend.symbols.coordinate_dofs_argument(restriction),
+                        self.backend.symbols.cell_orientation_argument(restriction))),
+            ]
+        return L.commented_code_list(parts, "Cell constant geometry")
+
     def generate_quadrature_tables(self):
         """Generate static tables of quadrature points and weights."""
         L = self.backend.language
@@ -264,7 +304,8 @@ class IntegralGenerator(object):
             if varying_ir["need_weights"]:
                 wsym = self.backend.symbols.weights_table(num_points)
                 parts += [
-                    L.ArrayDecl("static const double", wsym, num_points, weights, alignas=alignas)
+                    L.ArrayDecl("static const " + self.backend.scalar_type, wsym, num_points,
+                                weights, alignas=alignas)
                 ]
 
             # Generate quadrature points array
@@ -274,7 +315,8 @@ class IntegralGenerator(object):
                 flattened_points = points.reshape(N)
                 psym = self.backend.symbols.points_table(num_points)
                 parts += [
-                    L.ArrayDecl("static const double", psym, N, flattened_points, alignas=alignas)
+                    L.ArrayDecl("static const " + self.backend.geometry_type, psym, N,
+                                flattened_points, alignas=alignas)
                 ]
 
         # Add leading comment if there are any tables
@@ -314,8 +356,8 @@ class IntegralGenerator(object):
             if inline_tables and name[:2] == "PI":
                 continue
 
-            decl = L.ArrayDecl(
-                "static const double", name, table.shape, table, alignas=alignas, padlen=p)
+            decl = L.ArrayDecl("static const " + self.table_typename(name), name, table.shape,
+                               table, alignas=alignas, padlen=p)
             parts += [decl]
 
         # Add leading comment if there are any tables
@@ -327,6 +369,16 @@ class IntegralGenerator(object):
         ])
         return parts
 
+    def table_typename(self, name):
+        """Get the C type of the values of element table name, keeping
+        tables of the coordinate element in the geometry type."""
+        origin = self.ir["unique_table_origins"].get(name)
+        coordinate_element = self.ir["coordinate_element"]
+        if origin is not None and (origin.element == coordinate_element
+                                   or origin.element in coordinate_element.sub_elements()):
+            return self.backend.geometry_type
+        return self.backend.scalar_type
+
     def generate_quadrature_loop(self, num_points):
         """Generate quadrature loop with for this num_points."""
         L = self.backend.language
@@ -375,7 +427,6 @@ class IntegralGenerator(object):
 
         tables = self.ir["unique_tables"]
         table_types = self.ir["unique_table_types"]
-        # table_origins = self.ir["unique_table_origins"]  # FIXME
 
         # Generate unstructured varying partition
         body = self.generate_unstructured_varying_partition(num_points)
@@ -405,8 +456,10 @@ class IntegralGenerator(object):
 
             # Not assuming runtime size to be multiple by chunk size
             num_points_in_block = L.Symbol("num_points_in_chunk")
+            num_points_left = np - iq_chunk * chunk_size
             decl = L.VariableDecl("const int", num_points_in_block,
-                                  L.Call("min", (chunk_size, np - iq_chunk * chunk_size)))
+                                  L.Conditional(L.LT(num_points_left, chunk_size),
+                                                num_points_left, chunk_size))
             rule_parts.append(decl)
 
             iq_body = L.ForRange(iq, 0, num_points_in_block, body=body)
@@ -420,7 +473,7 @@ class IntegralGenerator(object):
                 cwsym = self.backend.symbols.custom_quadrature_weights()
                 wsym = self.backend.symbols.custom_weights_table()
                 rule_parts += [
-                    L.ArrayDecl("double", wsym, chunk_size, 0, alignas=alignas),
+                    L.ArrayDecl(self.backend.scalar_type, wsym, chunk_size, 0, alignas=alignas),
                     L.ForRange(
                         iq,
                         0,
@@ -433,7 +486,8 @@ class IntegralGenerator(object):
                 cpsym = self.backend.symbols.custom_quadrature_points()
                 psym = self.backend.symbols.custom_points_table()
                 rule_parts += [
-                    L.ArrayDecl("double", psym, chunk_size * gdim, 0, alignas=alignas),
+                    L.ArrayDecl(self.backend.geometry_type, psym, chunk_size * gdim, 0,
+                                alignas=alignas),
                     L.ForRange(
                         iq,
                         0,
@@ -448,22 +502,13 @@ class IntegralGenerator(object):
             # Add leading comment if there are any tables
             rule_parts = L.commented_code_list(rule_parts, "Quadrature weights and points")
 
-            # Preparations for element tables
-            table_parts = []
-
-            # Only declare non-piecewise tables, computed inside chunk loop
+            # Preparations for element tables, only non-piecewise
+            # tables are computed inside chunk loop
             non_piecewise_tables = [
                 name for name in sorted(tables) if table_types[name] not in piecewise_ttypes
             ]
-            for name in non_piecewise_tables:
-                table = tables[name]
-                decl = L.ArrayDecl(
-                    "double", name, (1, chunk_size, table.shape[2]), 0,
-                    alignas=alignas)  # padlen=padlen)
-                table_parts += [decl]
-
-            table_parts += [L.Comment("FIXME: Fill element tables here")]
-            # table_origins
+            table_parts = self.generate_runtime_element_tables(
+                non_piecewise_tables, iq_chunk, num_points_in_block)
 
             # Gather all in chunk loop
             chunk_body = rule_parts + table_parts + [iq_body]
@@ -471,6 +516,104 @@ class IntegralGenerator(object):
 
         return preparts, quadparts, postparts
 
+    def generate_runtime_element_tables(self, table_names, iq_chunk, num_points_in_block):
+        """Generate code to tabulate element tables at the runtime points
+        of one chunk in custom integrals.
+
+        The points of the chunk are mapped to the reference cell, and the
+        reference basis derivatives of each element are evaluated once
+        for all points in the chunk for each derivative order needed.
+        The tables are then extracted from these values using the
+        table origins recorded during table optimization.
+        """
+        L = self.backend.language
+
+        if not table_names:
+            return []
+
+        chunk_size = self.ir["params"]["chunk_size"]
+        alignas = self.ir["params"]["alignas"]
+        gdim = self.ir["geometric_dimension"]
+        tdim = self.ir["topological_dimension"]
+        tables = self.ir["unique_tables"]
+        origins = self.ir["unique_table_origins"]
+        classnames = self.ir["classnames"]
+
+        iq = self.backend.symbols.quadrature_loop_index()
+        ic = self.backend.symbols.coefficient_dof_sum_index()
+
+        parts = []
+
+        # Map the points of this chunk to the reference cell
+        cm_classname = classnames["coordinate_mapping"][self.ir["coordinate_element"]]
+        self._external_declarations.add(
+            "void compute_reference_coordinates_%s(double* restrict X, int num_points,\n"
+            "    const double* restrict x, const double* restrict coordinate_dofs,\n"
+            "    int cell_orientation);" % (cm_classname, ))
+        X = L.Symbol("X_chunk")
+        x = self.backend.symbols.custom_quadrature_points()
+        coordinate_dofs = L.Symbol("coordinate_dofs")
+        cell_orientation = self.backend.symbols.cell_orientation_argument(None)
+        parts += [
+            L.ArrayDecl("double", X, chunk_size * tdim, alignas=alignas),
+            L.Call("compute_reference_coordinates_%s" % (cm_classname, ),
+                   (X, num_points_in_block, L.AddressOf(x[chunk_size * gdim * iq_chunk]),
+                    coordinate_dofs, cell_orientation)),
+        ]
+
+        # Group tables by element and derivative order to evaluate
+        # each element once per chunk for each order
+        groups = defaultdict(list)
+        for name in table_names:
+            origin = origins[name]
+            if origin.avg:
+                raise FFCError("Not expecting averaged tables in custom integrals.")
+            order = sum(origin.derivatives)
+            groups[(origin.element, order)].append(name)
+
+        for k, (element, order) in enumerate(sorted(groups, key=lambda g: (str(g[0]), g[1]))):
+            # Evaluate reference basis derivatives of given order in all points of the chunk
+            classname = classnames["finite_element"][element]
+            self._external_declarations.add(
+                "int evaluate_reference_basis_derivatives_%s(double* restrict reference_values,\n"
+                "    int order, int num_points, const double* restrict X);" % (classname, ))
+            num_dofs = self.ir["element_dimensions"][element]
+            num_derivatives = tdim**order
+            value_size = product(element.reference_value_shape())
+            values = L.Symbol("BV%d" % (k, ))
+            parts += [
+                L.ArrayDecl("double", values,
+                            chunk_size * num_dofs * num_derivatives * value_size,
+                            alignas=alignas),
+                L.Call("evaluate_reference_basis_derivatives_%s" % (classname, ),
+                       (values, order, num_points_in_block, X)),
+            ]
+            values = L.FlattenedArray(values, dims=(chunk_size, num_dofs, num_derivatives, value_size))
+
+            # Extract tables from the basis values
+            for name in groups[(element, order)]:
+                origin = origins[name]
+                table = L.Symbol(name)
+                num_table_dofs = tables[name].shape[2]
+                derivative = reference_derivative_index(origin.derivatives)
+                component = reference_value_component(element, origin.flat_component)
+
+                parts += [L.ArrayDecl(self.table_typename(name), table,
+                                      (1, chunk_size, num_table_dofs), alignas=alignas)]
+                dofmap = origin.dofmap
+                if dofmap == tuple(range(dofmap[0], dofmap[0] + len(dofmap))):
+                    # Contiguous range of dofs
+                    body = L.ForRange(ic, 0, num_table_dofs,
+                                      body=L.Assign(table[0][iq][ic],
+                                                    values[iq, ic + dofmap[0], derivative, component]))
+                else:
+                    body = [L.Assign(table[0][iq][i], values[iq, j, derivative, component])
+                            for i, j in enumerate(dofmap)]
+                parts += [L.ForRange(iq, 0, num_points_in_block, body=body)]
+
+        parts = L.commented_code_list(parts, "Element tables evaluated at quadrature points of chunk")
+        return parts
+
     def generate_unstructured_piecewise_partition(self):
         L = self.backend.language
 
@@ -500,6 +643,12 @@ class IntegralGenerator(object):
     def generate_partition(self, symbol, V, V_active, V_mts, mt_tabledata, num_points):
         L = self.backend.language
 
+        # Piecewise intermediates are mostly geometry, computed once per cell
+        if num_points is None:
+            typename = self.backend.geometry_type
+        else:
+            typename = self.backend.scalar_type
+
         definitions = []
         intermediates = []
 
@@ -559,7 +708,7 @@ class IntegralGenerator(object):
                         intermediates.append(L.Assign(vaccess, vexpr))
                     else:
                         vaccess = L.Symbol("%s_%d" % (symbol.name, j))
-                        intermediates.append(L.VariableDecl("const double", vaccess, vexpr))
+                        intermediates.append(L.VariableDecl("const " + typename, vaccess, vexpr))
                 else:
                     # Access the inlined expression
                     vaccess = vexpr
@@ -575,7 +724,7 @@ class IntegralGenerator(object):
         if intermediates:
             if self.ir["params"]["use_symbol_array"]:
                 alignas = self.ir["params"]["alignas"]
-                parts += [L.ArrayDecl("double", symbol, len(intermediates), alignas=alignas)]
+                parts += [L.ArrayDecl(typename, symbol, len(intermediates), alignas=alignas)]
             parts += intermediates
         return parts
 
@@ -593,7 +742,14 @@ class IntegralGenerator(object):
                   for blockmap, contributions in sorted(block_contributions.items())
                   for blockdata in contributions if blockdata.block_mode != "preintegrated"]
 
+        # Blocks in gemm mode are integrated together per blockmap
+        gemm_blocks = defaultdict(list)
+
         for blockmap, blockdata in blocks:
+            if blockdata.block_mode == "gemm":
+                gemm_blocks[blockmap].append(blockdata)
+                continue
+
             # Get symbol for already defined block B if it exists
             common_block_data = get_common_block_data(blockdata)
             B = self.shared_blocks.get(common_block_data)
@@ -617,6 +773,14 @@ class IntegralGenerator(object):
             # Add A[blockmap] += B[...] to finalization
             self.finalization_blocks[blockmap].append(B)
 
+        for blockmap, blockdatas in sorted(gemm_blocks.items()):
+            B, block_preparts, block_quadparts, block_postparts = \
+                self.generate_gemm_block_parts(num_points, blockmap, blockdatas)
+            preparts.extend(block_preparts)
+            quadparts.extend(block_quadparts)
+            postparts.extend(block_postparts)
+            self.finalization_blocks[blockmap].append(B)
+
         return preparts, quadparts, postparts
 
     def get_entities(self, blockdata):
@@ -675,6 +839,46 @@ class IntegralGenerator(object):
             arg_factors.append(arg_factor)
         return arg_factors
 
+    def get_factor_and_weight(self, num_points, blockdata, iq):
+        """Return the factor expression of a block and the quadrature weight."""
+        L = self.backend.language
+
+        # Get factor expression
+        if blockdata.factor_is_piecewise:
+            v = self.ir["piecewise_ir"]["V"][blockdata.factor_index]
+        else:
+            v = self.ir["varying_irs"][num_points]["V"][blockdata.factor_index]
+        f = self.get_var(num_points, v)
+
+        # Quadrature weight was removed in representation, add it back now
+        if num_points is None:
+            weight = L.LiteralFloat(1.0)
+        elif self.ir["integral_type"] in custom_integral_types:
+            weights = self.backend.symbols.custom_weights_table()
+            weight = weights[iq]
+        else:
+            weights = self.backend.symbols.weights_table(num_points)
+            weight = weights[iq]
+
+        return f, weight
+
+    def get_weighted_factor(self, num_points, blockdata, f, weight):
+        """Return fw = f * weight and the code parts defining it
+        inside the quadrature loop, if not already defined."""
+        L = self.backend.language
+
+        parts = []
+        fw_rhs = L.float_product([f, weight])
+        if not isinstance(fw_rhs, L.Product):
+            fw = fw_rhs
+        else:
+            # Define and cache scalar temp variable
+            key = (num_points, blockdata.factor_index, blockdata.factor_is_piecewise)
+            fw, defined = self.get_temp_symbol("fw", key)
+            if not defined:
+                parts.append(L.VariableDecl("const " + self.backend.scalar_type, fw, fw_rhs))
+        return fw, parts
+
     def generate_block_parts(self, num_points, blockmap, blockdata):
         """Generate and return code parts for a given block.
 
@@ -710,11 +914,11 @@ class IntegralGenerator(object):
             "quadrature": "BQ",
         }
 
-        fwtempname = "fw"
         tempname = tempnames.get(blockdata.block_mode)
 
         alignas = self.ir["params"]["alignas"]
         padlen = self.ir["params"]["padlen"]
+        scalar_type = self.backend.scalar_type
 
         block_rank = len(blockmap)
         blockdims = tuple(len(dofmap) for dofmap in blockmap)
@@ -748,24 +952,10 @@ class IntegralGenerator(object):
             B = self.new_temp_symbol(blockname)
             # Add initialization of this block to parts
             # For all modes, block definition occurs before quadloop
-            preparts.append(L.ArrayDecl("double", B, blockdims, 0, alignas=alignas, padlen=padlen))
-
-        # Get factor expression
-        if blockdata.factor_is_piecewise:
-            v = self.ir["piecewise_ir"]["V"][blockdata.factor_index]
-        else:
-            v = self.ir["varying_irs"][num_points]["V"][blockdata.factor_index]
-        f = self.get_var(num_points, v)
+            preparts.append(L.ArrayDecl(scalar_type, B, blockdims, 0, alignas=alignas, padlen=padlen))
 
-        # Quadrature weight was removed in representation, add it back now
-        if num_points is None:
-            weight = L.LiteralFloat(1.0)
-        elif self.ir["integral_type"] in custom_integral_types:
-            weights = self.backend.symbols.custom_weights_table()
-            weight = weights[iq]
-        else:
-            weights = self.backend.symbols.weights_table(num_points)
-            weight = weights[iq]
+        # Get factor expression and quadrature weight
+        f, weight = self.get_factor_and_weight(num_points, blockdata, iq)
 
         # Define fw = f * weight
         if blockdata.block_mode in ("safe", "full", "partial"):
@@ -774,28 +964,21 @@ class IntegralGenerator(object):
             # Fetch code to access modified arguments
             arg_factors = self.get_arg_factors(blockdata, block_rank, num_points, iq, B_indices)
 
-            fw_rhs = L.float_product([f, weight])
-            if not isinstance(fw_rhs, L.Product):
-                fw = fw_rhs
-            else:
-                # Define and cache scalar temp variable
-                key = (num_points, blockdata.factor_index, blockdata.factor_is_piecewise)
-                fw, defined = self.get_temp_symbol(fwtempname, key)
-                if not defined:
-                    quadparts.append(L.VariableDecl("const double", fw, fw_rhs))
+            fw, fw_parts = self.get_weighted_factor(num_points, blockdata, f, weight)
+            quadparts += fw_parts
 
-                # Plan for vectorization of fw computations over iq:
-                # 1) Define fw as arrays e.g. "double fw0[nq];" outside quadloop
-                # 2) Access as fw0[iq] of course
-                # 3) Split quadrature loops, one for fw computation and one for blocks
-                # 4) Pad quadrature rule with 0 weights and last point
+            # Plan for vectorization of fw computations over iq:
+            # 1) Define fw as arrays e.g. "double fw0[nq];" outside quadloop
+            # 2) Access as fw0[iq] of course
+            # 3) Split quadrature loops, one for fw computation and one for blocks
+            # 4) Pad quadrature rule with 0 weights and last point
 
-                # Plan for vectorization of coefficient evaluation over iq:
-                # 1) Define w0_c1 etc as arrays e.g. "double w0_c1[nq] = {};" outside quadloop
-                # 2) Access as w0_c1[iq] of course
-                # 3) Splitquadrature loops, coefficients before fw computation
-                # 4) Possibly swap loops over iq and ic:
-                #    for(ic) for(iq) w0_c1[iq] = w[0][ic] * FE[iq][ic];
+            # Plan for vectorization of coefficient evaluation over iq:
+            # 1) Define w0_c1 etc as arrays e.g. "double w0_c1[nq] = {};" outside quadloop
+            # 2) Access as w0_c1[iq] of course
+            # 3) Splitquadrature loops, coefficients before fw computation
+            # 4) Possibly swap loops over iq and ic:
+            #    for(ic) for(iq) w0_c1[iq] = w[0][ic] * FE[iq][ic];
 
         if blockdata.block_mode == "safe":
             # Naively accumulate integrand for this block in the innermost loop
@@ -836,7 +1019,7 @@ class IntegralGenerator(object):
                     # inside quadrature loop
                     P_dim = blockdims[i]
                     quadparts.append(
-                        L.ArrayDecl("double", P, P_dim, None, alignas=alignas, padlen=padlen))
+                        L.ArrayDecl(scalar_type, P, P_dim, None, alignas=alignas, padlen=padlen))
                     P_rhs = L.float_product([fw, arg_factors[i]])
                     body = L.Assign(P[P_index], P_rhs)
                     # if ttypes[i] != "quadrature":  # FIXME: What does this mean here?
@@ -876,7 +1059,7 @@ class IntegralGenerator(object):
             if not defined:
                 # Declare P table in preparts
                 P_dim = blockdims[not_piecewise_index]
-                preparts.append(L.ArrayDecl("double", P, P_dim, 0, alignas=alignas, padlen=padlen))
+                preparts.append(L.ArrayDecl(scalar_type, P, P_dim, 0, alignas=alignas, padlen=padlen))
 
                 # Multiply collected factors
                 P_rhs = L.float_product([fw, arg_factors[not_piecewise_index]])
@@ -913,7 +1096,7 @@ class IntegralGenerator(object):
                 FI, defined = self.get_temp_symbol(tempname, key)
                 if not defined:
                     # Declare FI = 0 before quadloop
-                    preparts += [L.VariableDecl("double", FI, 0)]
+                    preparts += [L.VariableDecl(scalar_type, FI, 0)]
                     # Accumulate FI += weight * f in quadparts
                     quadparts += [L.AssignAdd(FI, L.float_product([weight, f]))]
 
@@ -932,6 +1115,101 @@ class IntegralGenerator(object):
 
         return A_rhs, preparts, quadparts, postparts
 
+    def generate_gemm_block_parts(self, num_points, blockmap, blocks):
+        """Generate and return code parts for the rank 2 blocks in gemm
+        mode contributing to blockmap.
+
+        The terms of all blocks are stacked as rows of U and V inside
+        the quadrature loop,
+
+            U[t*num_points + iq][i] = weight * f_t * u_t[i]
+            V[t*num_points + iq][j] = v_t[j]
+
+        and integrated after the quadrature loop as one matrix product
+        B = U^T V, either by register blocked loops over tiles of B or
+        by a call to ufc_dgemm_tn for large blocks.
+        """
+        L = self.backend.language
+
+        preparts = []
+        quadparts = []
+        postparts = []
+
+        alignas = self.ir["params"]["alignas"]
+
+        assert num_points is not None and num_points > 1
+        iq = self.backend.symbols.quadrature_loop_index()
+        arg_indices = tuple(self.backend.symbols.argument_loop_index(i) for i in range(2))
+
+        # Pad block dimensions to whole tiles, the padded columns
+        # of U and V are zero and so are the padded entries of B
+        blockdims = tuple(len(dofmap) for dofmap in blockmap)
+        m, n = (pad_dim(dim, t) for dim, t in zip(blockdims, gemm_tile_shape))
+        k = len(blocks) * num_points
+
+        # Declare flat tables and block before quadloop
+        scalar_type = self.backend.scalar_type
+        B = self.new_temp_symbol("BG")
+        U = self.new_temp_symbol("TG")
+        V = self.new_temp_symbol("TG")
+        preparts.append(L.ArrayDecl(scalar_type, B, m * n, 0, alignas=alignas))
+        preparts.append(L.ArrayDecl(scalar_type, U, k * m, alignas=alignas))
+        preparts.append(L.ArrayDecl(scalar_type, V, k * n, alignas=alignas))
+
+        # Store rows of U and V inside quadloop
+        for t, blockdata in enumerate(blocks):
+            assert not blockdata.transposed, "Not handled yet"
+            f, weight = self.get_factor_and_weight(num_points, blockdata, iq)
+            fw, fw_parts = self.get_weighted_factor(num_points, blockdata, f, weight)
+            quadparts += fw_parts
+            arg_factors = self.get_arg_factors(blockdata, 2, num_points, iq, arg_indices)
+            rhs = (L.float_product([fw, arg_factors[0]]), arg_factors[1])
+            row = num_points * t + iq
+            for i, (P, dim) in enumerate(((U, m), (V, n))):
+                body = L.Assign(P[dim * row + arg_indices[i]], rhs[i])
+                quadparts.append(L.ForRange(arg_indices[i], 0, blockdims[i], body=body))
+                quadparts += [L.Assign(P[dim * row + c], 0.0) for c in range(blockdims[i], dim)]
+
+        # Compute B = U^T V after quadloop
+        if product(blockdims) >= self.ir["params"]["gemm_call_min_size"]:
+            # Bundled micro-kernel in ufc_gemm.h, or BLAS dgemm/sgemm
+            # if the generated code is compiled with UFC_USE_CBLAS
+            gemm = "ufc_sgemm_tn" if scalar_type == "float" else "ufc_dgemm_tn"
+            postparts.append(L.Call(gemm, (m, n, k, U, m, V, n, B, n)))
+        else:
+            # Accumulate each tile of B in scalars over all rows of U
+            # and V, for the compiler to keep the tile in registers
+            mr, nr = gemm_tile_shape
+            ti = L.Symbol("ti")
+            tj = L.Symbol("tj")
+            us = [L.Symbol("gu%d" % r) for r in range(mr)]
+            vs = [L.Symbol("gv%d" % s) for s in range(nr)]
+            cs = [[L.Symbol("gc%d_%d" % (r, s)) for s in range(nr)] for r in range(mr)]
+            row_body = [L.VariableDecl("const " + scalar_type, us[r], U[m * iq + mr * ti + r])
+                        for r in range(mr)]
+            row_body += [L.VariableDecl("const " + scalar_type, vs[s], V[n * iq + nr * tj + s])
+                         for s in range(nr)]
+            row_body += [L.AssignAdd(cs[r][s], us[r] * vs[s])
+                         for r in range(mr) for s in range(nr)]
+            tile_body = [L.VariableDecl(scalar_type, cs[r][s], 0.0)
+                         for r in range(mr) for s in range(nr)]
+            tile_body += [L.ForRange(iq, 0, k, body=row_body)]
+            tile_body += [L.AssignAdd(B[n * (mr * ti + r) + nr * tj + s], cs[r][s])
+                          for r in range(mr) for s in range(nr)]
+            body = L.ForRange(tj, 0, n // nr, body=tile_body)
+            postparts.append(L.ForRange(ti, 0, m // mr, body=body))
+
+        # Equip code with comments
+        comments = ["UFLACS block mode: gemm"]
+        preparts = L.commented_code_list(preparts, comments)
+        quadparts = L.commented_code_list(quadparts, comments)
+        postparts = L.commented_code_list(postparts, comments)
+
+        # Define rhs expression for A[blockmap[arg_indices]] += A_rhs
+        A_rhs = B[n * arg_indices[0] + arg_indices[1]]
+
+        return A_rhs, preparts, quadparts, postparts
+
     def generate_preintegrated_dofblock_partition(self):
         # FIXME: Generalize this to unrolling all A[] += ... loops, or all loops with noncontiguous DM??
         L = self.backend.language
@@ -121,7 +121,7 @@ class CExpr(CNode):
 
     def __neg__(self):
         if isinstance(self, LiteralFloat):
-            return LiteralFloat(-self.value)
+            return LiteralFloat(-self.value, self.suffix)
         if isinstance(self, LiteralInt):
             return LiteralInt(-self.value)
         return Neg(self)
@@ -275,20 +275,23 @@ class Null(CExprLiteral):
 
 
 class LiteralFloat(CExprLiteral):
-    """A floating point literal value."""
+    """A floating point literal value, with suffix "f" for single precision."""
 
-    __slots__ = ("value", )
+    __slots__ = ("value", "suffix")
     precedence = PRECEDENCE.LITERAL
 
-    def __init__(self, value):
+    def __init__(self, value, suffix=""):
         assert isinstance(value, (float, int, numpy.number))
+        assert suffix in ("", "f")
         self.value = value
+        self.suffix = suffix
 
     def ce_format(self, precision=None):
-        return format_float(self.value, precision)
+        return format_float(self.value, precision) + self.suffix
 
     def __eq__(self, other):
-        return isinstance(other, LiteralFloat) and self.value == other.value
+        return (isinstance(other, LiteralFloat) and self.value == other.value
+                and self.suffix == other.suffix)
 
     def __bool__(self):
         return bool(self.value)
@@ -0,0 +1,640 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""Optimization passes over CNode statement trees.
+
+The passes operate on the C AST built by the integral generator,
+after the UFL level value numbering has been done. They catch what is
+left over at the C level: repeated index arithmetic, repeated products
+of table entries, and weight-factor products recomputed inside the
+innermost argument loops.
+
+Only pure expressions are rewritten, and products and sums are never
+reassociated, so the floating point results are unchanged except for
+the expansion of pow() with small integer exponents.
+"""
+
+import collections
+import logging
+
+import ffc.uflacs.language.cnodes as L
+
+logger = logging.getLogger(__name__)
+
+# Functions without side effects that may be called from generated kernels
+_pure_functions = {
+    "sqrt", "exp", "log", "pow", "fabs", "abs", "min", "max", "fmin", "fmax", "erf", "sin",
+    "cos", "tan", "asin", "acos", "atan", "atan2", "sinh", "cosh", "tanh"
+}
+
+# Expression types worth computing once and storing in a temporary
+_compound_types = (L.Add, L.Sub, L.Mul, L.Div, L.Sum, L.Product, L.Neg, L.Call,
+                   L.Conditional)
+
+# Marker for statements with unknown side effects
+_ALL = "*"
+
+
+def optimize_cnodes(code,
+                    enable_cse=True,
+                    enable_strength_reduction=True,
+                    enable_loop_invariant_hoisting=True,
+                    scalar_type="double"):
+    """Apply optimization passes to a CNode statement, returning a new statement.
+
+    The passes are applied in the order strength reduction, common
+    subexpression elimination, loop-invariant hoisting. Temporaries
+    of floating point values are declared with type scalar_type, or
+    float if they only read variables declared float.
+    """
+    code = L.as_cstatement(code)
+    names = _NameGenerator(code, scalar_type)
+
+    if enable_strength_reduction:
+        code = _map_statement_exprs(code, _reduce_strength)
+    if enable_cse:
+        code = L.StatementList(_cse_block(_flatten(code), names))
+    if enable_loop_invariant_hoisting:
+        code = L.StatementList(_hoist_block(_flatten(code), names))
+
+    return L.as_cstatement(code)
+
+
+# Expression tree utilities
+
+
+def _children(e):
+    if isinstance(e, L.UnaryOp):
+        return (e.arg, )
+    elif isinstance(e, L.BinOp):
+        return (e.lhs, e.rhs)
+    elif isinstance(e, L.NaryOp):
+        return tuple(e.args)
+    elif isinstance(e, L.ArrayAccess):
+        return e.indices
+    elif isinstance(e, L.Conditional):
+        return (e.condition, e.true, e.false)
+    elif isinstance(e, L.Call):
+        return tuple(e.arguments)
+    return ()
+
+
+def _reconstruct(e, children):
+    if isinstance(e, L.UnaryOp):
+        return type(e)(children[0])
+    elif isinstance(e, L.BinOp):
+        return type(e)(children[0], children[1])
+    elif isinstance(e, L.NaryOp):
+        return type(e)(children)
+    elif isinstance(e, L.ArrayAccess):
+        return L.ArrayAccess(e.array, children)
+    elif isinstance(e, L.Conditional):
+        return L.Conditional(*children)
+    elif isinstance(e, L.Call):
+        return L.Call(e.function, children)
+    return e
+
+
+def _is_pure(e):
+    """Check that evaluating e has no side effects."""
+    if isinstance(e, (L.AssignOp, L.PreIncrement, L.PreDecrement, L.PostIncrement,
+                      L.PostDecrement, L.New)):
+        return False
+    if isinstance(e, L.Call):
+        if not (isinstance(e.function, L.Symbol) and e.function.name in _pure_functions):
+            return False
+    return all(_is_pure(c) for c in _children(e))
+
+
+def _is_literal(e):
+    return isinstance(e, (L.LiteralInt, L.LiteralFloat))
+
+
+def _is_compound(e):
+    if isinstance(e, L.Neg):
+        return _is_compound(e.arg)
+    return isinstance(e, _compound_types)
+
+
+def _reads(e, reads=None):
+    """Return set of (name, literal indices or None) read by expression e."""
+    if reads is None:
+        reads = set()
+    if isinstance(e, L.Symbol):
+        reads.add((e.name, None))
+    elif isinstance(e, L.ArrayAccess):
+        if all(isinstance(i, L.LiteralInt) for i in e.indices):
+            reads.add((e.array.name, tuple(i.value for i in e.indices)))
+        else:
+            reads.add((e.array.name, None))
+            for i in e.indices:
+                _reads(i, reads)
+    elif isinstance(e, L.Call):
+        for arg in e.arguments:
+            _reads(arg, reads)
+    else:
+        for c in _children(e):
+            _reads(c, reads)
+    return reads
+
+
+def _write_key(lhs):
+    if isinstance(lhs, L.Symbol):
+        return (lhs.name, None)
+    elif isinstance(lhs, L.ArrayAccess):
+        if all(isinstance(i, L.LiteralInt) for i in lhs.indices):
+            return (lhs.array.name, tuple(i.value for i in lhs.indices))
+        return (lhs.array.name, None)
+    return _ALL
+
+
+def _writes(s):
+    """Return set of (name, literal indices or None) written by statement s,
+    or _ALL if unknown."""
+    if isinstance(s, (L.Comment, L.Pragma)):
+        return set()
+    elif isinstance(s, (L.VariableDecl, L.ArrayDecl)):
+        return {(s.symbol.name, None)}
+    elif isinstance(s, L.Statement):
+        e = s.expr
+        if isinstance(e, L.AssignOp) and _is_pure(e.rhs):
+            key = _write_key(e.lhs)
+        elif isinstance(e, (L.PreIncrement, L.PreDecrement, L.PostIncrement, L.PostDecrement)):
+            key = _write_key(e.arg)
+        else:
+            key = _ALL
+        return _ALL if key is _ALL else {key}
+    elif isinstance(s, (L.StatementList, L.Scope, L.ForRange)):
+        if isinstance(s, L.StatementList):
+            statements = s.statements
+        else:
+            statements = [s.body]
+        writes = set()
+        if isinstance(s, L.ForRange):
+            writes.add((s.index.name, None))
+        for st in statements:
+            w = _writes(st)
+            if w is _ALL:
+                return _ALL
+            writes.update(w)
+        return writes
+    return _ALL
+
+
+# Statement tree utilities
+
+
+def _flatten(s):
+    """Return list of statements with nested statement lists expanded."""
+    if isinstance(s, L.StatementList):
+        return [t for st in s.statements for t in _flatten(st)]
+    return [s]
+
+
+def _expr_roots(s):
+    """Return list of (expression, is_index) read by a simple statement,
+    or None if the statement is not a simple statement."""
+    if isinstance(s, L.VariableDecl):
+        if s.value is None:
+            return []
+        return [(s.value, "int" in s.typename)]
+    elif isinstance(s, L.Statement) and isinstance(s.expr, L.AssignOp):
+        roots = []
+        if isinstance(s.expr.lhs, L.ArrayAccess):
+            roots += [(i, True) for i in s.expr.lhs.indices]
+        roots.append((s.expr.rhs, False))
+        return roots
+    return None
+
+
+def _rebuild_statement(s, exprs):
+    """Rebuild simple statement s with new expressions in the order given by _expr_roots."""
+    if isinstance(s, L.VariableDecl):
+        if s.value is None:
+            return s
+        return L.VariableDecl(s.typename, s.symbol, exprs[0])
+    lhs = s.expr.lhs
+    if isinstance(lhs, L.ArrayAccess):
+        n = len(lhs.indices)
+        lhs = L.ArrayAccess(lhs.array, exprs[:n])
+        exprs = exprs[n:]
+    return L.Statement(type(s.expr)(lhs, exprs[0]))
+
+
+def _rebuild_loop(loop, body):
+    return L.ForRange(
+        loop.index,
+        loop.begin,
+        loop.end,
+        body=body,
+        index_type=loop.index_type,
+        vectorize=loop.pragma is not None)
+
+
+def _map_statement_exprs(s, function):
+    """Apply function(expr, is_index) to all expressions of simple statements in s."""
+    if isinstance(s, L.StatementList):
+        return L.StatementList([_map_statement_exprs(st, function) for st in s.statements])
+    elif isinstance(s, L.Scope):
+        return L.Scope(_map_statement_exprs(s.body, function))
+    elif isinstance(s, L.ForRange):
+        return _rebuild_loop(s, _map_statement_exprs(s.body, function))
+    roots = _expr_roots(s)
+    if not roots or not all(_is_pure(e) for e, is_index in roots):
+        return s
+    return _rebuild_statement(s, [function(e, is_index) for e, is_index in roots])
+
+
+class _NameGenerator(object):
+    """Generates names for temporaries not clashing with names in code."""
+
+    def __init__(self, code, scalar_type="double"):
+        self.scalar_type = scalar_type
+        self.typenames = {}
+        self.taken = set()
+        self.declared = collections.Counter()
+        self._collect(code)
+        self.counters = collections.defaultdict(int)
+
+    def _collect(self, s):
+        if isinstance(s, L.StatementList):
+            for st in s.statements:
+                self._collect(st)
+        elif isinstance(s, L.Scope):
+            self._collect(s.body)
+        elif isinstance(s, L.ForRange):
+            self.declared[s.index.name] += 1
+            self._collect(s.body)
+        elif isinstance(s, (L.VariableDecl, L.ArrayDecl)):
+            self.declared[s.symbol.name] += 1
+            self.typenames[s.symbol.name] = s.typename
+        elif isinstance(s, L.VerbatimStatement):
+            self.taken.update(s.codestring.replace("(", " ").replace("[", " ").split())
+        roots = _expr_roots(s)
+        if roots:
+            for e, is_index in roots:
+                self.taken.update(name for name, indices in _reads(e))
+        self.taken.update(self.declared)
+
+    def new(self, basename):
+        while True:
+            name = "%s%d" % (basename, self.counters[basename])
+            self.counters[basename] += 1
+            if name not in self.taken:
+                self.taken.add(name)
+                self.declared[name] += 1
+                return L.Symbol(name)
+
+    def declare(self, symbol, e, is_index):
+        """Return declaration of temporary symbol with value e."""
+        if is_index:
+            typename = "const int"
+        else:
+            # Floating point variables read by e, ignoring arguments
+            types = [self.typenames.get(name, "") for name, indices in _reads(e)]
+            types = [t for t in types if "float" in t or "double" in t]
+            if types and all("float" in t for t in types):
+                typename = "const float"
+            else:
+                typename = "const " + self.scalar_type
+        self.typenames[symbol.name] = typename
+        return L.VariableDecl(typename, symbol, e)
+
+
+# Strength reduction
+
+
+def _is_minus_one(e):
+    return L.is_negative_one_cexpr(e)
+
+
+def _is_power_of_two(value):
+    if value == 0.0:
+        return False
+    m = abs(value)
+    while m >= 2.0:
+        m /= 2.0
+    while m < 1.0:
+        m *= 2.0
+    return m == 1.0
+
+
+def _reduce_strength(e, is_index):
+    """Replace expensive operations by cheaper equivalent ones."""
+    if isinstance(e, L.Conditional):
+        # Reduce within condition and both branches without mixing them
+        return L.Conditional(*[_reduce_strength(c, False) for c in _children(e)])
+    children = _children(e)
+    if isinstance(e, L.ArrayAccess):
+        children = [_reduce_strength(c, True) for c in children]
+    else:
+        children = [_reduce_strength(c, is_index) for c in children]
+    if children:
+        e = _reconstruct(e, children)
+
+    if isinstance(e, L.Neg):
+        if isinstance(e.arg, L.Neg):
+            return e.arg.arg
+        if _is_literal(e.arg):
+            return -e.arg
+    elif isinstance(e, (L.Mul, L.Product)):
+        # Strip multiplications by 1 and -1, sign changes are exact
+        factors = [f for f in _children(e) if not L.is_one_cexpr(f)]
+        negate = False
+        if not is_index:
+            negate = sum(1 for f in factors if _is_minus_one(f)) % 2 == 1
+            factors = [f for f in factors if not _is_minus_one(f)]
+        if not factors:
+            r = L.LiteralFloat(1.0) if not is_index else L.LiteralInt(1)
+        elif len(factors) == 1:
+            r = factors[0]
+        elif len(factors) == 2:
+            r = L.Mul(factors[0], factors[1])
+        else:
+            r = L.Product(factors)
+        return L.Neg(r) if negate else r
+    elif isinstance(e, (L.Add, L.Sum)):
+        # a + -b -> a - b
+        terms = _children(e)
+        if any(isinstance(t, L.Neg) for t in terms[1:]):
+            r = terms[0]
+            for t in terms[1:]:
+                r = L.Sub(r, t.arg) if isinstance(t, L.Neg) else L.Add(r, t)
+            return r
+    elif isinstance(e, L.Sub):
+        # a - -b -> a + b
+        if isinstance(e.rhs, L.Neg):
+            return L.Add(e.lhs, e.rhs.arg)
+    elif isinstance(e, L.Div):
+        # Division by power of two is exactly a multiplication by its inverse
+        if (not is_index and isinstance(e.rhs, L.LiteralFloat)
+                and _is_power_of_two(e.rhs.value)):
+            return L.Mul(e.lhs, L.LiteralFloat(1.0 / e.rhs.value))
+    elif isinstance(e, L.Call) and e.function == L.Symbol("pow"):
+        # Expand powers with small integer exponents of simple operands
+        base, exponent = e.arguments
+        if (isinstance(base, (L.Symbol, L.ArrayAccess)) and _is_literal(exponent)
+                and float(exponent.value).is_integer()):
+            n = int(exponent.value)
+            if n == 1:
+                return base
+            elif n == 2:
+                return L.Mul(base, base)
+            elif n == 3:
+                return L.Mul(L.Mul(base, base), base)
+            elif n == -1:
+                return L.Div(L.LiteralFloat(1.0), base)
+    return e
+
+
+# Common subexpression elimination
+
+
+class _Versions(object):
+    """Tracks modifications to symbols and literal array elements."""
+
+    def __init__(self):
+        self.v = collections.defaultdict(int)
+        self.all = 0
+
+    def key(self, reads):
+        vk = [self.all]
+        for name, indices in sorted(reads, key=repr):
+            if indices is None:
+                vk.append((name, self.v[(name, )]))
+            else:
+                vk.append((name, indices, self.v[(name, indices)], self.v[(name, None)]))
+        return tuple(vk)
+
+    def update(self, writes):
+        if writes is _ALL:
+            self.all += 1
+            return
+        for name, indices in writes:
+            self.v[(name, )] += 1
+            self.v[(name, indices)] += 1
+
+
+def _cse_candidates(e, is_index, versions, found):
+    """Collect (node, key) for compound pure subexpressions of e."""
+    if not _is_pure(e):
+        return
+    if _is_compound(e):
+        key = (e.ce_format(), is_index, versions.key(_reads(e)))
+        found.append((e, key))
+    if isinstance(e, L.Conditional):
+        # Don't evaluate branch subexpressions unconditionally
+        _cse_candidates(e.condition, False, versions, found)
+        return
+    for c in _children(e):
+        _cse_candidates(c, is_index or isinstance(e, L.ArrayAccess), versions, found)
+
+
+def _cse_block(statements, names):
+    """Eliminate common subexpressions among the simple statements of a block."""
+    # Recurse into nested blocks first
+    statements = [_cse_statement(s, names) for s in statements]
+
+    # Count occurrences of each subexpression, keyed by its value state
+    counts = collections.Counter()
+    versions = _Versions()
+    for s in statements:
+        roots = _expr_roots(s)
+        if roots:
+            found = []
+            for e, is_index in roots:
+                _cse_candidates(e, is_index, versions, found)
+            counts.update(key for e, key in found)
+        versions.update(_writes(s))
+
+    selected = {key for key, count in counts.items() if count > 1}
+    if not selected:
+        return statements
+
+    # Replace selected subexpressions with temporaries
+    temps = {}
+    values = {}
+    uses = collections.Counter()
+    result = []
+    versions = _Versions()
+
+    def rewrite(e, is_index, decls):
+        if _is_pure(e) and _is_compound(e):
+            key = (e.ce_format(), is_index, versions.key(_reads(e)))
+            if key in selected:
+                t = temps.get(key)
+                if t is None:
+                    value = _rewrite_children(e, is_index, decls)
+                    t = names.new("cse")
+                    temps[key] = t
+                    values[t.name] = value
+                    decls.append(names.declare(t, value, is_index))
+                uses[t.name] += 1
+                return t
+        return _rewrite_children(e, is_index, decls)
+
+    def _rewrite_children(e, is_index, decls):
+        if isinstance(e, L.Conditional):
+            return L.Conditional(rewrite(e.condition, False, decls), e.true, e.false)
+        children = _children(e)
+        if not children:
+            return e
+        child_is_index = is_index or isinstance(e, L.ArrayAccess)
+        return _reconstruct(e, [rewrite(c, child_is_index, decls) for c in children])
+
+    for s in statements:
+        roots = _expr_roots(s)
+        if roots and all(_is_pure(e) for e, is_index in roots):
+            decls = []
+            exprs = [rewrite(e, is_index, decls) for e, is_index in roots]
+            result += decls
+            result.append(_rebuild_statement(s, exprs))
+        else:
+            result.append(s)
+        versions.update(_writes(s))
+
+    # Inline temporaries that ended up being used only once
+    single = {name for name, count in uses.items() if count == 1}
+    if single:
+        result = _inline_temporaries(result, single, values)
+    return result
+
+
+def _inline_temporaries(statements, single, values):
+    def inline(e, is_index):
+        if isinstance(e, L.Symbol) and e.name in single:
+            return inline(values[e.name], is_index)
+        children = _children(e)
+        if not children:
+            return e
+        return _reconstruct(e, [inline(c, is_index) for c in children])
+
+    result = []
+    for s in statements:
+        if isinstance(s, L.VariableDecl) and s.symbol.name in single:
+            continue
+        roots = _expr_roots(s)
+        if roots:
+            s = _rebuild_statement(s, [inline(e, is_index) for e, is_index in roots])
+        result.append(s)
+    return result
+
+
+def _cse_statement(s, names):
+    if isinstance(s, L.Scope):
+        return L.Scope(_cse_block(_flatten(s.body), names))
+    elif isinstance(s, L.ForRange):
+        return _rebuild_loop(s, _cse_block(_flatten(s.body), names))
+    return s
+
+
+# Loop-invariant code motion
+
+
+def _hoist_block(statements, names):
+    """Hoist loop invariant expressions out of all loops in a block."""
+    result = []
+    for s in statements:
+        if isinstance(s, L.ForRange):
+            result += _hoist_loop(s, names)
+        elif isinstance(s, L.Scope):
+            result.append(L.Scope(_hoist_block(_flatten(s.body), names)))
+        else:
+            result.append(s)
+    return result
+
+
+def _is_hoistable(e, variant):
+    """Check that e is worth computing outside of a loop where the variant symbols change."""
+    if isinstance(e, L.ArrayAccess):
+        worth = not all(_is_literal(i) for i in e.indices)
+    else:
+        worth = _is_compound(e)
+    return (worth and _is_pure(e) and not any(name in variant for name, indices in _reads(e)))
+
+
+def _hoist_loop(loop, names):
+    """Hoist invariant expressions out of loop, returning list of statements
+    to replace it with."""
+    body = _hoist_block(_flatten(loop.body), names)
+
+    # Only move code out of loops known to execute at least once
+    if not (isinstance(loop.begin, L.LiteralInt) and isinstance(loop.end, L.LiteralInt)
+            and loop.end.value > loop.begin.value):
+        return [_rebuild_loop(loop, body)]
+
+    writes = _writes(L.StatementList(body))
+    if writes is _ALL:
+        return [_rebuild_loop(loop, body)]
+    variant = {name for name, indices in writes}
+    variant.add(loop.index.name)
+
+    hoisted = []
+    temps = {}
+
+    def hoist(e, is_index):
+        if _is_hoistable(e, variant):
+            key = (e.ce_format(), is_index)
+            t = temps.get(key)
+            if t is None:
+                t = names.new("inv")
+                temps[key] = t
+                hoisted.append(names.declare(t, e, is_index))
+            return t
+        if isinstance(e, L.Conditional):
+            return L.Conditional(hoist(e.condition, False), e.true, e.false)
+        children = _children(e)
+        if not children:
+            return e
+        if isinstance(e, (L.Product, L.Sum)):
+            # Hoist an invariant leading part of the operands, without reordering
+            n = 0
+            while n < len(children) and not any(name in variant
+                                                for name, indices in _reads(children[n])):
+                n += 1
+            if n > 1 and all(_is_pure(c) for c in children[:n]):
+                head = hoist(type(e)(children[:n]), is_index)
+                children = [head] + [hoist(c, is_index) for c in children[n:]]
+                if len(children) == 2:
+                    op = L.Mul if isinstance(e, L.Product) else L.Add
+                    return op(children[0], children[1])
+                return type(e)(children)
+        child_is_index = is_index or isinstance(e, L.ArrayAccess)
+        return _reconstruct(e, [hoist(c, child_is_index) for c in children])
+
+    new_body = []
+    for s in body:
+        roots = _expr_roots(s)
+        if not roots or not all(_is_pure(e) for e, is_index in roots):
+            new_body.append(s)
+        elif (isinstance(s, L.VariableDecl) and s.typename.startswith("const")
+              and names.declared[s.symbol.name] == 1
+              and not any(name in variant for name, indices in _reads(s.value))):
+            # Move the entire constant definition out of the loop
+            hoisted.append(s)
+            variant.discard(s.symbol.name)
+        else:
+            new_body.append(_rebuild_statement(s, [hoist(e, is_index) for e, is_index in roots]))
+
+    return hoisted + [_rebuild_loop(loop, new_body)]
+
+
+# Single precision
+
+
+def use_float_literals(code):
+    """Give the floating point literals in expressions of code the
+    single precision suffix, keeping arithmetic with float variables
+    in single precision, returning a new statement."""
+    def mark(e, is_index):
+        if isinstance(e, L.LiteralFloat):
+            return L.LiteralFloat(e.value, "f")
+        children = _children(e)
+        if not children:
+            return e
+        return _reconstruct(e, [mark(c, is_index) for c in children])
+
+    return _map_statement_exprs(L.as_cstatement(code), mark)
@@ -12,7 +12,10 @@ import logging
 from ffc.backends.ffc.backend import FFCBackend
 from ffc.representationutils import initialize_integral_code
 from ffc.uflacs.integralgenerator import IntegralGenerator
+from ffc.uflacs.language.cnodes_optimization import (optimize_cnodes,
+                                                     use_float_literals)
 from ffc.uflacs.language.format_lines import format_indented_lines
+from ffc.uflacs.workspace import move_arrays_to_workspace
 
 logger = logging.getLogger(__name__)
 
@@ -34,12 +37,57 @@ def generate_integral_code(ir, prefix, parameters):
     # Generate code ast for the tabulate_tensor body
     parts = ig.generate()
 
+    # Clean up the code ast with optimization passes the C compiler
+    # can't always do itself, e.g. due to potential pointer aliasing
+    p = ir["params"]
+    if p["enable_cse"] or p["enable_strength_reduction"] or p["enable_loop_invariant_hoisting"]:
+        parts = optimize_cnodes(
+            parts,
+            enable_cse=p["enable_cse"],
+            enable_strength_reduction=p["enable_strength_reduction"],
+            enable_loop_invariant_hoisting=p["enable_loop_invariant_hoisting"],
+            scalar_type=backend.geometry_type)
+
+    # Keep single precision arithmetic in float, unless the geometry is
+    # computed in double
+    if backend.geometry_type == "float":
+        parts = use_float_literals(parts)
+
     # Format code as string
     body = format_indented_lines(parts.cs_format(precision), 1)
 
+    # Generate a variant reading the cell constant geometry of affine
+    # simplex cells from caller provided ufc_affine_geometry arguments,
+    # while the other variants compute it first
+    geometry_parts = ig.generate_affine_geometry()
+    if ir["affine_geometry"]:
+        geometry_body = body
+    else:
+        geometry_body = None
+    if geometry_parts:
+        geometry_code = format_indented_lines(
+            backend.language.StatementList(geometry_parts).cs_format(precision), 1)
+        body = geometry_code + "\n" + body
+    else:
+        geometry_code = ""
+
+    # Generate a variant with temporary arrays placed in a caller
+    # provided workspace, aligned to 64 bytes
+    if parameters["generate_tabulate_tensor_workspace"]:
+        ws_parts, workspace_size = move_arrays_to_workspace(parts, backend.symbols.workspace(), 8)
+        ws_body = format_indented_lines(ws_parts.cs_format(precision), 1)
+        if geometry_code:
+            ws_body = geometry_code + "\n" + ws_body
+    else:
+        ws_body, workspace_size = None, 0
+
     # Generate generic ffc code snippets and add uflacs specific parts
     code = initialize_integral_code(ir, prefix, parameters)
     code["tabulate_tensor"] = body
+    code["tabulate_tensor_workspace"] = ws_body
+    code["workspace_size"] = 8 * workspace_size
+    code["tabulate_tensor_geometry"] = geometry_body
+    code["tabulate_tensor_declarations"] = "\n".join(ig.get_declarations())
     code["additional_includes_set"] = set(ig.get_includes())
     code["additional_includes_set"].update(ir.get("additional_includes_set", ()))
 
@@ -9,7 +9,7 @@ import logging
 
 from ffc.fiatinterface import create_element
 from ffc.representationutils import initialize_integral_ir
-from ffc.uflacs.build_uflacs_ir import build_uflacs_ir
+from ffc.uflacs.build_uflacs_ir import build_uflacs_ir, uflacs_default_parameters
 from ffc.uflacs.tools import (accumulate_integrals, collect_quadrature_rules,
                               compute_quadrature_rules)
 from ufl import custom_integral_types
@@ -76,6 +76,16 @@ def compute_integral_ir(itg_data, form_data, form_id, element_numbers, classname
     if integral_type in custom_integral_types:
         ir["fake_num_points"], = quadrature_rules.keys()
 
+    # Store the coordinate element, for mapping runtime points to the
+    # reference cell in custom integrals, computing the affine geometry
+    # and choosing the type of geometry tables
+    ir["coordinate_element"] = itg_data.domain.ufl_coordinate_element()
+
+    # Read the Jacobian determinant and inverse from a ufc_affine_geometry,
+    # matching the geometry types preserved in analysis
+    ir["affine_geometry"] = bool(parameters["generate_tabulate_tensor_geometry"]
+                                 and itg_data.domain.is_piecewise_linear_simplex_domain())
+
     # Group and accumulate integrals on the format { num_points: integral data }
     sorted_integrals = accumulate_integrals(itg_data, quadrature_rule_sizes)
 
@@ -99,10 +109,19 @@ def compute_integral_ir(itg_data, form_data, form_id, element_numbers, classname
         for num_points in sorted(sorted_integrals)
     }
 
+    # Allow uflacs parameters to be set per integral in the integral
+    # metadata, e.g. dx(metadata={"gemm_block_min_size": 64})
+    uflacs_parameter_names = uflacs_default_parameters(False).keys()
+    integral_parameters = dict(parameters)
+    for integral in itg_data.integrals:
+        for key, value in integral.metadata().items():
+            if key in uflacs_parameter_names:
+                integral_parameters[key] = value
+
     # Build the more uflacs-specific intermediate representation
     uflacs_ir = build_uflacs_ir(itg_data.domain.ufl_cell(), itg_data.integral_type,
                                 ir["entitytype"], integrands, ir["tensor_shape"],
-                                coefficient_numbering, quadrature_rules, parameters)
+                                coefficient_numbering, quadrature_rules, integral_parameters)
     ir.update(uflacs_ir)
 
     return ir
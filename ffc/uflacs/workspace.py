@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""Placement of the temporary arrays of generated kernels in a caller
+provided workspace."""
+
+import ffc.uflacs.language.cnodes as L
+
+
+def move_arrays_to_workspace(code, workspace, alignment=8):
+    """Replace declarations of local double and float arrays in code
+    with pointers into a caller provided workspace array of doubles.
+
+    Each array is placed at an offset into the workspace rounded up
+    to a multiple of alignment doubles, and arrays declared with zero
+    initial values are zeroed with memset where they were declared.
+    Arrays with other initial values are left on the stack. Float
+    arrays take half a double per value.
+
+    Returns the new statement and the number of doubles needed in
+    the workspace.
+    """
+    workspace = L.as_symbol(workspace)
+    offsets = []
+
+    def allocate(size):
+        offset = sum(offsets)
+        offsets.append(-(-size // alignment) * alignment)
+        return offset
+
+    def move(s):
+        if isinstance(s, L.StatementList):
+            return L.StatementList([move(st) for st in s.statements])
+        elif isinstance(s, L.Scope):
+            return L.Scope(move(s.body))
+        elif isinstance(s, L.ForRange):
+            return L.ForRange(s.index, s.begin, s.end, body=move(s.body),
+                              index_type=s.index_type, vectorize=s.pragma is not None)
+        elif isinstance(s, (L.If, L.ElseIf)):
+            return type(s)(s.condition, move(s.body))
+        elif isinstance(s, L.Else):
+            return L.Else(move(s.body))
+        elif isinstance(s, L.Switch):
+            cases = [(value, move(body)) for value, body in s.cases]
+            default = None if s.default is None else move(s.default)
+            return L.Switch(s.arg, cases, default, s.autobreak, s.autoscope)
+        elif (isinstance(s, L.ArrayDecl) and s.typename in ("double", "float")
+              and (s.values is None or L._is_zero_valued(s.values))):
+            typename = s.typename
+            sizes = L.pad_innermost_dim(s.sizes, s.padlen)
+            size = 1
+            for n in sizes:
+                size *= n
+            offset = allocate(size if typename == "double" else -(-size // 2))
+            address = workspace + offset if offset else workspace
+            if len(sizes) == 1 and typename == "double":
+                decl = L.VariableDecl("double* restrict", s.symbol, address)
+            else:
+                # Pointer to array, to keep multidimensional indexing
+                brackets = "".join("[%d]" % n for n in sizes[1:])
+                decl = L.VerbatimStatement("%s (* restrict %s)%s = (%s (*)%s)(%s);" %
+                                           (typename, s.symbol.name, brackets, typename,
+                                            brackets, address.ce_format()))
+            if s.values is None:
+                return decl
+            nbytes = L.Mul(size, L.Call("sizeof", L.Symbol(typename)))
+            zero = L.Call("memset", (s.symbol, 0, nbytes))
+            return L.StatementList([decl, zero])
+        return s
+
+    code = move(L.as_cstatement(code))
+    return code, sum(offsets)
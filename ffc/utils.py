@@ -5,6 +5,7 @@
 #
 # SPDX-License-Identifier:    LGPL-3.0-or-later
 
+import concurrent.futures
 import logging
 
 from ffc import FFCError
@@ -39,3 +40,23 @@ def compute_permutations(k, n, skip=[]):
                 permutations += [(i, ) + p]
 
     return permutations
+
+
+def _apply(function, args):
+    return function(*args)
+
+
+def parallel_apply(tasks, num_workers):
+    """Return [function(*args) for function, args in tasks], computed by
+    a pool of num_workers processes if num_workers > 1.
+
+    The functions, their arguments and results must be picklable. The
+    results are in the order of tasks, independent of the number of
+    workers.
+    """
+    tasks = list(tasks)
+    num_workers = min(int(num_workers or 0), len(tasks))
+    if num_workers <= 1:
+        return [function(*args) for function, args in tasks]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as pool:
+        return list(pool.map(_apply, *zip(*tasks)))
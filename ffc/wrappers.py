@@ -76,7 +76,7 @@ def _encapsule_forms(prefix, object_names, classnames, form_data, element_map):
 
         name = object_names.get(id(form.original_form), "%d" % i)
         coefficient_names = [
-            object_names.get(id(obj), "w%d" % j) for j, obj in enumerate(form.reduced_coefficients)
+            object_names.get(id(obj), "w%d" % j) for j, obj in enumerate(form.reduced_original_coefficients)
         ]
         ufc_form_name = classnames["forms"][i]
         ufc_elements = [classnames["elements"][j] for j in element_numbers]
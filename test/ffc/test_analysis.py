@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""Tests of automatic quadrature degree selection, form data caching
+in analysis, and sharing of representations by structurally identical
+forms."""
+
+import json
+
+import pytest
+
+import ufl
+from ffc.analysis import (_element_degree, analysis_cache_info, analyze_forms, canonicalize_form,
+                          clear_analysis_cache, write_quadrature_report)
+from ffc.compiler import compile_form
+from ffc.parameters import validate_parameters
+from ffc.representation import clear_ir_cache, ir_cache_info
+
+
+def nonlinear_form(degree=2):
+    element = ufl.VectorElement("Lagrange", ufl.tetrahedron, degree)
+    u, v = ufl.Coefficient(element), ufl.TestFunction(element)
+    F = ufl.Identity(3) + ufl.grad(u)
+    L = ufl.exp(ufl.tr(F.T * F)) / ufl.det(F) * ufl.inner(F, ufl.grad(v)) * ufl.dx \
+        + ufl.inner(u, v) * ufl.ds
+    return ufl.derivative(L, u)
+
+
+def quadrature_decisions(form, **parameters):
+    form_datas, _, _, _ = analyze_forms([form], validate_parameters(parameters))
+    return {d["integral_type"]: d for d in form_datas[0].quadrature_decisions}
+
+
+def test_quadrature_degree_caps():
+    a = nonlinear_form()
+    reference = quadrature_decisions(a)
+    assert reference["cell"]["degree"] == reference["cell"]["estimated_degree"]
+    assert reference["cell"]["caps"] == []
+    estimated = reference["cell"]["estimated_degree"]
+    assert estimated > 8
+
+    # Only the cell integral has non-polynomial operators
+    decisions = quadrature_decisions(a, nonpolynomial_quadrature_degree=6)
+    assert decisions["cell"]["degree"] == 6
+    assert decisions["cell"]["caps"] == [{"policy": "nonpolynomial_quadrature_degree", "degree": 6}]
+    assert decisions["exterior_facet"]["degree"] == reference["exterior_facet"]["degree"]
+
+    decisions = quadrature_decisions(a, max_quadrature_degree="triangle:2,tetrahedron:5")
+    assert decisions["cell"]["degree"] == 5
+    assert decisions["exterior_facet"]["degree"] == min(5, reference["exterior_facet"]["degree"])
+    assert quadrature_decisions(a, max_quadrature_degree=3)["cell"]["degree"] == 3
+
+    # Explicit degrees are not capped
+    decisions = quadrature_decisions(a, max_quadrature_degree=3, quadrature_degree=10)
+    assert decisions["cell"]["degree"] == 10
+    assert decisions["cell"]["caps"] == []
+
+
+@pytest.mark.parametrize("budget", [20000, 5000, 1])
+def test_quadrature_cost_budget(budget):
+    a = nonlinear_form()
+    decisions = quadrature_decisions(a, quadrature_cost_budget=budget, quadrature_report="report")
+    cell = decisions["cell"]
+    if cell["caps"]:
+        assert cell["caps"][-1]["policy"] == "quadrature_cost_budget"
+    # Within budget, unless at the degree of the argument product
+    assert cell["cost"] <= budget or cell["degree"] == 4
+    assert cell["cost"] == cell["num_points"] * 30**2
+
+
+def test_quadrature_cost_budget_custom_integral():
+    element = ufl.FiniteElement("Lagrange", ufl.triangle, 2)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(element)
+    a = ufl.exp(c) * u * v * ufl.dc
+    decisions = quadrature_decisions(a, quadrature_cost_budget=500)
+    assert decisions["custom"]["caps"] == []
+    compile_form(a, parameters={"quadrature_cost_budget": 500})
+
+
+def test_quadrature_cost_budget_element_degree():
+    # The lowest degree under a budget is the sum of these over the arguments
+    P2 = ufl.FiniteElement("Lagrange", ufl.interval, 2)
+    DG1 = ufl.FiniteElement("Discontinuous Lagrange", ufl.interval, 1)
+    assert _element_degree(ufl.TensorProductElement(P2, DG1)) == 2
+    assert _element_degree(ufl.FiniteElement("Real", ufl.triangle, None)) == 0
+    assert _element_degree(ufl.FiniteElement("Lagrange", ufl.triangle, 3)) == 3
+
+
+def test_quadrature_report(tmpdir):
+    a = nonlinear_form()
+    parameters = validate_parameters({"max_quadrature_degree": 5, "quadrature_report": "report"})
+    form_datas, _, _, _ = analyze_forms([a, a], parameters)
+    filename = str(tmpdir.join("report.json"))
+    write_quadrature_report(form_datas, filename)
+    with open(filename) as f:
+        report = json.load(f)
+    assert [(r["form"], r["integral_type"]) for r in report] == [
+        (0, "cell"), (0, "exterior_facet"), (1, "cell"), (1, "exterior_facet")]
+    assert all(r["degree"] <= 5 and r["num_points"] > 0 for r in report)
+
+
+def test_analysis_cache():
+    clear_analysis_cache()
+    a = nonlinear_form()
+    reference = quadrature_decisions(a)
+    assert analysis_cache_info()["misses"] == 1
+
+    # Preprocessing is shared by parameter sets, metadata is not
+    decisions = quadrature_decisions(a, max_quadrature_degree=3, scalar_type="float")
+    assert decisions["cell"]["degree"] == 3
+    assert quadrature_decisions(a) == reference
+    info = analysis_cache_info()
+    assert (info["hits"], info["misses"], info["size"]) == (2, 1, 1)
+    assert info["bytes"] > 0
+
+    # Same structure, different coefficient and mesh objects
+    assert quadrature_decisions(nonlinear_form()) == reference
+    assert analysis_cache_info()["hits"] == 3
+
+    # Least recently used forms are evicted
+    for degree in (1, 2, 3):
+        quadrature_decisions(nonlinear_form(degree), analysis_cache_size=2)
+    assert analysis_cache_info()["size"] == 2
+    quadrature_decisions(a, analysis_cache_size=0)
+    assert analysis_cache_info()["misses"] == 4
+    clear_analysis_cache()
+
+
+def study_form(k=2.0, degree=1, swap_coefficients=False, swap_arguments=False, subdomain=0,
+               quadrature_degree=2):
+    mesh = ufl.Mesh(ufl.VectorElement("Lagrange", ufl.triangle, 1))
+    V = ufl.FunctionSpace(mesh, ufl.FiniteElement("Lagrange", ufl.triangle, degree))
+    u, v = ufl.TrialFunction(V), ufl.TestFunction(V)
+    f, g = ufl.Coefficient(V), ufl.Coefficient(V)
+    c = ufl.Constant(mesh)
+    if swap_coefficients:
+        f, g = g, f
+    if swap_arguments:
+        u, v = v, u
+    dx = ufl.dx(subdomain, domain=mesh, degree=quadrature_degree)
+    return (c * f * u.dx(0) * v + k * g * ufl.inner(ufl.grad(u), ufl.grad(v))) * dx
+
+
+def test_canonical_form():
+    a, b = study_form(), study_form()
+    assert not a.equals(b)
+    canonical_a, coefficients = canonicalize_form(a)
+    assert canonical_a.equals(canonicalize_form(b)[0])
+    assert canonical_a.signature() == a.signature()
+    assert sorted(coefficients.values(), key=lambda f: f.count()) == list(a.coefficients())
+
+    # Forms are named by the original coefficients
+    clear_ir_cache()
+    for form in (a, b):
+        f, g, c = form.coefficients()
+        names = {id(form): "a", id(f): "f%d" % f.count(), id(c): "c%d" % c.count()}
+        code_h, code_c = compile_form(form, names, "Study", {"format": "dolfin"})
+        assert all("CoefficientSpace_" + names[id(obj)] in code_h for obj in (f, c))
+    assert ir_cache_info()["hits"] == 1
+
+
+@pytest.mark.parametrize("variant", [{"k": 3.0}, {"degree": 2}, {"swap_coefficients": True},
+                                     {"swap_arguments": True}, {"subdomain": 1},
+                                     {"quadrature_degree": 3}])
+def test_no_false_sharing(variant):
+    clear_analysis_cache()
+    clear_ir_cache()
+    reference = compile_form(study_form(), prefix="Study")
+    assert compile_form(study_form(), prefix="Study") == reference
+    assert (ir_cache_info()["hits"], analysis_cache_info()["hits"]) == (1, 1)
+
+    form = study_form(**variant)
+    assert not canonicalize_form(form)[0].equals(canonicalize_form(study_form())[0])
+    assert compile_form(form, prefix="Study") != reference
+    assert (ir_cache_info()["hits"], analysis_cache_info()["hits"]) == (1, 1)
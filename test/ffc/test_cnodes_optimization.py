@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""Tests of optimization passes over the CNode AST."""
+
+import ffc.uflacs.language.cnodes as L
+from ffc.uflacs.language.cnodes_optimization import optimize_cnodes
+
+
+def optimize(code, **kwargs):
+    return str(optimize_cnodes(code, **kwargs)).split("\n")
+
+
+def test_strength_reduction():
+    x = L.Symbol("x")
+    y = L.Symbol("y")
+    sp = L.Symbol("sp")
+    code = [
+        L.Assign(sp[0], x + L.Mul(-1, y)),
+        L.Assign(sp[1], L.Call("pow", (sp[0], 2))),
+        L.Assign(sp[2], L.Div(x, 4.0)),
+    ]
+    assert optimize(code) == [
+        "sp[0] = x - y;",
+        "sp[1] = sp[0] * sp[0];",
+        "sp[2] = x * 0.25;",
+    ]
+
+
+def test_common_subexpressions():
+    x = L.Symbol("x")
+    FE = L.Symbol("FE")
+    code = [
+        L.VariableDecl("const double", "a", x * FE[0] + 1.0),
+        L.VariableDecl("const double", "b", x * FE[0] + 2.0),
+        L.Assign(FE[0], 3.0),
+        L.VariableDecl("const double", "c", x * FE[0]),
+    ]
+    assert optimize(code) == [
+        "const double cse0 = x * FE[0];",
+        "const double a = cse0 + 1.0;",
+        "const double b = cse0 + 2.0;",
+        "FE[0] = 3.0;",
+        "const double c = x * FE[0];",
+    ]
+
+
+def test_loop_invariant_hoisting():
+    A = L.Symbol("A")
+    fw = L.Symbol("fw")
+    FE = L.Symbol("FE")
+    i = L.Symbol("i")
+    j = L.Symbol("j")
+    body = L.AssignAdd(A[5 * i + j], L.Product([fw, FE[i], FE[j]]))
+    code = L.ForRange(i, 0, 5, body=L.ForRange(j, 0, 5, body=body))
+    assert optimize(code) == [
+        "for (int i = 0; i < 5; ++i)",
+        "{",
+        "    const int inv0 = 5 * i;",
+        "    const double inv1 = fw * FE[i];",
+        "    for (int j = 0; j < 5; ++j)",
+        "        A[inv0 + j] += inv1 * FE[j];",
+        "}",
+    ]
+
+
+def test_no_hoisting_of_modified_values():
+    B = L.Symbol("B")
+    t = L.Symbol("t")
+    i = L.Symbol("i")
+    body = [L.Assign(t[0], B[i]), L.AssignAdd(B[i], t[0] * t[1])]
+    code = L.ForRange(i, 0, 4, body=body)
+    assert optimize(code) == str(code).split("\n")
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""Tests of the modules imported by import ffc and by the dijitso JIT,
+and of collective JIT compilation."""
+
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import pytest
+
+jit_script = """
+import json, sys
+import ufl
+import ffc
+element = ufl.FiniteElement("Lagrange", ufl.triangle, 1)
+u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+form, module, name = ffc.jit(u * v * ufl.dx)
+print(json.dumps([name, sorted(sys.modules)]))
+"""
+
+heavy_modules = ["FIAT", "ffc.compiler", "ffc.analysis", "ffc.representation", "ffc.uflacs",
+                 "ffc.codegeneration", "ffc.backends.ufc.form"]
+
+
+def imported_modules(script, cache_dir=None):
+    env = dict(os.environ)
+    if cache_dir:
+        env["DIJITSO_CACHE_DIR"] = cache_dir
+    output = subprocess.check_output([sys.executable, "-c", script], env=env)
+    return json.loads(output.decode().splitlines()[-1])
+
+
+def test_import_ffc():
+    modules = imported_modules("import json, sys, ffc; print(json.dumps(sorted(sys.modules)))")
+    assert not set(modules) & set(heavy_modules + ["dijitso", "numpy", "ufl"])
+
+    modules = imported_modules("import json, sys, ffc; ffc.jit, ffc.main; "
+                               "print(json.dumps([ffc.supported_elements, sorted(sys.modules)]))")
+    assert "Lagrange" in modules[0] and "Morley" not in modules[0]
+
+    # The main function is not shadowed by the submodule of the same name
+    kind = imported_modules("import json, ffc.main, ffc; print(json.dumps(type(ffc.main).__name__))")
+    assert kind == "function"
+
+
+def test_cached_jit(tmpdir):
+    name, modules = imported_modules(jit_script, str(tmpdir))
+    assert set(heavy_modules) <= set(modules)
+
+    # A lookup in the cache does not import the compiler
+    cached_name, modules = imported_modules(jit_script, str(tmpdir))
+    assert cached_name == name
+    assert not set(modules) & set(heavy_modules)
+
+
+def test_jit_rejects_pgo():
+    import ufl
+    import ffc
+    from ffc.jitcompiler import FFCJitError
+    element = ufl.FiniteElement("Lagrange", ufl.triangle, 1)
+    a = ufl.TrialFunction(element) * ufl.TestFunction(element) * ufl.dx
+    with pytest.raises(FFCJitError):
+        ffc.jit(a, {"build_profile": "pgo"})
+
+
+def test_jit_split_integrals(tmpdir, monkeypatch):
+    import ctypes
+    import numpy
+    import ufl
+    import ffc
+    monkeypatch.setenv("DIJITSO_CACHE_DIR", str(tmpdir))
+    element = ufl.FiniteElement("Lagrange", ufl.triangle, 2)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(element)
+    a = sum((c**k * u * v * ufl.dx(k) for k in range(1, 4)), u * v * ufl.ds)
+
+    # The integrals built as separate objects and linked into the
+    # module compute the same element tensors
+    coordinate_dofs = numpy.array([0.1, 0.0, 1.2, 0.3, 0.2, 0.9])
+    w = numpy.linspace(1.0, 2.0, 6)
+    tensors = []
+    for parameters in ({}, {"split_integrals": True, "build_workers": 2}):
+        form, module, name = ffc.jit(a, parameters)
+        A = numpy.zeros((6, 6))
+        tabulate_tensor = getattr(module, "tabulate_tensor_{}_cell_integral_main_2".format(name))
+        tabulate_tensor(A.ctypes.data_as(ctypes.c_void_p),
+                        (ctypes.c_void_p * 1)(w.ctypes.data),
+                        coordinate_dofs.ctypes.data_as(ctypes.c_void_p), 0)
+        tensors.append(A)
+    assert numpy.abs(tensors[0]).max() > 0.0
+    assert numpy.allclose(tensors[1], tensors[0], rtol=1e-14, atol=1e-14)
+
+
+class QueueComm(object):
+    """Stand-in for an MPI communicator, broadcasting to the other
+    processes through a queue per rank."""
+
+    def __init__(self, rank, queues):
+        self.rank = rank
+        self.queues = queues
+
+    def bcast(self, obj, root=0):
+        if self.rank == root:
+            for rank, queue in enumerate(self.queues):
+                if rank != root:
+                    queue.put(obj)
+            return obj
+        return self.queues[self.rank].get()
+
+
+def collective_jit(comm, ufl_object, parameters, results):
+    import ufl
+    import ffc
+    if ufl_object is None:
+        element = ufl.FiniteElement("Lagrange", ufl.triangle, 2)
+        ufl_object = ufl.TrialFunction(element) * ufl.TestFunction(element) * ufl.dx
+    try:
+        form, module, name = ffc.jit(ufl_object, parameters, comm=comm)
+    except Exception as e:
+        results.put((comm.rank, type(e).__name__, None, None))
+    else:
+        results.put((comm.rank, name, module._name, "ffc.compiler" in sys.modules))
+
+
+def run_collective_jit(ufl_object, parameters, num_ranks=3):
+    # Spawn new processes, which have not imported the compiler
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for rank in range(num_ranks)]
+    results = context.Queue()
+    processes = [context.Process(target=collective_jit,
+                                 args=(QueueComm(rank, queues), ufl_object, parameters, results))
+                 for rank in range(num_ranks)]
+    for process in processes:
+        process.start()
+    results = sorted(results.get(timeout=300) for rank in range(num_ranks))
+    for process in processes:
+        process.join()
+    return results
+
+
+@pytest.mark.parametrize("local_cache", [False, True])
+def test_collective_jit(tmpdir, monkeypatch, local_cache):
+    monkeypatch.setenv("DIJITSO_CACHE_DIR", str(tmpdir.join("cache")))
+    parameters = {"local_cache_dir": str(tmpdir.join("local"))} if local_cache else {}
+    results = run_collective_jit(None, parameters)
+
+    # Only rank 0 generates code, and all ranks load the same module
+    rank, name, filename, compiled = results[0]
+    assert compiled
+    for rank, other_name, other_filename, compiled in results[1:]:
+        assert other_name == name and not compiled
+        if local_cache:
+            assert other_filename.startswith(str(tmpdir.join("local")))
+        else:
+            assert other_filename == filename
+
+
+def test_collective_jit_failure(tmpdir, monkeypatch):
+    monkeypatch.setenv("DIJITSO_CACHE_DIR", str(tmpdir))
+    results = run_collective_jit("not a form", {})
+    assert [result[1] for result in results] == ["FFCError", "FFCJitError", "FFCJitError"]
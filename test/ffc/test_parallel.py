@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2018 FEniCS Project
+#
+# This file is part of FFC (https://www.fenicsproject.org)
+#
+# SPDX-License-Identifier:    LGPL-3.0-or-later
+"""Tests of parallel representation and code generation stages."""
+
+import pytest
+
+import ufl
+from ffc.compiler import compile_element, compile_form
+
+
+def forms():
+    element = ufl.VectorElement("Lagrange", ufl.triangle, 2)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(ufl.FiniteElement("Discontinuous Lagrange", ufl.triangle, 1))
+    a = sum((c**k * ufl.inner(ufl.grad(u), ufl.grad(v)) * ufl.dx(k) for k in range(3)),
+            ufl.inner(u, v) * ufl.ds)
+    a += c("+") * ufl.inner(u("+"), v("-")) * ufl.dS
+    L = c * v[0] * ufl.dx
+    return [a, L]
+
+
+def test_parallel_ir_code_identical():
+    serial = compile_form(forms(), prefix="ParallelIR")
+    parallel = compile_form(forms(), prefix="ParallelIR",
+                            parameters={"ir_workers": 2, "ir_cache_size": 0})
+    assert parallel == serial
+
+
+@pytest.mark.parametrize("parameters", [
+    {},
+    {"add_tabulate_tensor_timing": True, "generate_tabulate_tensor_workspace": True},
+    {"format": "dolfin"},
+])
+def test_parallel_code_identical(parameters):
+    serial = compile_form(forms(), prefix="Parallel", parameters=parameters)
+    parameters = dict(parameters, ir_workers=2, codegen_workers=3, ir_cache_size=0)
+    parallel = compile_form(forms(), prefix="Parallel", parameters=parameters)
+    assert parallel == serial
+
+
+def test_parallel_element_code_identical():
+    elements = [ufl.FiniteElement("N1curl", ufl.tetrahedron, 2),
+                ufl.VectorElement("Lagrange", ufl.triangle, 3)]
+    serial = compile_element(elements, prefix="Elements")
+    parallel = compile_element(elements, prefix="Elements", parameters={"codegen_workers": 2})
+    assert parallel == serial
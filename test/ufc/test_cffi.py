@@ -41,6 +41,97 @@ def test_tabulate_reference_dof_coordinates(lagrange_element):
         # print(X)
 
 
+@pytest.mark.parametrize("batch_size", [1, 4])
+def test_evaluate_reference_basis_batched(batch_size):
+    P2 = ufl.FiniteElement("Lagrange", ufl.triangle, 2)
+    P1 = ufl.FiniteElement("Lagrange", ufl.triangle, 1)
+    elements = [ufl.FiniteElement("Lagrange", ufl.tetrahedron, 5),
+                ufl.FiniteElement("Lagrange", ufl.interval, 3),
+                ufl.FiniteElement("N1curl", ufl.tetrahedron, 2),
+                ufl.VectorElement("Lagrange", ufl.triangle, 3),
+                ufl.MixedElement(ufl.VectorElement(P2), P1),
+                ufl.MixedElement(ufl.FiniteElement("Lagrange", ufl.triangle, 4),
+                                 ufl.FiniteElement("DG", ufl.triangle, 0))]
+    reference, _ = ffc.backends.ufc.jit.compile_elements(elements)
+    batched, module = ffc.backends.ufc.jit.compile_elements(
+        elements, parameters={"evaluate_basis_batch_size": batch_size})
+    ffi = module.ffi
+
+    num_points = 7
+    rng = np.random.RandomState(5)
+    for e0, e1 in zip(reference, batched):
+        X = 0.25 * rng.random_sample((num_points, e0.topological_dimension))
+        shape = (num_points, e0.space_dimension, e0.reference_value_size)
+        values0 = np.zeros(shape)
+        values1 = np.ones(shape)
+        X_ptr = ffi.cast("double *", ffi.from_buffer(X))
+        assert e0.evaluate_reference_basis(ffi.cast("double *", ffi.from_buffer(values0)),
+                                           num_points, X_ptr) == 0
+        assert e1.evaluate_reference_basis(ffi.cast("double *", ffi.from_buffer(values1)),
+                                           num_points, X_ptr) == 0
+        assert np.allclose(values0, values1)
+        assert np.abs(values0).max() > 0.0
+
+
+def test_shared_basisvalues():
+    P2 = ufl.FiniteElement("Lagrange", ufl.triangle, 2)
+    P1 = ufl.FiniteElement("Lagrange", ufl.triangle, 1)
+    DG0 = ufl.FiniteElement("DG", ufl.triangle, 0)
+    elements = [ufl.MixedElement(ufl.VectorElement(P2), P1, DG0),
+                ufl.FiniteElement("N1curl", ufl.tetrahedron, 2),
+                ufl.FiniteElement("Lagrange", ufl.interval, 3)]
+    inline, _ = ffc.backends.ufc.jit.compile_elements(
+        elements, parameters={"shared_basisvalues": False})
+    shared, module = ffc.backends.ufc.jit.compile_elements(
+        elements, parameters={"shared_basisvalues": True})
+    ffi = module.ffi
+
+    num_points = 5
+    rng = np.random.RandomState(3)
+    for e0, e1 in zip(inline, shared):
+        tdim = e0.topological_dimension
+        X = 0.25 * rng.random_sample((num_points, tdim))
+        X_ptr = ffi.cast("double *", ffi.from_buffer(X))
+        for order in range(3):
+            shape = (num_points, e0.space_dimension, tdim**order, e0.reference_value_size)
+            values0 = np.zeros(shape)
+            values1 = np.ones(shape)
+            assert e0.evaluate_reference_basis_derivatives(
+                ffi.cast("double *", ffi.from_buffer(values0)), order, num_points, X_ptr) == 0
+            assert e1.evaluate_reference_basis_derivatives(
+                ffi.cast("double *", ffi.from_buffer(values1)), order, num_points, X_ptr) == 0
+            assert np.allclose(values0, values1)
+
+
+@pytest.mark.parametrize("precompute_order", [1, 3])
+def test_precompute_basis_derivatives(precompute_order):
+    P2 = ufl.FiniteElement("Lagrange", ufl.triangle, 2)
+    DG0 = ufl.FiniteElement("DG", ufl.triangle, 0)
+    elements = [ufl.MixedElement(ufl.VectorElement(P2), DG0),
+                ufl.FiniteElement("N1curl", ufl.tetrahedron, 2),
+                ufl.FiniteElement("Lagrange", ufl.tetrahedron, 3)]
+    reference, _ = ffc.backends.ufc.jit.compile_elements(elements)
+    precomputed, module = ffc.backends.ufc.jit.compile_elements(
+        elements, parameters={"precompute_basis_derivatives": precompute_order})
+    ffi = module.ffi
+
+    num_points = 11
+    rng = np.random.RandomState(7)
+    for e0, e1 in zip(reference, precomputed):
+        tdim = e0.topological_dimension
+        X = 0.25 * rng.random_sample((num_points, tdim))
+        X_ptr = ffi.cast("double *", ffi.from_buffer(X))
+        for order in range(1, 4):
+            shape = (num_points, e0.space_dimension, tdim**order, e0.reference_value_size)
+            values0 = np.zeros(shape)
+            values1 = np.ones(shape)
+            assert e0.evaluate_reference_basis_derivatives(
+                ffi.cast("double *", ffi.from_buffer(values0)), order, num_points, X_ptr) == 0
+            assert e1.evaluate_reference_basis_derivatives(
+                ffi.cast("double *", ffi.from_buffer(values1)), order, num_points, X_ptr) == 0
+            assert np.allclose(values0, values1)
+
+
 def test_form():
     cell = ufl.triangle
     element = ufl.FiniteElement("Lagrange", cell, 1)
@@ -53,6 +144,618 @@ def test_form():
         assert compiled_f.rank == len(f.arguments())
 
 
+def test_compute_reference_coordinates_batched():
+    mesh = ufl.Mesh(ufl.VectorElement("Lagrange", ufl.triangle, 2))
+    element = ufl.FiniteElement("Lagrange", ufl.triangle, 1)
+    V = ufl.FunctionSpace(mesh, element)
+    u, v = ufl.TrialFunction(V), ufl.TestFunction(V)
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([u * v * ufl.dx])
+    ffi = module.ffi
+    cmap = compiled_forms[0].create_coordinate_mapping()
+
+    # Curved triangle, vertices followed by edge midpoints
+    coordinate_dofs = np.array([0.0, 0.0, 1.0, 0.0, 0.0, 1.0,
+                                0.55, 0.6, 0.05, 0.5, 0.5, -0.1])
+    coords_ptr = ffi.cast("double *", ffi.from_buffer(coordinate_dofs))
+
+    num_points = 45
+    rng = np.random.RandomState(11)
+    X0 = rng.random_sample((num_points, 2))
+    X0[X0.sum(axis=1) > 1.0] *= 0.5
+    x = np.zeros((num_points, 2))
+    cmap.compute_physical_coordinates(ffi.cast("double *", ffi.from_buffer(x)), num_points,
+                                      ffi.cast("double *", ffi.from_buffer(X0)), coords_ptr)
+
+    X = np.zeros((num_points, 2))
+    num_iterations = np.zeros(num_points, dtype=np.intc)
+    X_ptr = ffi.cast("double *", ffi.from_buffer(X))
+    x_ptr = ffi.cast("double *", ffi.from_buffer(x))
+    it_ptr = ffi.cast("int *", ffi.from_buffer(num_iterations))
+    assert cmap.compute_reference_coordinates_batched(X_ptr, num_points, x_ptr, coords_ptr, 0,
+                                                      1e-12, 20, it_ptr) == 0
+    assert np.allclose(X, X0, atol=1e-10)
+    assert num_iterations.min() >= 1
+    assert num_iterations.max() <= 20
+
+    # One iteration is not sufficient to converge
+    num_failed = cmap.compute_reference_coordinates_batched(X_ptr, num_points, x_ptr, coords_ptr,
+                                                            0, 1e-12, 1, it_ptr)
+    assert num_failed == np.count_nonzero(num_iterations == -1)
+    assert num_failed > 0
+    assert cmap.compute_reference_coordinates_batched(X_ptr, num_points, x_ptr, coords_ptr, 0,
+                                                      1e-12, 20, ffi.NULL) == 0
+
+
+@pytest.mark.parametrize("cellname,degree,gdim", [("triangle", 2, 2), ("tetrahedron", 1, 3),
+                                                  ("triangle", 1, 3)])
+def test_geometry_cells(cellname, degree, gdim):
+    cell = ufl.Cell(cellname, geometric_dimension=gdim)
+    mesh = ufl.Mesh(ufl.VectorElement("Lagrange", cell, degree))
+    V = ufl.FunctionSpace(mesh, ufl.FiniteElement("Lagrange", cell, 1))
+    u, v = ufl.TrialFunction(V), ufl.TestFunction(V)
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([u * v * ufl.dx])
+    ffi = module.ffi
+    cmap = compiled_forms[0].create_coordinate_mapping()
+    element = compiled_forms[0].create_coordinate_finite_element()
+    tdim = cmap.topological_dimension
+    num_dofs = element.space_dimension // gdim
+
+    def ptr(a, ctype="double *"):
+        return ffi.cast(ctype, ffi.from_buffer(a))
+
+    # Perturbed reference cells, not a multiple of the cell block size
+    num_cells = 37
+    num_points = 5
+    rng = np.random.RandomState(5)
+    Xdofs = np.zeros((num_dofs, tdim))
+    element.create_sub_element(0).tabulate_reference_dof_coordinates(ptr(Xdofs))
+    coordinate_dofs = np.zeros((num_cells, num_dofs, gdim))
+    coordinate_dofs[:, :, :tdim] = Xdofs
+    coordinate_dofs += 0.1 * rng.random_sample(coordinate_dofs.shape)
+    cell_orientations = rng.choice([-1, 1], num_cells).astype(np.intc)
+    X = rng.random_sample((num_points, tdim)) / tdim
+
+    x = np.zeros((num_cells, num_points, gdim))
+    J = np.zeros((num_cells, num_points, gdim, tdim))
+    detJ = np.zeros((num_cells, num_points))
+    K = np.zeros((num_cells, num_points, tdim, gdim))
+    cmap.compute_geometry_cells(ptr(x), ptr(J), ptr(detJ), ptr(K), num_cells, num_points, ptr(X),
+                                ptr(coordinate_dofs), ptr(cell_orientations, "int *"))
+    xm = np.zeros((num_cells, gdim))
+    Jm = np.zeros((num_cells, gdim, tdim))
+    cmap.compute_midpoint_geometry_cells(ptr(xm), ptr(Jm), num_cells, ptr(coordinate_dofs))
+
+    for c in range(num_cells):
+        x_c = np.zeros((num_points, gdim))
+        J_c = np.zeros((num_points, gdim, tdim))
+        detJ_c = np.zeros(num_points)
+        K_c = np.zeros((num_points, tdim, gdim))
+        cmap.compute_geometry(ptr(x_c), ptr(J_c), ptr(detJ_c), ptr(K_c), num_points, ptr(X),
+                              ptr(coordinate_dofs[c]), int(cell_orientations[c]))
+        assert np.allclose(x[c], x_c, rtol=1e-13, atol=1e-13)
+        assert np.allclose(J[c], J_c, rtol=1e-13, atol=1e-13)
+        assert np.allclose(detJ[c], detJ_c, rtol=1e-13, atol=1e-13)
+        assert np.allclose(K[c], K_c, rtol=1e-12, atol=1e-12)
+
+        xm_c = np.zeros(gdim)
+        Jm_c = np.zeros((gdim, tdim))
+        cmap.compute_midpoint_geometry(ptr(xm_c), ptr(Jm_c), ptr(coordinate_dofs[c]))
+        assert np.allclose(xm[c], xm_c, rtol=1e-13, atol=1e-13)
+        assert np.allclose(Jm[c], Jm_c, rtol=1e-13, atol=1e-13)
+
+
+@pytest.mark.parametrize("cellname,degree,gdim", [
+    ("triangle", 1, 2),
+    ("tetrahedron", 1, 3),
+    ("triangle", 1, 3),
+    ("triangle", 2, 2),
+])
+def test_affine_geometry(cellname, degree, gdim):
+    cell = ufl.Cell(cellname, geometric_dimension=gdim)
+    mesh = ufl.Mesh(ufl.VectorElement("Lagrange", cell, degree))
+    V = ufl.FunctionSpace(mesh, ufl.FiniteElement("Lagrange", cell, 1))
+    u, v = ufl.TrialFunction(V), ufl.TestFunction(V)
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([u * v * ufl.dx])
+    ffi = module.ffi
+    cmap = compiled_forms[0].create_coordinate_mapping()
+    element = compiled_forms[0].create_coordinate_finite_element()
+    tdim = cmap.topological_dimension
+    num_dofs = element.space_dimension // gdim
+
+    def ptr(a, ctype="double *"):
+        return ffi.cast(ctype, ffi.from_buffer(a))
+
+    rng = np.random.RandomState(11)
+    Xdofs = np.zeros((num_dofs, tdim))
+    element.create_sub_element(0).tabulate_reference_dof_coordinates(ptr(Xdofs))
+    coordinate_dofs = np.zeros((num_dofs, gdim))
+    coordinate_dofs[:, :tdim] = Xdofs
+    coordinate_dofs += 0.1 * rng.random_sample(coordinate_dofs.shape)
+
+    geometry = ffi.new("ufc_affine_geometry *")
+    status = cmap.compute_affine_geometry(geometry, ptr(coordinate_dofs), 1)
+    if degree > 1:
+        assert status == -1
+        return
+    assert status == 0
+
+    # Affine simplex, J is made of the edge vectors from vertex 0
+    x0 = coordinate_dofs[0]
+    J_ref = (coordinate_dofs[1:tdim + 1] - x0).T
+    assert np.allclose(ffi.unpack(geometry.x0, gdim), x0, rtol=1e-14, atol=1e-14)
+    assert np.allclose(np.reshape(ffi.unpack(geometry.J, gdim * tdim), (gdim, tdim)), J_ref,
+                       rtol=1e-14, atol=1e-14)
+
+    # Compare with the geometry of compute_geometry at some points
+    num_points = 4
+    X = rng.random_sample((num_points, tdim)) / tdim
+    x = np.zeros((num_points, gdim))
+    J = np.zeros((num_points, gdim, tdim))
+    detJ = np.zeros(num_points)
+    K = np.zeros((num_points, tdim, gdim))
+    cmap.compute_geometry(ptr(x), ptr(J), ptr(detJ), ptr(K), num_points, ptr(X),
+                          ptr(coordinate_dofs), 1)
+    assert np.allclose(x, x0 + X.dot(J_ref.T), rtol=1e-13, atol=1e-13)
+    for i in range(num_points):
+        assert np.allclose(J[i], J_ref, rtol=1e-13, atol=1e-13)
+        assert np.isclose(detJ[i], geometry.detJ, rtol=1e-13, atol=1e-13)
+        assert np.allclose(K[i], np.reshape(ffi.unpack(geometry.K, tdim * gdim), (tdim, gdim)),
+                           rtol=1e-12, atol=1e-12)
+        assert np.allclose(K[i].dot(J[i]), np.eye(tdim), rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("element", [
+    ufl.FiniteElement("RT", ufl.triangle, 2),
+    ufl.FiniteElement("N1curl", ufl.tetrahedron, 1),
+    ufl.MixedElement([ufl.VectorElement("Lagrange", ufl.triangle, 2),
+                      ufl.FiniteElement("RT", ufl.triangle, 1)]),
+])
+def test_transform_cells(element):
+    compiled_elements, module = ffc.backends.ufc.jit.compile_elements([element])
+    compiled_element, = compiled_elements
+    ffi = module.ffi
+
+    def ptr(a, ctype="double *"):
+        return ffi.cast(ctype, ffi.from_buffer(a))
+
+    tdim = compiled_element.topological_dimension
+    gdim = compiled_element.geometric_dimension
+    num_dofs = compiled_element.space_dimension
+    rvs = compiled_element.reference_value_size
+    vs = compiled_element.value_size
+    num_cells, num_points, order = 4, 3, 1
+    num_derivatives = tdim**order
+    rng = np.random.RandomState(3)
+
+    X = rng.random_sample((num_points, tdim)) / tdim
+    reference_values = np.zeros((num_points, num_dofs, num_derivatives, rvs))
+    compiled_element.evaluate_reference_basis_derivatives(ptr(reference_values), order, num_points,
+                                                          ptr(X))
+
+    # Affine cells with geometry per cell, and non-affine with geometry per point
+    J = np.eye(gdim, tdim) + 0.2 * rng.random_sample((num_cells, num_points, gdim, tdim))
+    detJ = np.linalg.det(J)
+    K = np.linalg.inv(J)
+    for affine in (1, 0):
+        if affine:
+            J[:] = J[:, :1]
+            detJ[:] = detJ[:, :1]
+            K[:] = K[:, :1]
+            geometry = [np.ascontiguousarray(a[:, 0]) for a in (J, detJ, K)]
+        else:
+            geometry = [J, detJ, K]
+        values = np.zeros((num_cells, num_points, num_dofs, num_derivatives, vs))
+        assert compiled_element.transform_reference_basis_derivatives_cells(
+            ptr(values), order, num_cells, num_points, ptr(reference_values),
+            *[ptr(a) for a in geometry], affine) == 0
+        for c in range(num_cells):
+            values_c = np.zeros((num_points, num_dofs, num_derivatives, vs))
+            compiled_element.transform_reference_basis_derivatives(
+                ptr(values_c), order, num_points, ptr(reference_values), ptr(X), ptr(J[c]),
+                ptr(detJ[c]), ptr(K[c]), 0)
+            assert np.allclose(values[c], values_c, rtol=1e-13, atol=1e-13)
+
+    # Affine cells given by their vertices for transform_values
+    vertices = np.zeros((num_cells, tdim + 1, gdim))
+    vertices[:, 1:] = np.eye(tdim, gdim)
+    vertices += 0.1 * rng.random_sample(vertices.shape)
+    J = np.ascontiguousarray(np.transpose(vertices[:, 1:] - vertices[:, :1], (0, 2, 1)))
+    detJ = np.linalg.det(J)
+    K = np.linalg.inv(J)
+    physical_values = rng.random_sample((num_cells, num_dofs * vs))
+    dof_values = np.zeros((num_cells, num_dofs))
+    assert compiled_element.transform_values_cells(ptr(dof_values), ptr(physical_values), num_cells,
+                                                   ptr(J), ptr(detJ), ptr(K)) == 0
+    for c in range(num_cells):
+        dof_values_c = np.zeros(num_dofs)
+        assert compiled_element.transform_values(ptr(dof_values_c), ptr(physical_values[c]),
+                                                 ptr(vertices[c]), 0, ffi.NULL) == 0
+        assert np.allclose(dof_values[c], dof_values_c, rtol=1e-13, atol=1e-13)
+
+
+def test_transform_values_integral_moments():
+    # The dofs of N1curl2 include integral moments, which are not
+    # computed from values at the reference dof coordinates
+    element = ufl.FiniteElement("N1curl", ufl.triangle, 2)
+    compiled_elements, module = ffc.backends.ufc.jit.compile_elements([element])
+    compiled_element, = compiled_elements
+    ffi = module.ffi
+
+    def ptr(a):
+        return ffi.cast("double *", ffi.from_buffer(a))
+
+    num_dofs = compiled_element.space_dimension
+    vs = compiled_element.value_size
+    dof_values = np.zeros(num_dofs)
+    physical_values = np.ones(num_dofs * vs)
+    vertices = np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+    J, detJ, K = np.eye(2), np.ones(1), np.eye(2)
+    assert compiled_element.transform_values(ptr(dof_values), ptr(physical_values),
+                                             ptr(vertices), 0, ffi.NULL) == -1
+    assert compiled_element.transform_values_cells(ptr(dof_values), ptr(physical_values), 1,
+                                                   ptr(J), ptr(detJ), ptr(K)) == -1
+
+
+@pytest.mark.parametrize("element", [
+    ufl.FiniteElement("N1curl", ufl.triangle, 2),
+    ufl.FiniteElement("RT", ufl.tetrahedron, 1),
+    ufl.MixedElement([ufl.FiniteElement("BDM", ufl.triangle, 2),
+                      ufl.FiniteElement("Lagrange", ufl.triangle, 1)]),
+    ufl.MixedElement([ufl.VectorElement("Lagrange", ufl.triangle, 2),
+                      ufl.FiniteElement("DG", ufl.triangle, 0)]),
+])
+def test_interpolation_matrix(element):
+    compiled_elements, module = ffc.backends.ufc.jit.compile_elements([element])
+    compiled_element, = compiled_elements
+    ffi = module.ffi
+
+    def ptr(a):
+        return ffi.cast("double *", ffi.from_buffer(a))
+
+    num_points = compiled_element.num_interpolation_points
+    num_dofs = compiled_element.space_dimension
+    rvs = compiled_element.reference_value_size
+    X = np.zeros((num_points, compiled_element.topological_dimension))
+    M = np.zeros((num_dofs, num_points, rvs))
+    assert compiled_element.tabulate_interpolation_points(ptr(X)) == 0
+    assert compiled_element.tabulate_interpolation_matrix(ptr(M)) == 0
+
+    # Interpolating the basis functions gives the identity
+    phi = np.zeros((num_points, num_dofs, rvs))
+    compiled_element.evaluate_reference_basis(ptr(phi), num_points, ptr(X))
+    assert np.allclose(np.einsum("iqk,qjk->ij", M, phi), np.eye(num_dofs), atol=1e-12)
+
+    # Each basis function as the function on one cell
+    values = np.ascontiguousarray(np.transpose(phi, (1, 0, 2)))
+    dofs = np.zeros((num_dofs, num_dofs))
+    assert compiled_element.interpolate_cells(ptr(dofs), num_dofs, ptr(values)) == 0
+    assert np.allclose(dofs, np.eye(num_dofs), atol=1e-12)
+
+
+def test_tabulate_dofs_table():
+    cell = ufl.tetrahedron
+    element = ufl.MixedElement([ufl.VectorElement("Lagrange", cell, 3),
+                                ufl.FiniteElement("N1curl", cell, 2),
+                                ufl.FiniteElement("Real", cell, 0),
+                                ufl.FiniteElement("DG", cell, 1)])
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    a = ufl.inner(u, v) * ufl.dx
+
+    # Random entity indices of each cell, ordered by dimension
+    num_cell_entities = [4, 6, 4, 1]
+    num_global_entities = np.array([10, 30, 25, 7], dtype=np.int64)
+    num_cells = 5
+    rng = np.random.RandomState(0)
+    entity_indices = np.hstack([rng.randint(0, num_global_entities[d], (num_cells, n))
+                                for d, n in enumerate(num_cell_entities)]).astype(np.int64)
+    entity_offsets = np.cumsum([0] + num_cell_entities)
+
+    results = []
+    for parameters in (None, {"tabulate_dofs_table_min_size": 1}):
+        compiled_forms, module = ffc.backends.ufc.jit.compile_forms([a], parameters=parameters)
+        ffi = module.ffi
+        dofmap = compiled_forms[0].create_dofmap(0)
+        nge_ptr = ffi.cast("int64_t *", ffi.from_buffer(num_global_entities))
+
+        dofs = np.zeros((num_cells, dofmap.num_element_dofs), dtype=np.int64)
+        for c in range(num_cells):
+            indices = [np.ascontiguousarray(entity_indices[c, entity_offsets[d]:entity_offsets[d + 1]])
+                       for d in range(len(num_cell_entities))]
+            indices_ptr = ffi.new("int64_t*[]", [ffi.cast("int64_t *", ffi.from_buffer(i))
+                                                 for i in indices])
+            dofmap.tabulate_dofs(ffi.cast("int64_t *", ffi.from_buffer(dofs[c])), nge_ptr,
+                                 ffi.cast("const int64_t **", indices_ptr))
+
+        dofs_cells = np.zeros_like(dofs)
+        dofmap.tabulate_dofs_cells(ffi.cast("int64_t *", ffi.from_buffer(dofs_cells)), num_cells,
+                                   nge_ptr, ffi.cast("int64_t *", ffi.from_buffer(entity_indices)))
+        assert (dofs_cells == dofs).all()
+        results.append(dofs)
+
+    assert (results[0] == results[1]).all()
+
+
+def tabulate_cell_tensor(form, parameters=None):
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([form], parameters=parameters)
+    ffi = module.ffi
+    integral = compiled_forms[0].create_default_cell_integral()
+
+    A = np.zeros((10, 10))
+    w = np.linspace(1.0, 2.0, 10)
+    coords = np.array([0.1, 0.0, 1.2, 0.1, 0.3, 0.9])
+    w_ptr = ffi.new("double*[]", [ffi.cast("double *", ffi.from_buffer(w))])
+    integral.tabulate_tensor(
+        ffi.cast("double *", ffi.from_buffer(A)), w_ptr,
+        ffi.cast("double *", ffi.from_buffer(coords)), 0)
+    return A
+
+
+@pytest.mark.parametrize("gemm_call_min_size", [1, 1000])
+def test_gemm_block_mode(gemm_call_min_size):
+    cell = ufl.triangle
+    element = ufl.FiniteElement("Lagrange", cell, 3)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(element)
+    a = c * ufl.dot(ufl.grad(u), ufl.grad(v)) * ufl.dx + c * u * v * ufl.dx
+
+    A = tabulate_cell_tensor(a)
+    parameters = {"gemm_block_min_size": 1, "gemm_call_min_size": gemm_call_min_size}
+    A_gemm = tabulate_cell_tensor(a, parameters)
+    assert np.allclose(A, A_gemm, rtol=1e-13, atol=1e-13)
+    assert np.allclose(A, A.T, rtol=1e-12, atol=1e-12)
+
+
+def test_tabulate_tensor_workspace():
+    cell = ufl.triangle
+    element = ufl.FiniteElement("Lagrange", cell, 3)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(element)
+    a = c * ufl.dot(ufl.grad(u), ufl.grad(v)) * ufl.dx + c * u * v * ufl.dx
+
+    parameters = {"generate_tabulate_tensor_workspace": True}
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([a], parameters=parameters)
+    ffi = module.ffi
+    integral = compiled_forms[0].create_default_cell_integral()
+    assert integral.tabulate_tensor_workspace != ffi.NULL
+    assert integral.workspace_size > 0
+
+    w = np.linspace(1.0, 2.0, 10)
+    coords = np.array([0.1, 0.0, 1.2, 0.1, 0.3, 0.9])
+    w_ptr = ffi.new("double*[]", [ffi.cast("double *", ffi.from_buffer(w))])
+    A = np.zeros((10, 10))
+    integral.tabulate_tensor(
+        ffi.cast("double *", ffi.from_buffer(A)), w_ptr,
+        ffi.cast("double *", ffi.from_buffer(coords)), 0)
+
+    # Workspace contents on entry must not matter, and it can be reused
+    workspace = np.full(integral.workspace_size // 8, np.nan)
+    for k in range(2):
+        A_ws = np.zeros((10, 10))
+        integral.tabulate_tensor_workspace(
+            ffi.cast("double *", ffi.from_buffer(A_ws)), w_ptr,
+            ffi.cast("double *", ffi.from_buffer(coords)), 0,
+            ffi.cast("double *", ffi.from_buffer(workspace)))
+        assert np.allclose(A, A_ws, rtol=1e-14, atol=1e-14)
+
+    # Not generated by default
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([a])
+    integral = compiled_forms[0].create_default_cell_integral()
+    assert integral.tabulate_tensor_workspace == module.ffi.NULL
+    assert integral.workspace_size == 0
+
+
+@pytest.mark.parametrize("chunk_size", [5, 128])
+def test_custom_integral_runtime_tables(chunk_size):
+    from ffc.representationutils import create_quadrature_points_and_weights
+
+    cell = ufl.triangle
+    element = ufl.FiniteElement("Lagrange", cell, 2)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(element)
+    integrand = c * ufl.dot(ufl.grad(u), ufl.grad(v)) + c * u.dx(0) * v + u * v
+    a = integrand * ufl.dx + integrand * ufl.dc
+
+    parameters = {"chunk_size": chunk_size}
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([a], parameters=parameters)
+    ffi = module.ffi
+
+    w = np.linspace(1.0, 2.0, 6)
+    coords = np.array([0.1, 0.0, 1.2, 0.1, 0.3, 0.9])
+    w_ptr = ffi.new("double*[]", [ffi.cast("double *", ffi.from_buffer(w))])
+
+    A = np.zeros((6, 6))
+    integral = compiled_forms[0].create_default_cell_integral()
+    integral.tabulate_tensor(
+        ffi.cast("double *", ffi.from_buffer(A)), w_ptr,
+        ffi.cast("double *", ffi.from_buffer(coords)), 0)
+
+    # Quadrature rule on the physical cell, exact for the integrand
+    X, weights = create_quadrature_points_and_weights("cell", cell, 6, "default")
+    x0 = coords[0:2]
+    J = np.array([coords[2:4] - x0, coords[4:6] - x0]).T
+    points = np.ascontiguousarray((x0 + X.dot(J.T)).flatten())
+    weights = np.ascontiguousarray(weights * abs(np.linalg.det(J)))
+
+    A_custom = np.zeros((6, 6))
+    integral = compiled_forms[0].create_default_custom_integral()
+    integral.tabulate_tensor(
+        ffi.cast("double *", ffi.from_buffer(A_custom)), w_ptr,
+        ffi.cast("double *", ffi.from_buffer(coords)), len(weights),
+        ffi.cast("double *", ffi.from_buffer(points)),
+        ffi.cast("double *", ffi.from_buffer(weights)), ffi.NULL, 0)
+    assert np.allclose(A, A_custom, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("split_integrals", [False, True])
+def test_tabulate_tensor_timing(split_integrals):
+    cell = ufl.triangle
+    element = ufl.FiniteElement("Lagrange", cell, 1)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    a = ufl.dot(ufl.grad(u), ufl.grad(v)) * ufl.dx + u * v * ufl.ds
+
+    # Integrals in separate object files update the timings of the module
+    parameters = {"add_tabulate_tensor_timing": True, "split_integrals": split_integrals}
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([a], parameters=parameters)
+    ffi = module.ffi
+    integral = compiled_forms[0].create_default_cell_integral()
+
+    timings = ffc.backends.ufc.jit.get_tabulate_tensor_timings(module)
+    assert sorted(timings) == ["form_cell_integral_0_otherwise",
+                               "form_exterior_facet_integral_0_otherwise"]
+    assert all(t == (0, 0.0) for t in timings.values())
+
+    A = np.zeros((3, 3))
+    coords = np.array([0.0, 0.0, 1.0, 0.0, 0.0, 1.0])
+    for k in range(3):
+        integral.tabulate_tensor(
+            ffi.cast("double *", ffi.from_buffer(A)), ffi.NULL,
+            ffi.cast("double *", ffi.from_buffer(coords)), 0)
+
+    assert np.allclose(A, [[1.0, -0.5, -0.5], [-0.5, 0.5, 0.0], [-0.5, 0.0, 0.5]])
+
+    timings = ffc.backends.ufc.jit.get_tabulate_tensor_timings(module, reset=True)
+    num_calls, time = timings["form_cell_integral_0_otherwise"]
+    assert num_calls == 3
+    assert time > 0.0
+    assert timings["form_exterior_facet_integral_0_otherwise"] == (0, 0.0)
+
+    timings = ffc.backends.ufc.jit.get_tabulate_tensor_timings(module)
+    assert timings["form_cell_integral_0_otherwise"] == (0, 0.0)
+
+
+def test_tabulate_tensor_geometry():
+    cell = ufl.Cell("triangle", geometric_dimension=3)
+    element = ufl.FiniteElement("RT", cell, 1)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(ufl.FiniteElement("DG", cell, 1))
+    n = ufl.FacetNormal(cell)
+    a = c * ufl.div(u) * ufl.div(v) * ufl.dx + ufl.inner(u, v) * ufl.CellVolume(cell) * ufl.dx \
+        + ufl.inner(u, v) * ufl.ds + ufl.jump(u, n) * ufl.jump(v, n) * ufl.dS
+
+    parameters = {"generate_tabulate_tensor_geometry": True}
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([a], parameters=parameters)
+    ffi = module.ffi
+    form = compiled_forms[0]
+    cmap = form.create_coordinate_mapping()
+
+    def ptr(a):
+        return ffi.cast("double *", ffi.from_buffer(a))
+
+    w = np.linspace(1.0, 2.0, 9)
+    w_ptr = ffi.new("double*[]", [ptr(w)])
+    coords = [np.array([0.1, 0.0, 0.2, 1.2, 0.1, 0.0, 0.3, 0.9, 0.4]),
+              np.array([1.2, 0.1, 0.0, 0.1, 0.0, 0.2, 1.1, -0.8, 0.3])]
+    orientations = [1, 0]
+    geometry = [ffi.new("ufc_affine_geometry *") for k in range(2)]
+    for k in range(2):
+        assert cmap.compute_affine_geometry(geometry[k], ptr(coords[k]), orientations[k]) == 0
+
+    integral = form.create_default_cell_integral()
+    A = np.zeros((3, 3))
+    A_g = np.zeros((3, 3))
+    integral.tabulate_tensor(ptr(A), w_ptr, ptr(coords[0]), 1)
+    integral.tabulate_tensor_geometry(ptr(A_g), w_ptr, ptr(coords[0]), 1, geometry[0])
+    assert np.allclose(A, A_g, rtol=1e-14, atol=1e-14)
+
+    integral = form.create_default_exterior_facet_integral()
+    for facet in range(3):
+        A = np.zeros((3, 3))
+        A_g = np.zeros((3, 3))
+        integral.tabulate_tensor(ptr(A), w_ptr, ptr(coords[0]), facet, 1)
+        integral.tabulate_tensor_geometry(ptr(A_g), w_ptr, ptr(coords[0]), facet, 1, geometry[0])
+        assert np.allclose(A, A_g, rtol=1e-14, atol=1e-14)
+
+    integral = form.create_default_interior_facet_integral()
+    A = np.zeros((6, 6))
+    A_g = np.zeros((6, 6))
+    integral.tabulate_tensor(ptr(A), w_ptr, ptr(coords[0]), ptr(coords[1]), 0, 2, 1, 0)
+    integral.tabulate_tensor_geometry(ptr(A_g), w_ptr, ptr(coords[0]), ptr(coords[1]), 0, 2, 1, 0,
+                                      geometry[0], geometry[1])
+    assert np.allclose(A, A_g, rtol=1e-14, atol=1e-14)
+
+    # Same element tensor as with the geometry lowered symbolically,
+    # which is the default without the variant
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([a])
+    integral = compiled_forms[0].create_default_cell_integral()
+    assert integral.tabulate_tensor_geometry == module.ffi.NULL
+    A_ref = np.zeros((3, 3))
+    integral.tabulate_tensor(module.ffi.cast("double *", module.ffi.from_buffer(A_ref)),
+                             module.ffi.new("double*[]", [module.ffi.cast(
+                                 "double *", module.ffi.from_buffer(w))]),
+                             module.ffi.cast("double *", module.ffi.from_buffer(coords[0])), 1)
+    A = np.zeros((3, 3))
+    form.create_default_cell_integral().tabulate_tensor(ptr(A), w_ptr, ptr(coords[0]), 1)
+    assert np.allclose(A, A_ref, rtol=1e-13, atol=1e-13)
+
+
+@pytest.mark.parametrize("parameters", [
+    {"scalar_type": "float"},
+    {"scalar_type": "float", "mixed_precision": True},
+    {"scalar_type": "float", "gemm_block_min_size": 1, "gemm_call_min_size": 1,
+     "generate_tabulate_tensor_workspace": True},
+])
+def test_scalar_type_float(parameters):
+    cell = ufl.triangle
+    element = ufl.FiniteElement("Lagrange", cell, 3)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(element)
+    a = c * ufl.dot(ufl.grad(u), ufl.grad(v)) * ufl.dx + c * u * v * ufl.dx
+    A = tabulate_cell_tensor(a)
+
+    compiled_forms, module = ffc.backends.ufc.jit.compile_forms([a], parameters=parameters)
+    ffi = module.ffi
+    integral = compiled_forms[0].create_default_cell_integral()
+
+    # Element tensor and coefficients in single precision, coordinates in double
+    w = np.linspace(1.0, 2.0, 10, dtype=np.float32)
+    coords = np.array([0.1, 0.0, 1.2, 0.1, 0.3, 0.9])
+    w_ptr = ffi.new("float*[]", [ffi.cast("float *", ffi.from_buffer(w))])
+    A_f = np.zeros((10, 10), dtype=np.float32)
+    integral.tabulate_tensor(
+        ffi.cast("float *", ffi.from_buffer(A_f)), w_ptr,
+        ffi.cast("double *", ffi.from_buffer(coords)), 0)
+    assert np.allclose(A, A_f, rtol=1e-5, atol=1e-5 * np.abs(A).max())
+
+    if integral.tabulate_tensor_workspace != ffi.NULL:
+        workspace = np.full(integral.workspace_size // 8, np.nan)
+        A_ws = np.zeros((10, 10), dtype=np.float32)
+        integral.tabulate_tensor_workspace(
+            ffi.cast("float *", ffi.from_buffer(A_ws)), w_ptr,
+            ffi.cast("double *", ffi.from_buffer(coords)), 0,
+            ffi.cast("double *", ffi.from_buffer(workspace)))
+        assert (A_ws == A_f).all()
+
+
+def test_build_profiles():
+    cell = ufl.triangle
+    element = ufl.FiniteElement("Lagrange", cell, 2)
+    u, v = ufl.TrialFunction(element), ufl.TestFunction(element)
+    c = ufl.Coefficient(element)
+    a = c * ufl.dot(ufl.grad(u), ufl.grad(v)) * ufl.dx + c * u * v * ufl.ds
+
+    coords = np.array([0.1, 0.0, 1.0, 0.2, 0.0, 0.9])
+    w = np.arange(1.0, 7.0)
+    tensors = {}
+    module_names = set()
+    for profile in ("portable", "native", "pgo"):
+        compiled_forms, module = ffc.backends.ufc.jit.compile_forms(
+            [a], parameters={"build_profile": profile})
+        module_names.add(module.__name__)
+        ffi = module.ffi
+        w_ptr = ffi.new("double*[]", [ffi.cast("double *", ffi.from_buffer(w))])
+        A = np.zeros((6, 6))
+        integral = compiled_forms[0].create_default_cell_integral()
+        integral.tabulate_tensor(
+            ffi.cast("double *", ffi.from_buffer(A)), w_ptr,
+            ffi.cast("double *", ffi.from_buffer(coords)), 0)
+        tensors[profile] = A
+
+    # Binaries of each profile are kept apart in the cache
+    assert len(module_names) == 3
+    assert np.allclose(tensors["native"], tensors["portable"])
+    assert np.allclose(tensors["pgo"], tensors["portable"])
+
+
 # cell = ufl.triangle
 # elements = [ufl.FiniteElement("Lagrange", cell, p) for p in range(1, 5)]
 # compiled_elements, module = ffc.backends.ufc.jit.compile_elements(elements)